@@ -0,0 +1 @@
+python bin\bench.py %*
\ No newline at end of file
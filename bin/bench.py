@@ -0,0 +1,227 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import argparse
+import os
+import io
+import sys
+import json
+import time
+import platform
+import datetime
+import tempfile
+import subprocess
+import tracemalloc
+import contextlib
+from lib.schema import *
+from lib.synthetic import *
+from lib.template_engine import *
+from lib.generators import *
+from lib.memo import *
+
+"""
+    bench.py
+
+    Measure every stage of the code generation on synthetic schemas,
+    no database is needed:
+
+    - schema_load: synthetic description, mysqldump file, binary snapshot
+    - snippet: every snippet of the code generators on all the tables
+    - template: template_engine.process for every template on all the tables
+    - template_compiled: the same with the templates compiled into python modules
+    - workflow: a full workflow.py run in another process
+
+    The result is a json report with the wall time, the cpu time, the number of
+    memory blocks still allocated at the end (not the number of allocations)
+    and the peak of memory of every stage, for every schema size. The reports
+    of two releases can be compared to track regressions.
+
+	bench									# 10, 100 and 1000 tables, report on stdout
+
+	bench -s 10,1000,10000 -o report.json	# other sizes, report into a file
+
+    The times are measured without tracemalloc which slows down the execution,
+    the memory is measured in a second run.
+"""
+
+# the snippets which can be called by the templates, see lib/snippets.py
+load_generators()
+snippets = snippet_names(template_only=True)
+
+# codes generated by the workflow stage, the ones with a template in the templates directory
+workflow_codes = {'api_controller': ('ApiController.php', r'app\Http\Controllers\api'),
+                  'api_model': ('Model.php', r'app\Models')}
+
+report_version = 2
+
+"""
+    Run a stage, the output of the generators is discarded
+
+    returns the wall and cpu time of the fastest run, then the memory blocks
+    retained by the stage and the peak of memory measured with tracemalloc in an additional run
+"""
+def measure(stage, name, function, repeat = 1, memory = True, reset = None):
+    result = {'stage': stage, 'name': name}
+    walls = []
+    cpus = []
+    try:
+        for i in range(repeat):
+            if reset:
+                reset()
+            start_wall = time.perf_counter()
+            start_cpu = time.process_time()
+            with contextlib.redirect_stdout(io.StringIO()):
+                function()
+            walls.append(time.perf_counter() - start_wall)
+            cpus.append(time.process_time() - start_cpu)
+
+        result['wall'] = min(walls)
+        result['cpu'] = min(cpus)
+
+        if memory:
+            if reset:
+                reset()
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            with contextlib.redirect_stdout(io.StringIO()):
+                function()
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result['retained_blocks'] = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+            result['peak'] = peak
+    except Exception as e:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        result['error'] = repr(e)
+    return result
+
+"""
+    Forget the values computed by the generators, every run starts cold
+"""
+def reset_caches():
+    current_schema().invalidate()
+    clear_memo()
+
+def load_binary(filename):
+    schema = Schema("")
+    schema.open_binary(filename)
+    for table in schema.table_list():
+        schema.ensure_table(table)
+    schema.close_binary()
+
+def run_snippet(function, tables):
+    for table in tables:
+        function(table)
+
+def run_templates(template, tables, build_dir, compiled = False):
+    template_settings['compile'] = compiled
+    for table in tables:
+        process(table, template, os.path.join(build_dir, table + '_' + os.path.basename(template)), "", "", False)
+
+def run_workflow(dump, templates_dir, build_dir, install_dir, tables):
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'workflow.py'),
+               '-dd', dump, '-a', 'check', '-td', templates_dir, '-b', build_dir, '-i', install_dir]
+    for code in workflow_codes:
+        command += ['-c', code]
+    subprocess.run(command + tables, check=True, capture_output=True)
+
+"""
+    Measure all the stages on a schema of a given size
+"""
+def bench_size(size, args, work_dir):
+    options = {'tables': size, 'columns': args.columns, 'fk_density': args.fk_density, 'seed': args.seed}
+    stages = []
+
+    description = synthetic_description(options)
+    dump = os.path.join(work_dir, f"synthetic_{size}.sql")
+    with open(dump, 'w', encoding='utf8') as f:
+        f.write(synthetic_dump(description))
+
+    stages.append(measure('schema_load', 'synthetic', lambda: Schema("").load_description(description), args.repeat, args.memory))
+    stages.append(measure('schema_load', 'dump', lambda: Schema("").load_dump(dump), args.repeat, args.memory))
+
+    schema = use_schema(load_synthetic_schema(options))
+    snapshot = os.path.join(work_dir, f"synthetic_{size}.snp")
+    schema.export_binary(snapshot)
+    stages.append(measure('schema_load', 'binary_snapshot', lambda: load_binary(snapshot), args.repeat, args.memory))
+
+    tables = [table for table in schema.table_list() if table != 'metadata']
+    if args.sample and args.sample < len(tables):
+        tables = tables[:args.sample]
+
+    for name in snippets:
+        function = get_snippet(name).function
+        stages.append(measure('snippet', name, lambda: run_snippet(function, tables), args.repeat, args.memory, reset_caches))
+
+    build_dir = os.path.join(work_dir, 'build')
+    os.makedirs(build_dir, exist_ok=True)
+    for code in workflow_codes:
+        template = os.path.join(args.templates_dir, workflow_codes[code][0])
+        stages.append(measure('template', os.path.basename(template), lambda: run_templates(template, tables, build_dir), args.repeat, args.memory, reset_caches))
+        stages.append(measure('template_compiled', os.path.basename(template), lambda: run_templates(template, tables, build_dir, True), args.repeat, args.memory, reset_caches))
+
+    if args.workflow:
+        install_dir = os.path.join(work_dir, 'install')
+        for code in workflow_codes:
+            os.makedirs(os.path.join(install_dir, workflow_codes[code][1]), exist_ok=True)
+        workflow_tables = tables if args.sample else []
+        # the memory of another process is not traced
+        stages.append(measure('workflow', 'check', lambda: run_workflow(dump, args.templates_dir, build_dir, install_dir, workflow_tables), args.repeat, False))
+
+    return {'tables': size, 'columns': args.columns, 'processed_tables': len(tables), 'stages': stages}
+
+parser = argparse.ArgumentParser(
+    description='Measure the schema loading, the snippets, the templates and the workflow on synthetic schemas.')
+
+parser.add_argument('-v', '--verbose', action="store_true", dest="verbose",
+                    help='verbose mode')
+parser.add_argument('-s', '--sizes', type=str, action="store", dest="sizes", default="10,100,1000",
+                    help='numbers of tables of the schemas, separated by commas')
+parser.add_argument('-c', '--columns', type=int, action="store", dest="columns", default=20,
+                    help='number of columns per table')
+parser.add_argument('-fk', '--fk-density', type=float, action="store", dest="fk_density", default=0.1,
+                    help='proportion of the columns which are foreign keys')
+parser.add_argument('--seed', type=int, action="store", dest="seed", default=0,
+                    help='seed of the synthetic schemas')
+parser.add_argument('-r', '--repeat', type=int, action="store", dest="repeat", default=1,
+                    help='number of runs of every stage, the fastest one is reported')
+parser.add_argument('--sample', type=int, action="store", dest="sample", default=0,
+                    help='number of tables processed by the snippet, template and workflow stages, all by default')
+parser.add_argument('-td', '--template_dir', type=str, action="store", dest="templates_dir",
+                    default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates'),
+                    help='directory for templates')
+parser.add_argument('-nm', '--no-memory', action="store_false", dest="memory",
+                    help='do not measure the memory')
+parser.add_argument('-nw', '--no-workflow', action="store_false", dest="workflow",
+                    help='do not run the workflow stage')
+parser.add_argument('-o', '--output', type=str, action="store", dest="output",
+                    help='file of the json report, stdout by default')
+args = parser.parse_args()
+
+if (args.verbose):
+    print('args', args)
+
+report = {
+    'version': report_version,
+    'date': datetime.datetime.now().isoformat(timespec='seconds'),
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'options': vars(args),
+    'results': []
+}
+
+with tempfile.TemporaryDirectory() as work_dir:
+    for size in [int(size) for size in args.sizes.split(',') if size.strip()]:
+        result = bench_size(size, args, work_dir)
+        report['results'].append(result)
+        if (args.verbose):
+            for stage in result['stages']:
+                print(size, stage['stage'], stage['name'], f"{stage.get('wall', 0):.3f} s", stage.get('error', ''))
+
+text = json.dumps(report, indent=2)
+if (args.output):
+    with open(args.output, 'w') as f:
+        f.write(text + "\n")
+    print("report written into", args.output)
+else:
+    print(text)
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import sys
+import json
+import fnmatch
+import contextlib
+from lib.schema import *
+from lib.snippets import *
+from lib.generators import find_snippet
+from lib.memo import *
+
+"""
+    Batch evaluation of the snippets
+
+    Aggregate files (routes, translation bundles, seeders) need the snippets of
+    every table. The snippets are evaluated for all the tables in one call, the
+    schema, the table contexts and the memoized results are shared:
+
+        for line in batch_snippets(['cg_class', 'cg_url'], select_tables(['board*'])):
+            print(line['table'], line['cg_class'])
+"""
+
+"""
+    return the tables matching glob patterns, all the tables when there is no pattern
+"""
+def select_tables(patterns = []):
+    if not patterns:
+        return list(table_list())
+    return [table for table in table_list() if any(fnmatch.fnmatchcase(table, pattern) for pattern in patterns)]
+
+"""
+    Evaluate snippets for a list of tables
+
+    yields one dictionary per table: {'table': table, snippet: result, ...}, the
+    snippets which fail are reported in 'errors': {snippet: message}. The messages
+    printed by the snippets go to stderr, the output only holds the results.
+"""
+def batch_snippets(names, tables, args = []):
+    entries = []
+    for name in names:
+        entry = find_snippet(name)
+        if entry == None:
+            raise Exception("Unknown snippet: " + name)
+        entries.append(entry)
+
+    for table in tables:
+        line = {'table': table}
+        for entry in entries:
+            try:
+                with contextlib.redirect_stdout(sys.stderr):
+                    line[entry.name] = call_snippet(entry, table, *args)
+            except Exception as e:
+                line.setdefault('errors', {})[entry.name] = str(e)
+        yield line
+
+"""
+    return the result of batch_snippets as json lines
+"""
+def json_lines(lines):
+    for line in lines:
+        yield json.dumps(line, default=str)
@@ -1,28 +1,39 @@
 #!/usr/bin/python
 # -*- coding:utf8 -*
+import hashlib
 from lib.schema import *
+from lib.snippets import *
+from lib.memo import set_memo_dependency
 
 """
     code_generator.py
 
-    Generate code for Laravel RESTful API
+    Values and snippets shared by all the code generators: names derived from
+    the table, subtypes of the fields, lists of fields and the table context.
+    The snippets of a target (Laravel API, React client) are in lib/generators.
 """
 
+@snippet("Capitalized name of the class", template=False)
 def cg_class(table):
     return ''.join(x.capitalize() for x in table.split('_')).rstrip('s')
 
+@snippet("Name of the table elements", template=False)
 def cg_element(table):
     return table.rstrip('s')
 
+@snippet("Table name", template=False)
 def cg_table(table):
     return table
 
+@snippet("Primary key field name", template=False)
 def cg_primary_key(table):
     return primary_key(table)
 
+@snippet("Suburl to access the resource", template=False)
 def cg_url(table):
     return table.replace('_', '-')
 
+@snippet("Table name as words", template=False)
 def cg_to_words(table):
     return table.replace('_', ' ').rstrip('s')
 
@@ -30,500 +41,247 @@ def cg_to_words(table):
     Possible values are:
     url, password, email, phone, image, file, enumerate, boolean, bitfield, currency, foreign_key, color,
     csv_int, csv_string
+
+    The subtype is resolved once per field and kept in memory.
 """
+@snippet("Subtype of a field, require a field name parameter", template=False)
 def cg_subtype(table, field):
-    if (field_subtype(table, field)):
-        return field_subtype(table, field)
-    
-    if ('mail' in field):
-        return 'email'
-    if ('password' in field):
-        return 'password'
-    if ('date' in field):
-        return 'date'
-    if ('time' in field):
-        return 'time'
-    if ('url' in field):
-        return 'url'
-    if ('phone' in field):
-        return 'phone'
-    if ('image' in field):
-        return 'image'
-    if ('file' in field):
-        return 'file'
-
-    if (field_type(table, field) == 'tinyint(1)'):
-        return 'boolean'    
-
-    return None
-    
+    # cg_subtypes[table][field], forgotten when the table is reloaded
+    cg_subtypes = current_schema().cache('cg_subtype')
+    if table in cg_subtypes and field in cg_subtypes[table]:
+        return cg_subtypes[table][field]
+
+    subtype = resolve_cg_subtype(table, field)
+    if table not in cg_subtypes:
+        cg_subtypes[table] = {}
+    cg_subtypes[table][field] = subtype
+    return subtype
 
 """
-    Return a comma separated list of fields with double quotes for a given table
+    return the subtypes of all the fields of a table
 """
-def csv_fields(table):
-    list = field_list(table)
-    list_with_quotes = [f"\"{x}\"" for x in list]
-    return ", ".join(list_with_quotes)
+def cg_subtype_map(table):
+    return {field: cg_subtype(table, field) for field in field_list(table)}
 
 """
-    Return list of fields with their translation for a given table
-"""
-def field_list_translation(table):
-    list = fillable_list(table)
-    res = ""
-    for field in list:
-        trans = field.capitalize().replace('_', ' ')
-
-        res += '    "' + field + '.label": "' + trans + '",' + "\n"
-        res += '    "' + field + '.placeholder": "'  + '",' + "\n"
-        res += '    "' + field + '.title": "'  + '",' + "\n"
-
-        subtype = cg_subtype(table, field)
-        if (subtype == 'enum'):
-            values = field_enum_values(table, field)
-            for value in values:
-                str_value = value.capitalize().replace('_', ' ')
-                res += '    "' + field + '.value.' + value + '": "' + str_value + '",' + "\n"
-    res += '    "last": "Last"' 
-    return res
-
+    Values of a table shared by all the snippets
 
+    The lists of fields, the subtypes, the foreign keys and the image fields of
+    the referenced tables are computed once, every snippet reads them instead
+    of querying the schema field by field.
 """
-    Return a list of fillable fields for a given table
-"""
-def fillable_list(table):
-    list = []
-    flist = field_list(table)
-    for field in flist:
-        if field_guarded(table, field):
-            continue
-        list.append(field)
-    return list
-
-def high_variability_list(table):
-    list = []
-    flist = field_list(table)
-    for field in flist:
-        if field_is_primary_key(table, field):
-            continue
-        if field_guarded(table, field):
-            continue
-        if field_is_unique(table, field):
-            continue
-        if field_base_type(table, field) == 'tinyint':
-            continue
-        if field_base_type(table, field) == 'enum':
-            continue
-        if field_foreign_key(table, field):
-            continue
-        list.append(field)
-    return list
+class TableContext:
 
-def csv_high_variability_fields(table):
-    list = high_variability_list(table)
-    list_with_quotes = [f"\"{x}\"" for x in list]
-    return ", ".join(list_with_quotes)
+    def __init__(self, table):
+        self.table = table
+        self.fields = field_list(table)
 
-"""
-    Return a comma separated list of not fillable (guarded) fields with double quotes for a given table
-"""
-def guarded(table):
-    list = []
-    flist = field_list(table)
-    for field in flist:
-        if field_guarded(table, field):
-            list.append(field)
-    list_with_quotes = [f"\"{x}\"" for x in list]
-    return ", ".join(list_with_quotes)
+    """
+        The values are computed on first access by the compute_xxx methods
+        and kept as attributes, a snippet only pays for what it reads
+    """
+    def __getattr__(self, name):
+        if name.startswith('compute_'):
+            raise AttributeError(name)
+        compute = getattr(self, 'compute_' + name)
+        value = compute()
+        setattr(self, name, value)
+        return value
 
-"""
-    Return the validation rule for one field
-"""
-def create_validation_rule(table, field, create = True):
+    def compute_descriptors(self):
+        return {field: field_descriptor(self.table, field) for field in self.fields}
 
-    rules = []
-    reg_expr = False
-    if (not field_nullable(table, field)) and create:
-        rules.append('required')
+    def compute_guarded(self):
+        return [field for field in self.fields if field_guarded(self.table, field)]
 
-    if field_base_type(table, field) == 'varchar':
-        rules.append('string')
-        size = field_size(table, field)
-        rules.append(f'max:{size}')
+    def compute_fillable(self):
+        guarded = self.guarded
+        return [field for field in self.fields if field not in guarded]
 
-    if cg_subtype(table, field) == 'email':
-        rules.append('email')
+    def compute_subtypes(self):
+        return cg_subtype_map(self.table)
 
-    if cg_subtype(table, field) == 'boolean' or field_base_type(table, field) == 'boolean':
-        rules.append('boolean')
+    def compute_foreign_keys(self):
+        foreign_keys = {}
+        for field in self.fields:
+            fk = field_foreign_key(self.table, field)
+            if fk:
+                foreign_keys[field] = fk
+        return foreign_keys
 
-    if cg_subtype(table, field) == 'date':
-        rules.append('date')
+    def compute_high_variability(self):
+        return [field for field in self.fillable if self.high_variability_field(field)]
 
-    if cg_subtype(table, field) == 'time':
-        rules.append('time')
+    def compute_image_fields(self):
+        image_fields = {}
+        for fk in self.foreign_keys.values():
+            if fk['table'] not in image_fields:
+                image_fields[fk['table']] = image_field(fk['table'])
+        return image_fields
 
-    if cg_subtype(table, field) == 'csv_int':
-        reg_expr = True
-        rules.append(r'regex:(\d+),?')
+    def high_variability_field(self, field):
+        if field_is_primary_key(self.table, field):
+            return False
+        if field_is_unique(self.table, field):
+            return False
+        if self.descriptors[field].base_type in ['tinyint', 'enum']:
+            return False
+        if field in self.foreign_keys:
+            return False
+        return True
 
-    if cg_subtype(table, field) == 'csv_string':
-        reg_expr = True
-        # 'regex:/(^([a-zA-Z]+)(\d+)?$)/u'
-        # 'regex://\'(.+?)\'|\"(.+?)\"'
-        rx = 'regex:/' + "\\\'(.+?)\\\'"  + '|' + '\\\"(.+?)\\\"' +   '/'
-        rules.append(rx)
+    def descriptor(self, field):
+        return self.descriptors[field]
 
-    if field_base_type(table, field) == 'enum':
-        values = field_enum_values(table, field)
-        rules.append('in:' + ",".join(values))
+    def foreign_key(self, field):
+        return self.foreign_keys.get(field)
 
-    if field_foreign_key(table, field):
-        fk = field_foreign_key(table, field)
-        rules.append('exists:' + fk['table'] + ',' + fk['field'])
+    # cg_subtype keeps the subtypes of the fields already resolved
+    def subtype(self, field):
+        return cg_subtype(self.table, field)
 
-    if (reg_expr):
-        rules_list = '[' + ", ".join( '"' + rule + '"' for rule in rules) + ']'
-        return f"\"{field}\" => " +  rules_list + ","
-    else:
-        rules_list = "|".join(rules)      
-        return f"\"{field}\" => '" +  rules_list + "',"
+    def __repr__(self):
+        return f"TableContext({self.table})"
 
 """
-    Return the list of validation rules for the fillable fields of a table
+    return the context of a table, it is computed on first use and kept
+    until the table is reloaded or reset_table_context is called
 """
-def validation_rules(table, ntabs = 3, create = True):
-    flist = fillable_list(table)
-    res = ""
-    tabs = "\t"*int(ntabs)
-    cnt = 0
-    for field in flist:
-        if (cnt):
-            res = res + tabs
-        res = res + create_validation_rule(table, field, create) + "\n"
-        cnt = cnt + 1
-    return res
-
-def create_validation_rules(table, ntabs = 4):
-    return validation_rules(table, ntabs, True)
+def table_context(table):
+    contexts = current_schema().cache('table_context')
+    if table not in contexts:
+        contexts[table] = TableContext(table)
+    return contexts[table]
 
 """
-    Return the list of validation rules for the fillable fields of a table
+    Forget the context of a table, template_engine.process calls it
+    so that every file is generated from a fresh context
 """
-def update_validation_rules(table, ntabs = 4):
-    return validation_rules(table, ntabs, False)
+def reset_table_context(table):
+    current_schema().cache('table_context').pop(table, None)
 
 """
-    set element attributes
-"""
-def create_set_attributes(table, ntabs = 3):
-    flist = fillable_list(table)
-    res = ""
-    tabs = "\t"*int(ntabs)
-    cnt = 0
-    for field in flist:
-        if (cnt):
-            res = res + tabs
-        res = res + '$element->' + field + ' = $request->' + field + ";\n"
-        cnt = cnt + 1
-    return res
+    Type mapping rules
 
-"""
-    set element attributes
+    The generators describe how a field is translated (validation rules, faker
+    expressions, form inputs) with tables of rules (base type, subtype, value),
+    None matches any base type or subtype:
 
-    to test it:
-    snp -t boards -f name update_set_attributes
-"""
-def update_set_attributes(table, ntabs=3):
-    flist = fillable_list(table)
-    res = ""
-    tabs = "\t"*int(ntabs)
-    cnt = 0
-    for field in flist:
-        if (cnt):
-            res = res + tabs
-        res = res + "if ($request->exists('" + field + "')) {" + "\n"
-        res = res + tabs + "\t" + '$element->' + field + ' = $request->' + field + ";\n"
-        res = res + tabs + '}' + "\n"
-        cnt = cnt + 1
-    return res
+        ('varchar', None, ['string', 'max:{size}'])
+        (None, 'email', ['email'])
 
+    The rules are indexed when they are declared and the value for a (base type,
+    subtype) pair is kept after the first lookup, every field is a dictionary hit.
+
+    In 'first' mode the value of the first matching rule is used, in 'all' mode
+    the values (lists) of all the matching rules are concatenated in order.
+
+    A project can change a mapping without patching the generators:
+
+        override_type_rules('factory', [(None, 'phone', "$this->faker->phoneNumber")])
 """
-    when the primary key is not bigint('id') we must declare it
-"""
-def primary_key_declaration(table):
-    flist = field_list(table)
-    for field in flist:
-        if field_is_primary_key(table, field):
-            if (field == 'id'):
-                return ""
-            else:
-                res = f"protected $primaryKey = '{field}';"
-                if (field_base_type(table, field) == 'varchar'):
-                    res = res + "\n\t" + "protected $keyType = 'string';"
-                return res
-    return ""
+type_rules = {}     # type_rules[name] = {'rules', 'mode', 'index', 'lookup'}
+
+def declare_type_rules(name, rules, mode = 'first'):
+    index = {}
+    for position, (base_type, subtype, value) in enumerate(rules):
+        index.setdefault((base_type, subtype), []).append((position, value))
+    type_rules[name] = {'rules': list(rules), 'mode': mode, 'index': index, 'lookup': {}}
+    # the memoized snippets computed with other rules are not used
+    set_memo_dependency('type_rules ' + name, hashlib.sha1(repr((mode, rules)).encode()).hexdigest())
 
 """
-    return a list of models referenced by a factory
+    Add rules before the ones of a mapping, they take precedence
 """
-def factory_referenced_models(table):
-    flist = fillable_list(table)
-    res = ""
-    for field in flist:
-        if field_foreign_key(table, field):
-            fk = field_foreign_key(table, field)
-            model = cg_class(fk['table'])
-            res = res + f"use App\\Models\\{model};\n"
-    return res
+def override_type_rules(name, rules):
+    declare_type_rules(name, list(rules) + type_rules[name]['rules'], type_rules[name]['mode'])
 
 """
-    return a faker line for a field
+    return the value of a mapping for a base type and a subtype,
+    None in 'first' mode when no rule matches
 """
-def factory_field(table, field):
+def type_rule(name, base_type, subtype):
+    mapping = type_rules[name]
+    lookup = mapping['lookup']
+    if (base_type, subtype) in lookup:
+        return lookup[(base_type, subtype)]
 
-    subtype = cg_subtype(table, field)
-    # print(table, field, f"subtype: {subtype}")
+    index = mapping['index']
+    matches = []
+    for key in {(base_type, subtype), (base_type, None), (None, subtype), (None, None)}:
+        matches += index.get(key, [])
+    matches.sort(key=lambda match: match[0])
 
-    unique = 'unique()->' if (field_is_unique(table, field)) else ''
-
-    if (field_meta(table, field, 'faker')):
-        return f"'{field}' => $this->faker->{unique}{field_meta(table, field, 'faker')},"
-    
-    # this one needs to be confirmed after some experiment, it could match
-    # too many cases
-    if ('name' in field):
-        return f"'{field}' => $this->faker->{unique}name,"        
-
-    if subtype == 'email':
-        return f"'{field}' => $this->faker->{unique}safeEmail,"
-    
-    
-    if subtype == 'csv_string':
-        size = field_size(table, field)
-        nb = 6
-        return f"'{field}' => $this->faker->csv_string({nb}),"
-    
-    if field_foreign_key(table, field):
-        fk = field_foreign_key(table, field)
-        target_table = fk['table']
-        target_model = cg_class(target_table)
-        target_key = cg_primary_key(target_table)
-        return f"'{field}' => {target_model}::inRandomOrder()->first()->{target_key},"
-    
-    if field_base_type(table, field) == 'varchar':
-        size = field_size(table, field)
-        nb = int(size / 15)
-        return f"'{field}' => $this->faker->{unique}sentence({nb}),"
-    
-    if field_base_type(table, field) == 'int':
-        return f"'{field}' => $this->faker->randomNumber(5),"
-    
-    if field_base_type(table, field) == 'tinyint':
-        return f"'{field}' => $this->faker->boolean,"
-    
-    if field_base_type(table, field) == 'enum':
-        values = field_enum_values(table, field)
-        return f"'{field}' => $this->faker->randomElement({values}),"
-    
-    if field_base_type(table, field) == 'date':
-        return f"'{field}' => $this->faker->date(),"
-    
-    if field_base_type(table, field) == 'time':
-        return f"'{field}' => $this->faker->time(),"
-    
-    if field_base_type(table, field) == 'datetime':
-        return f"'{field}' => $this->faker->dateTime(),"
-    
-    if field_base_type(table, field) == 'timestamp':
-        return f"'{field}' => $this->faker->dateTime(),"
-    
-    if field_base_type(table, field) == 'text':
-        return f"'{field}' => $this->faker->text,"
+    if mapping['mode'] == 'all':
+        value = []
+        for position, values in matches:
+            value += [elt for elt in values if elt not in value]
+    else:
+        value = matches[0][1] if matches else None
+    lookup[(base_type, subtype)] = value
+    return value
+
+def resolve_cg_subtype(table, field):
+    subtype = field_subtype(table, field)
+    if (subtype):
+        return subtype
     
-    return f"'{field}' => $this->faker->{unique}word,"
+    if ('mail' in field):
+        return 'email'
+    if ('password' in field):
+        return 'password'
+    if ('date' in field):
+        return 'date'
+    if ('time' in field):
+        return 'time'
+    if ('url' in field):
+        return 'url'
+    if ('phone' in field):
+        return 'phone'
+    if ('image' in field):
+        return 'image'
+    if ('file' in field):
+        return 'file'
 
+    if (field_type(table, field) == 'tinyint(1)'):
+        return 'boolean'    
 
-"""
-    return a list of fields creation methods for a factory
-"""
-def factory_field_list(table, indent=3):
-    flist = fillable_list(table)
-    res = ""
-    cnt = 0
-    tabs = "\t"*indent
-    for field in flist:
-        if (cnt): res = res + tabs
-        res = res + factory_field(table, field) + "\n"
-        cnt = cnt + 1
-    return res
+    return None
+    
 
 """
-    return a list of cells to include in a data grid view
+    Return a comma separated list of fields with double quotes for a given table
 """
-def field_list_cells(table, indent=3):
-    flist = fillable_list(table)
-    res = ""
-    cnt = 0
-    tabs = "\t"*indent
-    for field in flist:
-        if (cnt): res = res + tabs
-        subtype = cg_subtype(table, field)
-        res = res + '<td> <Cell value={' + cg_element(table) + '.' + field 
-        res += '} subtype="' + subtype 
-        res += '" table="' + table + '" field="' + field + '"> </Cell></td>' + "\n"
-
-        cnt = cnt + 1
-    return res
+@snippet("List of fields with double quotes, separated by commas")
+def csv_fields(table):
+    list = field_list(table)
+    list_with_quotes = [f"\"{x}\"" for x in list]
+    return ", ".join(list_with_quotes)
 
 """
-    return a list of titles for a data grid viex
+    Return a list of fillable fields for a given table
 """
-def field_list_titles(table, indent=3):
-    flist = fillable_list(table)
-    res = ""
-    cnt = 0
-    tabs = "\t"*indent
-    for field in flist:
-        if (cnt): res = res + tabs + '                    '
-        res = res + '<th align="left">{t("'+ table +':'+ field +'.label")}</th>' + "\n"
-        cnt = cnt + 1
-    return res
+@snippet("List of the fillable fields", template=False)
+def fillable_list(table):
+    return list(table_context(table).fillable)
 
-"""
-    return an input filed for an enum field
-"""
-def enum_input_form_values(table, field) -> str:
-    res = ""
-    values = field_enum_values(table, field)
+@snippet("List of the high variability fields", template=False)
+def high_variability_list(table):
+    return list(table_context(table).high_variability)
 
-    res += 'values: { '
-    for value in values:
-        res +=   value + ":t('" + table + ':' + field + '.value.' + value 
-        res += "','" + value + "'), "
-    res += '},'
-    return res
+@snippet("CSV high variability fields (can be randomly drawn)")
+def csv_high_variability_fields(table):
+    list = high_variability_list(table)
+    list_with_quotes = [f"\"{x}\"" for x in list]
+    return ", ".join(list_with_quotes)
 
 """
     return the image for a table
 """
+@snippet("Image field of the table", template=False)
 def image_field(table):
     tm = table_meta(table)
-    print (tm)
     if tm:
         if 'imageField' in tm:
             return tm['imageField']
     return 'image'
-                         
-"""
-    return an input for a field
-"""
-def field_input_form(table, field, indent=2):
-    res = ""
-    tabs = "\t"*indent
-    subtype = cg_subtype(table, field)
-    fk = field_foreign_key(table, field)
-
-    trans_key = table + ':' + field
-    label_key = trans_key + '.label'
-    placeholder_key = trans_key + '.placeholder'
-    title_key = trans_key + '.title'
-
-    trans = 't("' + label_key + '", "")'
-    title = 't("' + title_key + '", "")'
-    placeholder = 't("' + placeholder_key + '", "")'
-    
-    res += tabs + '<FieldInput descriptor=\{\{' + "\n"
-    res += tabs + "\t" + "field: '" + field + "'," + "\n"
-    res += tabs + "\t" + "subtype: '" + subtype + "'," + "\n"
-    res += tabs + "\t" + 'label: ' + trans + ',' + "\n"
-    res += tabs + "\t" + 'title: ' + title + ',' + "\n"
-    res += tabs + "\t" + 'placeholder: ' + placeholder + ',' + "\n"
-    if (subtype == 'enum'):
-        res += tabs + "\t" + enum_input_form_values(table, field) + "\n"
-    if (fk):
-        res += tabs + "\t" + 'target_table: "' + fk['table'] + '",' + "\n"
-        res += tabs + "\t" + 'target_field: "' + fk['field'] + '",' + "\n"
-        res += tabs + "\t" + 'imageField: "' + image_field(fk['table']) + '",' + "\n"    
-    res += tabs + "\t" + 'error:inputErrorList.' + field + "\n"
-    res += tabs + '\}\} value={formData.' + field + '} onChange={onChange} />' + "\n"
-
-    return res
-
-"""
-    return a list of field inputs to include in a form
-"""
-def field_list_input_form(table, indent=2):
-    flist = fillable_list(table)
-    res = ""
-    cnt = 0
-    tabs = "\t"*indent
-    res += tabs + '<Row className="align-items-center">' + "\n"
-    nb_col_per_row = 4
-    for field in flist:
-
-        if (cnt and (cnt % nb_col_per_row == 0)):
-            res += tabs + '</Row>' + "\n"*2
-            res += tabs + '<Row className="align-items-center">' + "\n"
-        
-        res = res + tabs + "\t"
-        res = res + '<Col sm={6} md={6} lg={3}>' + "\n"
-
-        res += field_input_form(table, field, indent+2)
-
-        res = res + tabs + "\t"
-        res = res + '</Col>' + "\n"*2
-
-        cnt = cnt + 1
-
-    res += tabs + '</Row>' + "\n"
-    return res
-
-"""
-    return a list of field to initialize in a form
-"""
-def set_form_data(table, indent=5):
-    flist = fillable_list(table)
-    res = ""
-    cnt = 0
-    tabs = "\t"*indent
-    for field in flist:
-        subtype = cg_subtype(table, field)
-
-        if (cnt): res = res + tabs
-        res = res + field
-        if (subtype == 'boolean'):
-            res = res + ': false'
-        else:
-            res = res +  ": ''"
-        if (cnt < len(flist) - 1):
-            res = res + ","
-        res += "\n"
-
-        cnt = cnt + 1
-    return res
-
-"""
-    $query->join('boards', 'columns.board_id', '=', 'boards.name');
-    $query->select('columns.*', 'boards.name as board_id_image');
-"""
-def join_for_images(table, indent=3):
-    tabs = "\t"*indent
-    res = ""
-    select = []
-    select.append(table + '.*')
-    flist = fillable_list(table)
-
-    for field in flist:
-        fk = field_foreign_key(table, field)
-        if (fk):
-            res += f"$query->join('{fk['table']}', '{table}.{field}', '=', '{fk['table']}.{fk['field']}');\n" + tabs
-            str = fk['table'] + '.' + fk['field'] + ' as ' +  field + '_image'
-            select.append(str)
-
-    if (len(select) < 2):
-        return ""
-
-    res = res + "$query->select('" + "', '".join(select) + "');"
-    return res
\ No newline at end of file
@@ -0,0 +1,404 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+
+import re
+
+"""
+Read a database schema from a mysqldump file
+
+The CREATE TABLE statements give the columns, keys and foreign keys, the
+INSERT statements into the metadata table give the metadata. The result uses
+the layout of the introspection queries of lib.schema so that a Schema can be
+filled without any MySQL server:
+
+    columns[table] = [(field, type, collation, null, key, default, extra, privileges, comment)]
+    foreign = [(database, constraint, table, field, referenced table, referenced field)]
+    metadata = [(id, table, column, key, value)]
+"""
+
+# quoted strings, identifiers, comments, statement separators and everything else
+statement_reg = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`(?:[^`]|``)*`|--[ \t\r][^\n]*|--(?=\n|$)|#[^\n]*|/\*.*?\*/|[^'"`;/#-]+|.""", re.S)
+
+# the same with parenthesis and commas as separate tokens, to analyze lists
+token_reg = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`(?:[^`]|``)*`|--[ \t\r][^\n]*|--(?=\n|$)|#[^\n]*|/\*.*?\*/|[^'"`;/#(),-]+|.""", re.S)
+
+create_reg = re.compile(r'CREATE\s+(?:TEMPORARY\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(`(?:[^`]|``)*`|\w+)(?:\.(`(?:[^`]|``)*`|\w+))?\s*\(', re.I)
+insert_reg = re.compile(r'(?:INSERT|REPLACE)\s+(?:IGNORE\s+)?INTO\s+(`(?:[^`]|``)*`|\w+)(?:\.(`(?:[^`]|``)*`|\w+))?\s*(\([^)]*\))?\s*VALUES\s*', re.I)
+use_reg = re.compile(r'USE\s+(`(?:[^`]|``)*`|\w+)', re.I)
+header_reg = re.compile(r'--.*Database:\s*(\S+)')
+
+column_reg = re.compile(r"""(`(?:[^`]|``)*`|\w+)\s+(\w+)(\s*\((?:'(?:[^'\\]|\\.|'')*'|[^)'])*\))?((?:\s+(?:unsigned|signed|zerofill))*)(.*)$""", re.I | re.S)
+comment_reg = re.compile(r"""\bCOMMENT\s+('(?:[^'\\]|\\.|'')*')""", re.I)
+default_reg = re.compile(r"""\bDEFAULT\s+('(?:[^'\\]|\\.|'')*'|\((?:[^()]|\([^()]*\))*\)|[^\s,]+)""", re.I)
+collate_reg = re.compile(r'\bCOLLATE\s*=?\s*(\w+)', re.I)
+generated_reg = re.compile(r'\bGENERATED\s+ALWAYS\s+AS\s*\(.*\)\s*(VIRTUAL|STORED)?', re.I | re.S)
+key_reg = re.compile(r'(PRIMARY\s+KEY|UNIQUE(?:\s+(?:KEY|INDEX))?|(?:FULLTEXT\s+|SPATIAL\s+)?(?:KEY|INDEX))\s*(?:`(?:[^`]|``)*`|\w+)?\s*(?:USING\s+\w+\s*)?\(((?:[^()]|\([^()]*\))*)\)', re.I)
+foreign_reg = re.compile(r'(?:CONSTRAINT\s+(`(?:[^`]|``)*`|\w+)\s+)?FOREIGN\s+KEY\s*(?:`(?:[^`]|``)*`|\w+)?\s*\(([^)]*)\)\s*REFERENCES\s+(`(?:[^`]|``)*`|\w+)(?:\.(`(?:[^`]|``)*`|\w+))?\s*\(([^)]*)\)', re.I)
+
+text_types = ['char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext', 'enum', 'set']
+
+privileges = 'select,insert,update,references'
+
+"""
+    Split a dump into statements, comments are dropped but the quoted
+    strings are kept as they are
+"""
+def split_statements(text):
+    statements = []
+    current = []
+    for token in statement_reg.findall(text):
+        if token == ';':
+            statement = ''.join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        elif token.startswith('--'):
+            # the dump header gives the database name
+            match = header_reg.match(token)
+            if match:
+                statements.append('-- Database: ' + match.group(1))
+        elif token.startswith('#'):
+            None
+        elif token.startswith('/*'):
+            # /*!40101 ... */ are statements for recent servers, they are not schema information
+            None
+        else:
+            current.append(token)
+
+    statement = ''.join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+"""
+    return the name of an identifier without its back quotes
+"""
+def unquote_name(name):
+    name = name.strip()
+    if name.startswith('`') and name.endswith('`'):
+        return name[1:-1].replace('``', '`')
+    return name
+
+"""
+    return the value of a quoted SQL string
+"""
+escapes = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+
+def unquote_string(value):
+    quote = value[0]
+    value = value[1:-1].replace(quote + quote, quote)
+    if '\\' not in value:
+        return value
+
+    result = []
+    i = 0
+    while i < len(value):
+        c = value[i]
+        if c == '\\' and i + 1 < len(value):
+            i += 1
+            c = escapes.get(value[i], value[i])
+        result.append(c)
+        i += 1
+    return ''.join(result)
+
+"""
+    Split a list at the commas which are not inside parenthesis or quotes
+"""
+def split_list(text):
+    items = []
+    current = []
+    depth = 0
+    for token in token_reg.findall(text):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif token == ',' and depth == 0:
+            items.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(token)
+
+    item = ''.join(current).strip()
+    if item:
+        items.append(item)
+    return items
+
+"""
+    return the column names of an index definition, prefix lengths are removed
+"""
+def key_columns(text):
+    return [unquote_name(re.sub(r'\s*\(\d+\)', '', column).split()[0]) for column in split_list(text)]
+
+"""
+    return the text between the parenthesis which starts at position start
+"""
+def parenthesis_content(text, start):
+    depth = 0
+    position = start
+    for token in token_reg.findall(text, start):
+        position += len(token)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+            if depth == 0:
+                return text[start + 1:position - 1], position
+    return text[start + 1:position], position
+
+"""
+    Analyze a column definition
+
+    returns (field, type, collation, null, key, default, extra, privileges, comment),
+    the key is completed with the index definitions of the table
+"""
+def parse_column(definition, table_collation):
+    match = column_reg.match(definition)
+    if not match:
+        return None
+
+    name = unquote_name(match.group(1))
+    type = match.group(2).lower()
+    if match.group(3):
+        type = type + match.group(3).strip()
+    if match.group(4).strip():
+        type = type + ' ' + ' '.join(match.group(4).lower().split())
+    rest = match.group(5)
+    upper = rest.upper()
+
+    # the regular expressions are only run when the keyword is present
+    comment = ''
+    match = comment_reg.search(rest) if 'COMMENT' in upper else None
+    if match:
+        comment = unquote_string(match.group(1))
+        rest = rest[:match.start()] + rest[match.end():]
+
+    default = None
+    match = default_reg.search(rest) if 'DEFAULT' in upper else None
+    if match:
+        value = match.group(1)
+        if value.startswith("'"):
+            default = unquote_string(value)
+        elif value.upper() != 'NULL':
+            default = value
+        rest = rest[:match.start()] + rest[match.end():]
+
+    collation = None
+    match = collate_reg.search(rest) if 'COLLATE' in upper else None
+    if match:
+        collation = match.group(1)
+    elif base_type(type) in text_types:
+        collation = table_collation
+
+    upper = rest.upper()
+    null = 'NO' if re.search(r'\bNOT\s+NULL\b', upper) else 'YES'
+
+    extra = []
+    if 'AUTO_INCREMENT' in upper:
+        extra.append('auto_increment')
+    match = generated_reg.search(rest) if 'GENERATED' in upper else None
+    if match:
+        extra.append((match.group(1) or 'VIRTUAL').upper() + ' GENERATED')
+    match = re.search(r'\bON\s+UPDATE\s+(\w+(?:\(\d*\))?)', rest, re.I) if 'UPDATE' in upper else None
+    if match:
+        extra.append('on update ' + match.group(1))
+
+    key = ''
+    if re.search(r'\bPRIMARY\s+KEY\b', upper):
+        key = 'PRI'
+        null = 'NO'
+    elif re.search(r'\bUNIQUE\b', upper):
+        key = 'UNI'
+
+    return [name, type, collation, null, key, default, ' '.join(extra), privileges, comment]
+
+"""
+    return the type with no size nor attributes
+"""
+def base_type(type):
+    return re.split(r'[\s(]', type, 1)[0]
+
+"""
+    Analyze a CREATE TABLE statement
+
+    returns the table name, the list of columns and the foreign keys
+"""
+def parse_create_table(statement, database):
+    match = create_reg.match(statement)
+    if match.group(2):
+        database = unquote_name(match.group(1))
+        table = unquote_name(match.group(2))
+    else:
+        table = unquote_name(match.group(1))
+
+    body, end = parenthesis_content(statement, match.end() - 1)
+    options = statement[end:]
+    table_collation = None
+    match = collate_reg.search(options)
+    if match:
+        table_collation = match.group(1)
+
+    columns = []
+    by_name = {}
+    foreign = []
+    keys = []   # (kind, columns)
+    for definition in split_list(body):
+        first = definition.split(None, 1)[0].upper() if definition else ''
+        if first in ['PRIMARY', 'UNIQUE', 'KEY', 'INDEX', 'FULLTEXT', 'SPATIAL']:
+            match = key_reg.match(definition)
+            if match:
+                keys.append((match.group(1).split()[0].upper(), key_columns(match.group(2))))
+        elif first in ['CONSTRAINT', 'FOREIGN']:
+            match = foreign_reg.match(definition)
+            if match:
+                constraint = unquote_name(match.group(1)) if match.group(1) else ''
+                fields = key_columns(match.group(2))
+                referenced_table = unquote_name(match.group(4) or match.group(3))
+                referenced_fields = key_columns(match.group(5))
+                for field, referenced_field in zip(fields, referenced_fields):
+                    foreign.append((database, constraint, table, field, referenced_table, referenced_field))
+            elif first == 'CONSTRAINT' and re.match(r'CONSTRAINT\s+\S+\s+(PRIMARY|UNIQUE)', definition, re.I):
+                match = key_reg.search(definition)
+                if match:
+                    keys.append((match.group(1).split()[0].upper(), key_columns(match.group(2))))
+        elif first == 'CHECK':
+            None
+        else:
+            column = parse_column(definition, table_collation)
+            if column:
+                columns.append(column)
+                by_name[column[0]] = column
+
+    # a column takes the key of the most important index it starts, as SHOW COLUMNS does
+    rank = {'': 0, 'MUL': 1, 'UNI': 2, 'PRI': 3}
+    for kind, fields in keys:
+        if kind == 'PRIMARY':
+            for field in fields:
+                if field in by_name:
+                    by_name[field][4] = 'PRI'
+                    by_name[field][3] = 'NO'
+            continue
+        if not fields or fields[0] not in by_name:
+            continue
+        key = 'UNI' if kind == 'UNIQUE' and len(fields) == 1 else 'MUL'
+        column = by_name[fields[0]]
+        if rank[key] > rank[column[4]]:
+            column[4] = key
+
+    # InnoDB indexes the foreign keys which do not start an index
+    for line in foreign:
+        column = by_name.get(line[3])
+        if column and column[4] == '':
+            column[4] = 'MUL'
+
+    return table, [tuple(column) for column in columns], foreign
+
+"""
+    return the rows of the VALUES part of an INSERT statement
+"""
+def parse_values(text):
+    rows = []
+    row = None
+    value = []
+    depth = 0
+    for match in token_reg.finditer(text):
+        token = match.group(0)
+        if token == '(':
+            depth += 1
+            if depth == 1:
+                row = []
+                value = []
+                continue
+        elif token == ')':
+            depth -= 1
+            if depth == 0:
+                row.append(sql_value(value))
+                rows.append(tuple(row))
+                continue
+        elif token == ',' and depth == 1:
+            row.append(sql_value(value))
+            value = []
+            continue
+        if depth > 0:
+            value.append(token)
+    return rows
+
+"""
+    return the Python value of a literal of a VALUES list
+"""
+def sql_value(tokens):
+    text = ''.join(tokens).strip()
+    if text.startswith("'") or text.startswith('"'):
+        return unquote_string(text)
+    if text.upper() == 'NULL' or text == '':
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+"""
+    return the description of a database, it is created on first use
+"""
+def dump_description(descriptions, database):
+    for description in descriptions:
+        if description['database'] == database:
+            return description
+    description = {'database': database, 'tables': [], 'columns': {}, 'foreign': [], 'metadata': []}
+    descriptions.append(description)
+    return description
+
+# columns of the metadata table, see doc/metadata_table.md
+metadata_columns = ['id', 'table', 'column', 'key', 'value']
+
+"""
+    Analyze a dump, it can hold several databases
+
+    returns a list of descriptions in the order of the dump:
+    {'database', 'tables', 'columns', 'foreign', 'metadata'}
+"""
+def parse_dump(text, database = ''):
+    descriptions = []
+    description = None
+
+    for statement in split_statements(text):
+        if statement.startswith('-- Database: '):
+            if description == None and not database:
+                database = statement[len('-- Database: '):]
+            continue
+
+        match = use_reg.match(statement)
+        if match:
+            database = unquote_name(match.group(1))
+            description = dump_description(descriptions, database)
+            continue
+
+        if create_reg.match(statement):
+            if description == None:
+                description = dump_description(descriptions, database)
+            table, columns, foreign = parse_create_table(statement, description['database'])
+            if table in description['columns']:
+                # the table is created again, its previous foreign keys are forgotten
+                description['foreign'] = [line for line in description['foreign'] if line[2] != table]
+            else:
+                description['tables'].append(table)
+            description['columns'][table] = columns
+            description['foreign'] += foreign
+            continue
+
+        match = insert_reg.match(statement)
+        if match:
+            table = unquote_name(match.group(2) or match.group(1))
+            if table != 'metadata':
+                continue
+            if description == None:
+                description = dump_description(descriptions, database)
+            # without column list the values follow the columns of the CREATE TABLE
+            names = [column[0] for column in description['columns'].get('metadata', [])] or metadata_columns
+            if match.group(3):
+                names = [unquote_name(name) for name in split_list(match.group(3)[1:-1])]
+            for row in parse_values(statement[match.end():]):
+                values = dict(zip(names, row))
+                description['metadata'].append(tuple(values.get(name) for name in metadata_columns))
+
+    return descriptions
@@ -0,0 +1,129 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+
+"""
+Compare two descriptions of a database schema
+
+The schemas can be fetched from the database or read from snapshots or dump
+files. The result is a list of changes, every change is a dictionary that
+can be serialized in json:
+
+    {'change': 'table_added', 'table': 'boards'}
+    {'change': 'field_changed', 'table': 'boards', 'field': 'name', 'attribute': 'type', 'old': 'varchar(64)', 'new': 'varchar(128)'}
+
+change is one of table_added, table_removed, field_added, field_removed,
+fields_reordered, field_changed, foreign_key_added, foreign_key_removed,
+foreign_key_changed, metadata_changed and table_metadata_changed.
+"""
+
+# the privileges depend on the user, not on the schema
+compared_attributes = ['type', 'collation', 'null', 'key', 'default', 'extra', 'comment']
+
+"""
+    return the list of changes to go from the old schema to the new one
+"""
+def schema_diff(old, new):
+    changes = []
+    old_tables = old.table_list()
+    new_tables = new.table_list()
+
+    for table in new_tables:
+        if table not in old_tables:
+            changes.append({'change': 'table_added', 'table': table})
+    for table in old_tables:
+        if table not in new_tables:
+            changes.append({'change': 'table_removed', 'table': table})
+
+    for table in new_tables:
+        if table in old_tables:
+            changes += table_diff(old, new, table)
+    return changes
+
+"""
+    return the changes of a table present in both schemas
+"""
+def table_diff(old, new, table):
+    changes = []
+    old_fields = old.field_list(table)
+    new_fields = new.field_list(table)
+
+    for field in new_fields:
+        if field not in old_fields:
+            changes.append({'change': 'field_added', 'table': table, 'field': field})
+    for field in old_fields:
+        if field not in new_fields:
+            changes.append({'change': 'field_removed', 'table': table, 'field': field})
+
+    common = [field for field in new_fields if field in old_fields]
+    if common != [field for field in old_fields if field in new_fields]:
+        changes.append({'change': 'fields_reordered', 'table': table, 'old': old_fields, 'new': new_fields})
+
+    for field in common:
+        old_attributes = old.field_attributes(table, field)
+        new_attributes = new.field_attributes(table, field)
+        for attribute in compared_attributes:
+            if old_attributes.get(attribute) != new_attributes.get(attribute):
+                changes.append({'change': 'field_changed', 'table': table, 'field': field, 'attribute': attribute,
+                                'old': old_attributes.get(attribute), 'new': new_attributes.get(attribute)})
+
+    old_foreign = old.foreign.get(table, {})
+    new_foreign = new.foreign.get(table, {})
+    for field in new_foreign:
+        if field not in old_foreign:
+            changes.append({'change': 'foreign_key_added', 'table': table, 'field': field, 'new': new_foreign[field]})
+        elif old_foreign[field] != new_foreign[field]:
+            changes.append({'change': 'foreign_key_changed', 'table': table, 'field': field, 'old': old_foreign[field], 'new': new_foreign[field]})
+    for field in old_foreign:
+        if field not in new_foreign:
+            changes.append({'change': 'foreign_key_removed', 'table': table, 'field': field, 'old': old_foreign[field]})
+
+    old_metadata = old.metadata.get(table, {})
+    new_metadata = new.metadata.get(table, {})
+    for field in common:
+        for key, old_value, new_value in dict_diff(old_metadata.get(field, {}), new_metadata.get(field, {})):
+            changes.append({'change': 'metadata_changed', 'table': table, 'field': field, 'key': key, 'old': old_value, 'new': new_value})
+
+    for key, old_value, new_value in dict_diff(old.table_meta(table) or {}, new.table_meta(table) or {}):
+        changes.append({'change': 'table_metadata_changed', 'table': table, 'key': key, 'old': old_value, 'new': new_value})
+    return changes
+
+"""
+    return the (key, old value, new value) of the keys which differ between two dictionaries,
+    the value is None when the key is missing
+"""
+def dict_diff(old, new):
+    result = []
+    for key in new:
+        if key not in old or old[key] != new[key]:
+            result.append((key, old.get(key), new[key]))
+    for key in old:
+        if key not in new:
+            result.append((key, old[key], None))
+    return result
+
+"""
+    return the tables whose generated code has to be rebuilt after the changes
+
+    The code of a table also depends on the tables referenced by its foreign keys
+    (model relations, factories, joins), so the tables which reference a changed
+    table are affected too. Removed tables have nothing to regenerate.
+
+    The result is per table, every code of an affected table is generated again:
+    the templates belong to the project, the parts of the schema they read are not known.
+"""
+def affected_tables(changes, schema):
+    changed = []
+    for change in changes:
+        if change['table'] not in changed:
+            changed.append(change['table'])
+
+    result = []
+    for table in schema.table_list():
+        if table in changed:
+            result.append(table)
+        else:
+            for referenced in schema.referenced_tables(table):
+                if referenced in changed:
+                    result.append(table)
+                    break
+    return result
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import os
+import sys
+import importlib
+from lib.snippets import *
+from lib.memo import set_memo_dependency, generator_version
+
+"""
+    Code generators
+
+    A generator is a module which registers the snippets of one target (Laravel
+    API, React client, ...). The generators are imported on demand, the first
+    time a snippet is not found in the registry, so a run which only selects
+    the Laravel generator never imports the React one.
+
+    The generators are selected with -g/--generator or the CG_GENERATOR environment
+    variable, names separated by commas. A name which is not a known generator is
+    a module path, it is imported to register its snippets:
+
+        snp -g laravel guarded boards
+        tpl -g laravel,my_generators.vue -tp templates/Component.vue -t boards
+
+    By default all the known generators are available.
+"""
+
+generators = {          # generators[name] = module
+    'laravel': 'lib.generators.laravel',
+    'react': 'lib.generators.react'
+}
+
+selection = []      # modules of the selected generators
+
+"""
+    Declare a generator, its module is imported when one of its snippets is used
+"""
+def register_generator(name, module):
+    generators[name] = module
+
+"""
+    Select the generators whose snippets can be used
+
+    names is a list of generator names or module paths. The snippets of the
+    generators which are not selected stay in the registry, find_snippet
+    ignores them, so a generator can be selected again later.
+"""
+def select_generators(names):
+    selected = []
+    for name in names:
+        if name in generators:
+            selected.append(generators[name])
+        else:
+            selected.append(name)
+            importlib.import_module(name)
+            # a custom module can change the rules of the other generators
+            set_memo_dependency('generator ' + name, generator_version(name))
+
+    selection[:] = selected
+    return selected
+
+"""
+    check if a snippet belongs to one of the generators, the snippets shared by
+    the generators and the ones of undeclared modules are always available
+"""
+def generator_allowed(entry, modules):
+    if entry.module in modules:
+        return True
+    return entry.module not in generators.values()
+
+"""
+    return a snippet of the generators, None when it is unknown or when its
+    generator is not in modules (the selected generators by default)
+
+    The generators of modules which are not imported yet are imported the
+    first time a snippet is not found in the registry.
+"""
+def find_snippet(name, modules = None):
+    if modules == None:
+        modules = selection
+    entry = get_snippet(name)
+    if entry == None:
+        for module in modules:
+            if module not in sys.modules:
+                importlib.import_module(module)
+        entry = registry.get(name)
+    if entry == None or not generator_allowed(entry, modules):
+        return None
+    return entry
+
+"""
+    return the names of the snippets of the generators, they are imported
+"""
+def generator_snippet_names(modules = None, template_only = False):
+    if modules == None:
+        modules = selection
+    for module in modules:
+        importlib.import_module(module)
+    return [name for name in snippet_names(template_only)
+            if name not in registry or generator_allowed(registry[name], modules)]
+
+"""
+    Select the generators of the -g/--generator argument or of the CG_GENERATOR
+    environment variable
+"""
+def check_generator_args(args):
+    names = args.generator if 'generator' in args and args.generator else os.environ.get('CG_GENERATOR', '')
+    if not names:
+        return select_generators(list(generators))
+    try:
+        return select_generators([name.strip() for name in names.split(',') if name.strip()])
+    except ModuleNotFoundError as e:
+        print("unknown generator", e.name)
+        exit(1)
+
+"""
+    Import the generators, to use their functions directly
+"""
+def load_generators(names = None):
+    for name in names or list(generators):
+        importlib.import_module(generators.get(name, name))
+
+# all the generators are available until some are selected
+select_generators(list(generators))
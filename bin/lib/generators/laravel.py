@@ -0,0 +1,257 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+from lib.code_generator import *
+
+"""
+    laravel.py
+
+    Generate code for Laravel RESTful API: models, controllers, validation rules and factories
+"""
+
+"""
+    Return a comma separated list of not fillable (guarded) fields with double quotes for a given table
+"""
+@snippet("CSV list of guarded fields")
+def guarded(table):
+    list = table_context(table).guarded
+    list_with_quotes = [f"\"{x}\"" for x in list]
+    return ", ".join(list_with_quotes)
+
+"""
+    Validation rules of a field by base type and subtype, all the matching
+    rules are used. {size} and {enum} are replaced by the size of the field
+    and the list of the enum values.
+"""
+declare_type_rules('validation', [
+    ('varchar', None, ['string', 'max:{size}']),
+    (None, 'email', ['email']),
+    (None, 'boolean', ['boolean']),
+    ('boolean', None, ['boolean']),
+    (None, 'date', ['date']),
+    (None, 'time', ['time']),
+    (None, 'csv_int', [r'regex:(\d+),?']),
+    # 'regex:/(^([a-zA-Z]+)(\d+)?$)/u'
+    # 'regex://\'(.+?)\'|\"(.+?)\"'
+    (None, 'csv_string', ['regex:/' + "\\\'(.+?)\\\'"  + '|' + '\\\"(.+?)\\\"' +   '/']),
+    ('enum', None, ['in:{enum}'])
+], 'all')
+
+"""
+    Return the validation rule for one field
+"""
+@snippet("Validation rule of a field, require a field name parameter", template=False)
+def create_validation_rule(table, field, create = True):
+
+    context = table_context(table)
+    descriptor = context.descriptor(field)
+    rules = []
+    if (not descriptor.nullable) and create:
+        rules.append('required')
+
+    for rule in type_rule('validation', descriptor.base_type, context.subtype(field)):
+        if '{' in rule:
+            rule = rule.replace('{size}', str(descriptor.size))
+            rule = rule.replace('{enum}', ",".join(descriptor.enum_values or []))
+        rules.append(rule)
+
+    fk = context.foreign_key(field)
+    if fk:
+        rules.append('exists:' + fk['table'] + ',' + fk['field'])
+
+    # the regular expressions can contain | and are written as a list
+    if any(rule.startswith('regex:') for rule in rules):
+        rules_list = '[' + ", ".join( '"' + rule + '"' for rule in rules) + ']'
+        return f"\"{field}\" => " +  rules_list + ","
+    else:
+        rules_list = "|".join(rules)      
+        return f"\"{field}\" => '" +  rules_list + "',"
+
+"""
+    Return the list of validation rules for the fillable fields of a table
+"""
+@snippet("Validation rules", template=False)
+def validation_rules(table, ntabs = 3, create = True):
+    flist = table_context(table).fillable
+    res = ""
+    tabs = "\t"*int(ntabs)
+    cnt = 0
+    for field in flist:
+        if (cnt):
+            res = res + tabs
+        res = res + create_validation_rule(table, field, create) + "\n"
+        cnt = cnt + 1
+    return res
+
+@snippet("Create validation rules")
+def create_validation_rules(table, ntabs = 4):
+    return validation_rules(table, ntabs, True)
+
+"""
+    Return the list of validation rules for the fillable fields of a table
+"""
+@snippet("Update validation rules")
+def update_validation_rules(table, ntabs = 4):
+    return validation_rules(table, ntabs, False)
+
+"""
+    set element attributes
+"""
+@snippet("create_set_attributes")
+def create_set_attributes(table, ntabs = 3):
+    flist = table_context(table).fillable
+    res = ""
+    tabs = "\t"*int(ntabs)
+    cnt = 0
+    for field in flist:
+        if (cnt):
+            res = res + tabs
+        res = res + '$element->' + field + ' = $request->' + field + ";\n"
+        cnt = cnt + 1
+    return res
+
+"""
+    set element attributes
+
+    to test it:
+    snp -t boards -f name update_set_attributes
+"""
+@snippet("update_set_attributes")
+def update_set_attributes(table, ntabs=3):
+    flist = table_context(table).fillable
+    res = ""
+    tabs = "\t"*int(ntabs)
+    cnt = 0
+    for field in flist:
+        if (cnt):
+            res = res + tabs
+        res = res + "if ($request->exists('" + field + "')) {" + "\n"
+        res = res + tabs + "\t" + '$element->' + field + ' = $request->' + field + ";\n"
+        res = res + tabs + '}' + "\n"
+        cnt = cnt + 1
+    return res
+
+"""
+    when the primary key is not bigint('id') we must declare it
+"""
+@snippet("primary_key_declaration")
+def primary_key_declaration(table):
+    flist = field_list(table)
+    for field in flist:
+        if field_is_primary_key(table, field):
+            if (field == 'id'):
+                return ""
+            else:
+                res = f"protected $primaryKey = '{field}';"
+                if (field_base_type(table, field) == 'varchar'):
+                    res = res + "\n\t" + "protected $keyType = 'string';"
+                return res
+    return ""
+
+"""
+    return a list of models referenced by a factory
+"""
+@snippet("factory_referenced_models")
+def factory_referenced_models(table):
+    context = table_context(table)
+    res = ""
+    for field in context.fillable:
+        fk = context.foreign_key(field)
+        if fk:
+            model = cg_class(fk['table'])
+            res = res + f"use App\\Models\\{model};\n"
+    return res
+
+"""
+    Faker expressions by base type and subtype, the first matching rule is used.
+    {unique} is replaced by unique()-> for the unique fields, {words} by the number
+    of words which fit in a varchar and {values} by the enum values, the other
+    braces are kept (PHP closures, {$x}). The foreign keys pick a random element
+    of the referenced table.
+"""
+declare_type_rules('factory', [
+    (None, 'email', "$this->faker->{unique}safeEmail"),
+    (None, 'csv_string', "$this->faker->csv_string(6)"),
+    ('varchar', None, "$this->faker->{unique}sentence({words})"),
+    ('int', None, "$this->faker->randomNumber(5)"),
+    ('tinyint', None, "$this->faker->boolean"),
+    ('enum', None, "$this->faker->randomElement({values})"),
+    ('date', None, "$this->faker->date()"),
+    ('time', None, "$this->faker->time()"),
+    ('datetime', None, "$this->faker->dateTime()"),
+    ('timestamp', None, "$this->faker->dateTime()"),
+    ('text', None, "$this->faker->text"),
+    (None, None, "$this->faker->{unique}word")
+])
+
+"""
+    return a faker line for a field
+"""
+@snippet("Factory definition of a field, require a field name parameter", template=False)
+def factory_field(table, field):
+
+    context = table_context(table)
+    descriptor = context.descriptor(field)
+
+    unique = 'unique()->' if (field_is_unique(table, field)) else ''
+
+    if (field_meta(table, field, 'faker')):
+        return f"'{field}' => $this->faker->{unique}{field_meta(table, field, 'faker')},"
+    
+    # this one needs to be confirmed after some experiment, it could match
+    # too many cases
+    if ('name' in field):
+        return f"'{field}' => $this->faker->{unique}name,"        
+
+    fk = context.foreign_key(field)
+    if fk:
+        target_table = fk['table']
+        target_model = cg_class(target_table)
+        target_key = cg_primary_key(target_table)
+        return f"'{field}' => {target_model}::inRandomOrder()->first()->{target_key},"
+
+    expression = type_rule('factory', descriptor.base_type, context.subtype(field))
+    expression = expression.replace('{unique}', unique)
+    expression = expression.replace('{words}', str(int(descriptor.size / 15)))
+    expression = expression.replace('{values}', str(descriptor.enum_values))
+    return f"'{field}' => " + expression + ","
+
+
+"""
+    return a list of fields creation methods for a factory
+"""
+@snippet("factory_field_list")
+def factory_field_list(table, indent=3):
+    flist = table_context(table).fillable
+    res = ""
+    cnt = 0
+    tabs = "\t"*indent
+    for field in flist:
+        if (cnt): res = res + tabs
+        res = res + factory_field(table, field) + "\n"
+        cnt = cnt + 1
+    return res
+
+"""
+    $query->join('boards', 'columns.board_id', '=', 'boards.name');
+    $query->select('columns.*', 'boards.name as board_id_image');
+"""
+@snippet("join_for_images")
+def join_for_images(table, indent=3):
+    tabs = "\t"*indent
+    res = ""
+    select = []
+    select.append(table + '.*')
+    context = table_context(table)
+
+    for field in context.fillable:
+        fk = context.foreign_key(field)
+        if (fk):
+            res += f"$query->join('{fk['table']}', '{table}.{field}', '=', '{fk['table']}.{fk['field']}');\n" + tabs
+            str = fk['table'] + '.' + fk['field'] + ' as ' +  field + '_image'
+            select.append(str)
+
+    if (len(select) < 2):
+        return ""
+
+    res = res + "$query->select('" + "', '".join(select) + "');"
+    return res
@@ -0,0 +1,184 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+from lib.code_generator import *
+
+"""
+    react.py
+
+    Generate code for the React web site client: data grids, input forms and translations
+"""
+
+"""
+    Return list of fields with their translation for a given table
+"""
+@snippet("Initialize translations strings")
+def field_list_translation(table):
+    context = table_context(table)
+    list = context.fillable
+    res = ""
+    for field in list:
+        trans = field.capitalize().replace('_', ' ')
+
+        res += '    "' + field + '.label": "' + trans + '",' + "\n"
+        res += '    "' + field + '.placeholder": "'  + '",' + "\n"
+        res += '    "' + field + '.title": "'  + '",' + "\n"
+
+        subtype = context.subtype(field)
+        if (subtype == 'enum'):
+            values = field_enum_values(table, field)
+            for value in values:
+                str_value = value.capitalize().replace('_', ' ')
+                res += '    "' + field + '.value.' + value + '": "' + str_value + '",' + "\n"
+    res += '    "last": "Last"' 
+    return res
+
+
+"""
+    return a list of cells to include in a data grid view
+"""
+@snippet("field_list_cells")
+def field_list_cells(table, indent=3):
+    context = table_context(table)
+    flist = context.fillable
+    res = ""
+    cnt = 0
+    tabs = "\t"*indent
+    for field in flist:
+        if (cnt): res = res + tabs
+        subtype = context.subtype(field)
+        res = res + '<td> <Cell value={' + cg_element(table) + '.' + field 
+        res += '} subtype="' + subtype 
+        res += '" table="' + table + '" field="' + field + '"> </Cell></td>' + "\n"
+
+        cnt = cnt + 1
+    return res
+
+"""
+    return a list of titles for a data grid viex
+"""
+@snippet("field_list_titles")
+def field_list_titles(table, indent=3):
+    flist = table_context(table).fillable
+    res = ""
+    cnt = 0
+    tabs = "\t"*indent
+    for field in flist:
+        if (cnt): res = res + tabs + '                    '
+        res = res + '<th align="left">{t("'+ table +':'+ field +'.label")}</th>' + "\n"
+        cnt = cnt + 1
+    return res
+
+"""
+    return an input filed for an enum field
+"""
+@snippet("Options of an enum input, require a field name parameter", template=False)
+def enum_input_form_values(table, field) -> str:
+    res = ""
+    values = field_enum_values(table, field)
+
+    res += 'values: { '
+    for value in values:
+        res +=   value + ":t('" + table + ':' + field + '.value.' + value 
+        res += "','" + value + "'), "
+    res += '},'
+    return res
+
+"""
+    Form inputs by base type and subtype, the first matching rule is used:
+    initial value of the field in the form data and enum values in the input descriptor
+"""
+declare_type_rules('form_input', [
+    (None, 'boolean', {'initial': 'false', 'values': False}),
+    (None, 'enum', {'initial': "''", 'values': True}),
+    (None, None, {'initial': "''", 'values': False})
+])
+
+"""
+    return an input for a field
+"""
+@snippet("Input form of a field, require a field name parameter", template=False)
+def field_input_form(table, field, indent=2):
+    res = ""
+    tabs = "\t"*indent
+    context = table_context(table)
+    subtype = context.subtype(field)
+    fk = context.foreign_key(field)
+    rule = type_rule('form_input', context.descriptor(field).base_type, subtype)
+
+    trans_key = table + ':' + field
+    label_key = trans_key + '.label'
+    placeholder_key = trans_key + '.placeholder'
+    title_key = trans_key + '.title'
+
+    trans = 't("' + label_key + '", "")'
+    title = 't("' + title_key + '", "")'
+    placeholder = 't("' + placeholder_key + '", "")'
+    
+    res += tabs + '<FieldInput descriptor=\{\{' + "\n"
+    res += tabs + "\t" + "field: '" + field + "'," + "\n"
+    res += tabs + "\t" + "subtype: '" + subtype + "'," + "\n"
+    res += tabs + "\t" + 'label: ' + trans + ',' + "\n"
+    res += tabs + "\t" + 'title: ' + title + ',' + "\n"
+    res += tabs + "\t" + 'placeholder: ' + placeholder + ',' + "\n"
+    if (rule['values']):
+        res += tabs + "\t" + enum_input_form_values(table, field) + "\n"
+    if (fk):
+        res += tabs + "\t" + 'target_table: "' + fk['table'] + '",' + "\n"
+        res += tabs + "\t" + 'target_field: "' + fk['field'] + '",' + "\n"
+        res += tabs + "\t" + 'imageField: "' + context.image_fields[fk['table']] + '",' + "\n"    
+    res += tabs + "\t" + 'error:inputErrorList.' + field + "\n"
+    res += tabs + '\}\} value={formData.' + field + '} onChange={onChange} />' + "\n"
+
+    return res
+
+"""
+    return a list of field inputs to include in a form
+"""
+@snippet("field_list_input_form")
+def field_list_input_form(table, indent=2):
+    flist = table_context(table).fillable
+    res = ""
+    cnt = 0
+    tabs = "\t"*indent
+    res += tabs + '<Row className="align-items-center">' + "\n"
+    nb_col_per_row = 4
+    for field in flist:
+
+        if (cnt and (cnt % nb_col_per_row == 0)):
+            res += tabs + '</Row>' + "\n"*2
+            res += tabs + '<Row className="align-items-center">' + "\n"
+        
+        res = res + tabs + "\t"
+        res = res + '<Col sm={6} md={6} lg={3}>' + "\n"
+
+        res += field_input_form(table, field, indent+2)
+
+        res = res + tabs + "\t"
+        res = res + '</Col>' + "\n"*2
+
+        cnt = cnt + 1
+
+    res += tabs + '</Row>' + "\n"
+    return res
+
+"""
+    return a list of field to initialize in a form
+"""
+@snippet("set_form_data")
+def set_form_data(table, indent=5):
+    context = table_context(table)
+    flist = context.fillable
+    res = ""
+    cnt = 0
+    tabs = "\t"*indent
+    for field in flist:
+        rule = type_rule('form_input', context.descriptor(field).base_type, context.subtype(field))
+
+        if (cnt): res = res + tabs
+        res = res + field + ': ' + rule['initial']
+        if (cnt < len(flist) - 1):
+            res = res + ","
+        res += "\n"
+
+        cnt = cnt + 1
+    return res
@@ -0,0 +1,153 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import os
+import sys
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from lib.schema import *
+
+"""
+    Memoization of the snippets
+
+    The result of a snippet only depends on the generator code, the snippet,
+    its arguments, the description of the table (see Schema.table_fingerprint)
+    and the state the generators set at run time (type rules, custom generator
+    modules), declared with set_memo_dependency.
+    It is kept in memory in a LRU and optionally on disk, so the tables which
+    have not changed never compute their snippets again, in the same run or in
+    the following ones.
+
+    - CG_MEMO: set it to off to compute the snippets every time
+    - CG_MEMO_SIZE: number of results kept in memory (default 4096)
+    - CG_MEMO_DIR: directory of the results kept on disk, no disk tier by default
+
+    The results are kept on disk in json, a shared directory only holds data.
+"""
+
+memo = OrderedDict()    # memo[key] = result, the most recently used at the end
+memo_stats = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+versions = {}           # versions[module] = hash of the code of a generator
+dependencies = {}       # dependencies[name] = hash of a state the snippets depend on
+dependency_version = {'hash': ''}   # hash of all the dependencies
+memo_lock = threading.Lock()    # the templates can be rendered by several threads
+
+memo_settings = {
+    'enabled': os.environ.get('CG_MEMO', 'on').lower() not in ['off', 'false', 'no', '0'],
+    'size': int(os.environ.get('CG_MEMO_SIZE', 4096)),
+    'directory': os.environ.get('CG_MEMO_DIR', '')
+}
+
+"""
+    Set the options from the -nm/--no-memo and -md/--memo_dir arguments
+"""
+def check_memo_args(args):
+    if getattr(args, 'no_memo', False):
+        memo_settings['enabled'] = False
+    if getattr(args, 'memo_dir', None):
+        memo_settings['directory'] = args.memo_dir
+
+"""
+    return a hash of the code which generates the snippets of a module,
+    the results computed by another version of a generator are not used
+"""
+def generator_version(module):
+    if module not in versions:
+        digest = hashlib.sha1()
+        for name in [module, 'lib.code_generator', 'lib.schema']:
+            filename = getattr(sys.modules.get(name), '__file__', None)
+            if filename:
+                with open(filename, 'rb') as f:
+                    digest.update(f.read())
+        versions[module] = digest.hexdigest()
+    return versions[module]
+
+"""
+    Declare a state the snippets depend on, the results computed with
+    another value are not used anymore, in memory and on disk
+"""
+def set_memo_dependency(name, digest):
+    with memo_lock:
+        dependencies[name] = digest
+        items = repr(sorted(dependencies.items()))
+        dependency_version['hash'] = hashlib.sha1(items.encode()).hexdigest()
+
+"""
+    Call a snippet registered in lib/snippets.py, the result is memoized
+
+    Only the template snippets called on a table of the schema are memoized,
+    the other ones (cg_class on any name, cg_subtype, ...) are cheap and their
+    argument is not always a table.
+"""
+def call_snippet(entry, table, *args):
+    if not memo_settings['enabled'] or not entry.template or not current_schema().has_table(table):
+        return entry.function(table, *args)
+
+    key = (entry.module, entry.name, table, args, table_fingerprint(table), dependency_version['hash'])
+    with memo_lock:
+        if key in memo:
+            memo.move_to_end(key)
+            memo_stats['hits'] += 1
+            return copy_result(memo[key])
+
+    # a result computed without the referenced tables is not kept between runs,
+    # its key does not change when they change
+    filename = disk_filename(key) if table_fingerprint_complete(table) else None
+    if filename and os.path.exists(filename):
+        try:
+            with open(filename, 'r', encoding='utf8') as f:
+                result = json.load(f)
+            with memo_lock:
+                memo_stats['disk_hits'] += 1
+            remember(key, result)
+            return copy_result(result)
+        except (OSError, ValueError):
+            pass
+
+    with memo_lock:
+        memo_stats['misses'] += 1
+    result = entry.function(table, *args)
+    remember(key, result)
+    if filename:
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            tmp = filename + '.tmp'
+            with open(tmp, 'w', encoding='utf8') as f:
+                json.dump(result, f)
+            os.replace(tmp, filename)
+        except (OSError, TypeError, ValueError) as e:
+            print ("Snippet result not saved: ", e)
+    return copy_result(result)
+
+def remember(key, result):
+    with memo_lock:
+        memo[key] = result
+        while len(memo) > memo_settings['size']:
+            memo.popitem(last=False)
+
+"""
+    the lists returned by some snippets can be modified by the caller
+"""
+def copy_result(result):
+    if isinstance(result, list):
+        return list(result)
+    return result
+
+"""
+    return the file of a result on disk, None when there is no disk tier
+"""
+def disk_filename(key):
+    if not memo_settings['directory']:
+        return None
+    name = hashlib.sha1(repr(key + (generator_version(key[0]),)).encode()).hexdigest()
+    return os.path.join(memo_settings['directory'], name[:2], name + '.json')
+
+"""
+    Forget the results kept in memory
+"""
+def clear_memo():
+    with memo_lock:
+        memo.clear()
+        for name in memo_stats:
+            memo_stats[name] = 0
@@ -5,61 +5,1533 @@ import os
 import mysql.connector
 import re
 import json
-from lib.schema import *
+import time
+import atexit
+import mmap
+import struct
+import hashlib
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from lib.ddl import parse_dump
 
 """
 Fetch information about the database schema and metadata
 
 For performance resons, the script fetches all the data and keep them in memory.
 
-"""
-tables = []
-field_l = {}
-attributes = {}     # attributes[table][field]['field'|'type'|'collation'|'null'|'key'|'default'|'extra'|'privileges'|'comment']
-metadata = {}           # meta[table][field]['subtype'|'fillable'|'guarded'|'hidden'|'label'|'help'|'placeholder'|'class'|'options'|'rules'|'validation']
-table_metadata = {}
-foreign = {}
+Every database is described by a Schema object. Several schemas can be loaded
+side by side in the same process, the module functions (field_list, field_type, ...)
+are thin wrappers which work on the current schema selected by use_schema.
+"""
+
+type_reg = re.compile(r'([^(]+)\((.*)\)')
+modifier_reg = re.compile(r'\s+(unsigned|signed|zerofill)\b')
+enum_reg = re.compile(r'enum\((.*)\)')
+set_reg = re.compile(r'set\((.*)\)')
+decimal_reg = re.compile(r'(\d+),(\d+)$')
+value_reg = re.compile(r"'((?:[^'\\]|\\.|'')*)'")
+escape_reg = re.compile(r"''|\\(.)")
+
+"""
+    return the values of an enum or a set type: 'a,b','it''s' gives ['a,b', "it's"]
+"""
+def quoted_values(text):
+    return [escape_reg.sub(lambda match: match.group(1) or "'", value) for value in value_reg.findall(text)]
+
+"""
+    Parsed description of a field type
+
+    The MySQL type string is analyzed once when the field is loaded,
+    the field_xxx accessors just read the attributes.
+"""
+class Field:
+    __slots__ = ('name', 'type', 'base_type', 'size', 'precision', 'scale',
+                 'enum_values', 'set_values', 'unsigned', 'nullable')
+
+    def __init__(self, elt):
+        type = elt['type']
+        self.name = elt['field']
+        self.type = type
+        self.size = 0
+        self.precision = None
+        self.scale = None
+        self.enum_values = []
+        self.set_values = []
+        self.nullable = elt['null'] == 'YES'
+
+        # int unsigned, int(10) unsigned zerofill: the base type is int
+        match = type_reg.match(type)
+        modifiers = type[match.end():] if match else type
+        self.unsigned = 'unsigned' in modifiers.split()
+        self.base_type = modifier_reg.sub('', match.group(1) if match else type).strip()
+        if match:
+            insideBracket = match.group(2)
+            if insideBracket.isdigit():
+                self.size = int(insideBracket)
+                self.precision = self.size
+                self.scale = 0
+            else:
+                match = decimal_reg.match(insideBracket)
+                if match:
+                    self.precision = int(match.group(1))
+                    self.scale = int(match.group(2))
+
+        match = enum_reg.match(type)
+        if match:
+            self.enum_values = quoted_values(match.group(1))
+
+        match = set_reg.match(type)
+        if match:
+            self.set_values = quoted_values(match.group(1))
+
+    def __repr__(self):
+        return f"Field({self.name}, {self.type})"
+
+"""
+    A table of a schema
+
+    It does not hold any data, it is a convenient access to the schema
+    information about one table.
+"""
+class Table:
+    __slots__ = ('schema', 'name')
+
+    def __init__(self, schema, name):
+        self.schema = schema
+        self.name = name
+
+    def field_list(self):
+        return self.schema.field_list(self.name)
+
+    def field(self, field):
+        return self.schema.field_descriptor(self.name, field)
+
+    def fields(self):
+        return [self.schema.field_descriptor(self.name, field) for field in self.schema.field_list(self.name)]
+
+    def meta(self, key = ''):
+        return self.schema.table_meta(self.name, key)
+
+    def foreign_keys(self):
+        self.schema.check_table_exists(self.name)
+        return self.schema.foreign.get(self.name, {})
+
+    def primary_key(self):
+        return self.schema.primary_key(self.name)
+
+    def __repr__(self):
+        return f"Table({self.schema.database}.{self.name})"
+
+"""
+    Description of a database: tables, fields, metadata and foreign keys
+"""
+class Schema:
+
+    def __init__(self, database):
+        self.database = database
+        self.host = os.environ['META_DB_HOST'] if 'META_DB_HOST' in os.environ else 'localhost'
+        self.port = os.environ['META_DB_PORT'] if 'META_DB_PORT' in os.environ else 3306
+
+        self.tables = []
+        self.field_l = {}
+        self.attributes = {}     # attributes[table][field]['field'|'type'|'collation'|'null'|'key'|'default'|'extra'|'privileges'|'comment']
+        self.metadata = {}       # meta[table][field]['subtype'|'fillable'|'guarded'|'hidden'|'label'|'help'|'placeholder'|'class'|'options'|'rules'|'validation']
+        self.table_metadata = {}
+        self.foreign = {}
+        self.referenced = {}     # referenced[table] = tables referenced by its foreign keys
+        self.referenced_by = {}  # referenced_by[table] = [(table, field, referenced field)] foreign keys to the table
+        self.fields = {}         # fields[table][field] = Field, the parsed type of the field
+        self.subtypes = {}       # subtypes[table][field], resolved on first access
+        self.caches = {}         # caches[name][table], per table values computed by the code generators
+
+        self.lazy_db = None      # connection used to fetch the tables on first access in lazy mode
+        self.binary = None       # memory mapped binary snapshot the tables are read from on first access
+        self.binary_index = {}   # binary_index[table] = (offset, length) of the table in the binary snapshot
+
+        self.snapshot_fingerprint = {}  # fingerprint of the loaded description, see fingerprint()
+        self.changed_tables = None      # tables fetched or refreshed by the last load, None when unknown
+        self.removed_tables = []        # tables which have disappeared since the snapshot
+        self.pending_tables = None      # tables changed since workflow --changed last installed them, None when unknown
+        self.cache_file = None          # snapshot of the cache the description is kept in
+
+    def __repr__(self):
+        return f"Schema({self.database})"
+
+    def table(self, table):
+        self.check_table_exists(table)
+        return Table(self, table)
+
+    # Database functions
+    """
+        Open a connection to the database
+    """
+    def connect(self, user, password):
+        return mysql.connector.connect(host=self.host, user=user, db=self.database, passwd=password, port=int(self.port) )
+
+    """
+        Fetch the database schema and metadata and store them in memory
+    """
+    def fetch(self, user, password):
+        db = self.connect(user, password)
+        self.get_tables(db)
+        try:
+            self.get_all_fields(db)
+        except mysql.connector.Error as e:
+            # information_schema may not be readable, use the per table path
+            print ("Bulk introspection failed, fetching tables one by one: ", e)
+            self.field_l.clear()
+            db.close()
+            db = self.connect(user, password)
+
+        self.fetch_all_foreign_keys(db)
+
+        for table in self.tables:
+            if table not in self.field_l:
+                self.get_fields(db, table)
+        self.fetch_all_metadata(db)
+        db.close()
+
+    """
+        Fetch the schema with the connections of a pool
+
+        The columns are read by batches of tables, the batches, the foreign keys
+        and the metadata are submitted to the executor and run concurrently.
+        The list of tables must already be known.
+
+        returns the pending queries to pass to store_fetched
+    """
+    def fetch_concurrent(self, pool, executor, batch_size):
+        if batch_size <= 0:
+            batch_size = max(len(self.tables), 1)
+        columns = []
+        for i in range(0, len(self.tables), batch_size):
+            columns.append(executor.submit(pooled_query, pool, self.columns_query(self.tables[i:i + batch_size])))
+        foreign_keys = executor.submit(pooled_query, pool, self.foreign_keys_query())
+        lines = None
+        if self.has_metadata_table():
+            lines = executor.submit(pooled_query, pool, self.metadata_query())
+        return columns, foreign_keys, lines
+
+    """
+        Wait for the queries submitted by fetch_concurrent and store their results
+    """
+    def store_fetched(self, pending):
+        columns, foreign_keys, lines = pending
+
+        self.field_l.clear()
+        self.attributes.clear()
+        self.metadata.clear()
+        self.fields.clear()
+        for future in columns:
+            self.store_columns(future.result())
+        self.store_foreign_keys(foreign_keys.result())
+        if lines:
+            try:
+                self.store_metadata_lines(lines.result())
+            except mysql.connector.Error as e:
+                print ("Metadata not loaded: ", e)
+        self.invalidate()
+
+    """
+        Get the list of tables in the database
+    """
+    def get_tables(self, db):
+        cursor = db.cursor()
+        cursor.execute(self.tables_query())
+        self.tables.clear()
+        for (table_schema, table_name) in cursor:
+            self.tables.append(table_name)
+        return self.tables
+
+    def tables_query(self):
+        return " SELECT table_schema, table_name FROM information_schema.tables WHERE table_schema = '" + self.database + "'"
+
+    """
+        Prepare the lazy mode: only the list of tables is fetched, the fields,
+        foreign keys and metadata of a table are fetched on first access.
+        It is adapted to commands which work on one table.
+    """
+    def fetch_lazy(self, user, password):
+        self.lazy_db = self.connect(user, password)
+        self.get_tables(self.lazy_db)
+        atexit.register(self.close_lazy)
+
+    def close_lazy(self):
+        if self.lazy_db:
+            self.lazy_db.close()
+            self.lazy_db = None
+
+    """
+        In lazy mode fetch the description of a table if it has not been done yet,
+        from the binary snapshot or from the database
+    """
+    def ensure_table(self, table):
+        if table in self.field_l or table not in self.tables:
+            return
+        if self.binary != None:
+            self.load_binary_table(table)
+            return
+        if self.lazy_db == None:
+            return
+        self.get_fields(self.lazy_db, table)
+        self.fetch_foreign_key_information(self.lazy_db, table)
+        self.fetch_metadata(self.lazy_db, table)
+
+    """
+        Store the description of a field in memory
+
+        row is (field, type, collation, null, key, default, extra, privileges, comment)
+        in the order returned by SHOW FULL COLUMNS
+    """
+    def store_field(self, table, row):
+        if table not in self.field_l:
+            self.field_l[table] = []
+            self.attributes[table] = {}
+            self.metadata[table] = {}
+            self.fields[table] = {}
+
+        elt = {}
+        elt['field'] = row[0]
+        elt['type'] = row[1]
+        elt['collation'] = row[2]
+        elt['null'] = row[3]
+        elt['key'] = row[4]
+        elt['default'] = row[5]
+        elt['extra'] = row[6]
+        elt['privileges'] = row[7]
+        elt['comment'] = row[8]
+
+        self.attributes[table][elt['field']] = elt
+        self.fields[table][elt['field']] = Field(elt)
+        self.field_l[table].append(elt['field'])
+
+        # metadata
+        self.metadata[table][elt['field']] = {}
+        if elt['comment']:
+            try:
+                comment_meta = json.loads(elt['comment'])
+                for key in comment_meta:
+                    self.metadata[table][elt['field']][key] = comment_meta[key]
+            except Exception as e:
+                # print ("Exception in json: ", e)
+                None
+
+    """
+        Fetch the list of fields for a table
+    """
+    def get_fields(self, db, table):
+        cursor = db.cursor()
+        query = " SHOW FULL COLUMNS FROM " + table + " FROM " + self.database
+        cursor.execute(query)
+        self.field_l[table] = []
+        self.attributes[table] = {}
+        self.metadata[table] = {}
+        self.fields[table] = {}
+        for field in cursor:
+            # fields.append(id, type, collation, null, key, extra, privileges, comment)
+            self.store_field(table, field)
+        self.invalidate(table)
+
+        return self.attributes
+
+    """
+        Fetch the fields of all the tables of a database in one query
+
+        information_schema.COLUMNS is read once and the rows are streamed,
+        it avoids one SHOW FULL COLUMNS round trip per table.
+    """
+    def get_all_fields(self, db):
+        cursor = db.cursor()
+        cursor.execute(self.columns_query())
+
+        self.field_l.clear()
+        self.attributes.clear()
+        self.metadata.clear()
+        self.fields.clear()
+        self.store_columns(cursor)
+        cursor.close()
+        self.invalidate()
+
+        return self.attributes
+
+    """
+        Query on information_schema.COLUMNS for all the tables
+        or only for a list of tables
+    """
+    def columns_query(self, tables = None):
+        query = "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, COLLATION_NAME, IS_NULLABLE, COLUMN_KEY, "
+        query = query + "COLUMN_DEFAULT, EXTRA, PRIVILEGES, COLUMN_COMMENT "
+        query = query + "FROM information_schema.COLUMNS "
+        query = query + "WHERE TABLE_SCHEMA = '" + self.database + "' "
+        if tables != None:
+            query = query + "AND TABLE_NAME IN (" + ", ".join("'" + table + "'" for table in tables) + ") "
+        query = query + "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+        return query
+
+    """
+        Store the lines returned by columns_query
+    """
+    def store_columns(self, lines):
+        for line in lines:
+            # some server versions return information_schema strings as bytes
+            line = [x.decode() if isinstance(x, (bytes, bytearray)) else x for x in line]
+            self.store_field(line[0], line[1:])
+
+    """
+        Store one line of the metadata table in memory
+
+        line is (table, column, key, value), the columns selected by metadata_query
+    """
+    def store_metadata_line(self, line):
+        table = line[0]
+        field = line[1]
+        key = line[2]
+        value = line[3]
+
+        if not field:
+            # metadata for the table itself
+            if (table not in self.table_metadata):
+                self.table_metadata[table] = {}
+            self.table_metadata[table][key] = value
+            return
+
+        if table not in self.metadata:
+            self.metadata[table] = {}
+        if field not in self.metadata[table]:
+            self.metadata[table][field] = {}
+
+        # Is it a good idea to be flexible here ?
+        # May be that I should be strict and only accept well formed json
+        if key == 'json' and value != None and value != "":
+            try:
+                json_list = json.loads(value)
+            except ValueError as e:
+                print ("Incorrect json metadata for", table, field, ":", e)
+                return
+            for elt in json_list:
+                self.metadata[table][field][elt] = json_list[elt]
+        else:
+            self.metadata[table][field][key] = value
+
+    def store_metadata_lines(self, lines):
+        for line in lines:
+            self.store_metadata_line(line)
+
+    """
+        Check if the database has a metadata table
+
+        The table list has already been fetched, no query is needed.
+    """
+    def has_metadata_table(self):
+        return 'metadata' in self.tables
+
+    """
+        Fetch the metadata for a table, a table without readable
+        metadata is described by its schema only
+    """
+    def fetch_metadata(self, db, table):
+        if not self.has_metadata_table():
+            return None
+
+        try:
+            cursor = db.cursor()
+            # get all the metadata lines for a table
+            cursor.execute(self.metadata_query([table]))
+            self.store_metadata_lines(cursor)
+            cursor.close()
+        except mysql.connector.Error as e:
+            print ("Metadata not loaded for", table, ":", e)
+        self.invalidate(table)
+
+    """
+        Fetch the whole metadata table in one query and dispatch
+        the lines to the tables and fields they describe
+
+        When the query fails the metadata is fetched table by table,
+        only the tables whose metadata cannot be read are left without it.
+        The lines are stored again, storing a line twice gives the same result.
+    """
+    def fetch_all_metadata(self, db, tables = None):
+        if not self.has_metadata_table():
+            return None
+
+        try:
+            cursor = db.cursor()
+            cursor.execute(self.metadata_query(tables))
+            self.store_metadata_lines(cursor)
+            cursor.close()
+        except mysql.connector.Error as e:
+            print ("Bulk metadata query failed, fetching tables one by one: ", e)
+            for table in (tables if tables != None else self.tables):
+                self.fetch_metadata(db, table)
+        self.invalidate()
+
+    """
+        The columns are named, the position of the columns in the metadata table does not matter
+    """
+    def metadata_query(self, tables = None):
+        query = "SELECT `table`, `column`, `key`, `value` FROM `" + self.database + "`.`metadata`"
+        if tables != None:
+            query = query + " WHERE `table` IN (" + ", ".join("'" + table + "'" for table in tables) + ")"
+        return query + ";"
+
+    """
+        Fetch the foreign key information for a table
+        and store them in memory
+    """
+    def fetch_foreign_key_information(self, db, table):
+        cursor = db.cursor()
+        query = "SELECT CONSTRAINT_SCHEMA, CONSTRAINT_NAME, TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+        query = query + "FROM information_schema.KEY_COLUMN_USAGE "
+        query = query + "WHERE CONSTRAINT_SCHEMA = '" + self.database + "' AND TABLE_NAME = '" + table + "'"
+        cursor.execute(query)
+
+        self.foreign[table] = {}
+
+        for line in cursor:
+            referenced_table = line[4]
+            field = line[3]
+            reference = {}
+            reference['table'] = line[4]
+            reference['field'] = line[5]
+            if (referenced_table):
+                self.foreign[table][field] = reference
+        self.index_table_foreign_keys(table)
+        self.invalidate(table)
+        return self.foreign
+
+    """
+        Fetch the foreign key information for all the tables of a database
+        in one query and store them in memory
+
+        Every table gets an entry, even the ones without foreign keys.
+    """
+    def fetch_all_foreign_keys(self, db):
+        cursor = db.cursor()
+        cursor.execute(self.foreign_keys_query())
+        self.store_foreign_keys(cursor)
+        cursor.close()
+        return self.foreign
+
+    def foreign_keys_query(self, tables = None):
+        query = "SELECT CONSTRAINT_SCHEMA, CONSTRAINT_NAME, TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+        query = query + "FROM information_schema.KEY_COLUMN_USAGE "
+        query = query + "WHERE CONSTRAINT_SCHEMA = '" + self.database + "' AND REFERENCED_TABLE_NAME IS NOT NULL"
+        if tables != None:
+            query = query + " AND TABLE_NAME IN (" + ", ".join("'" + table + "'" for table in tables) + ")"
+        return query
+
+    """
+        Store the lines returned by foreign_keys_query, they replace
+        the foreign keys known for the tables, all the tables by default
+    """
+    def store_foreign_keys(self, lines, tables = None):
+        if tables == None:
+            self.foreign.clear()
+            tables = self.tables
+        for table in tables:
+            self.foreign[table] = {}
+
+        for line in lines:
+            table = line[2]
+            field = line[3]
+            reference = {}
+            reference['table'] = line[4]
+            reference['field'] = line[5]
+            if table not in self.foreign:
+                self.foreign[table] = {}
+            self.foreign[table][field] = reference
+        self.index_foreign_keys()
+        self.invalidate()
+
+    """
+        Build the indexes of the foreign keys in both directions
+
+        referenced[table] lists the tables a table points to and
+        referenced_by[table] the foreign keys pointing to a table.
+    """
+    def index_foreign_keys(self):
+        self.referenced = {}
+        self.referenced_by = {}
+        for table in self.foreign:
+            self.index_table_foreign_keys(table)
+
+    """
+        Update the indexes for the foreign keys of one table, the entries
+        of its previous foreign keys are replaced
+    """
+    def index_table_foreign_keys(self, table):
+        for referenced in self.referenced.get(table, []):
+            self.referenced_by[referenced] = [fk for fk in self.referenced_by.get(referenced, []) if fk[0] != table]
+
+        self.referenced[table] = []
+        for field in self.foreign.get(table, {}):
+            fk = self.foreign[table][field]
+            if fk['table'] not in self.referenced[table]:
+                self.referenced[table].append(fk['table'])
+            if fk['table'] not in self.referenced_by:
+                self.referenced_by[fk['table']] = []
+            self.referenced_by[fk['table']].append((table, field, fk['field']))
+
+    """
+        return the tables referenced by the foreign keys of a table
+    """
+    def referenced_tables(self, table):
+        self.check_table_exists(table)
+        return self.referenced.get(table, [])
+
+    """
+        return the foreign keys pointing to a table, [(table, field, referenced field)]
+
+        In lazy mode only the foreign keys of the tables already fetched are known.
+    """
+    def foreign_keys_to(self, table):
+        return self.referenced_by.get(table, [])
+
+    """
+        return the tables which have a foreign key to a table
+    """
+    def tables_referencing(self, table):
+        result = []
+        for (referencing, field, referenced_field) in self.foreign_keys_to(table):
+            if referencing not in result:
+                result.append(referencing)
+        return result
+
+    """
+        return the shortest chain of foreign keys between two tables, the foreign
+        keys can be followed in both directions.
+
+        Every step is (from table, from field, to table, to field) in the order
+        of the path, ready for a join. When the key is followed against its
+        direction the to field is the one which references the from field:
+        owners to boards gives ('owners', 'id', 'boards', 'owner_id').
+
+        returns [] when the tables are the same and None when they are not linked.
+    """
+    def foreign_key_path(self, source, destination):
+        if source == destination:
+            return []
+
+        previous = {source: None}
+        queue = [source]
+        while queue:
+            next_queue = []
+            for table in queue:
+                self.check_table_exists(table)
+                steps = []
+                for field in self.foreign.get(table, {}):
+                    fk = self.foreign[table][field]
+                    steps.append((fk['table'], (table, field, fk['table'], fk['field'])))
+                for (referencing, field, referenced_field) in self.foreign_keys_to(table):
+                    steps.append((referencing, (table, referenced_field, referencing, field)))
+
+                for (neighbour, step) in steps:
+                    if neighbour in previous:
+                        continue
+                    previous[neighbour] = (table, step)
+                    if neighbour == destination:
+                        path = []
+                        while previous[neighbour]:
+                            neighbour, step = previous[neighbour]
+                            path.insert(0, step)
+                        return path
+                    next_queue.append(neighbour)
+            queue = next_queue
+        return None
+
+    """
+        Compare the time spent to fetch the foreign keys table by table
+        and with a single query for the whole schema
+
+        returns the two durations in seconds
+    """
+    def foreign_key_timing(self, user, password):
+        db = self.connect(user, password)
+
+        start = time.perf_counter()
+        for table in self.tables:
+            self.fetch_foreign_key_information(db, table)
+        per_table = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.fetch_all_foreign_keys(db)
+        bulk = time.perf_counter() - start
+
+        db.close()
+        return per_table, bulk
+
+    # Snapshot cache
+    def cache_filename(self):
+        cache_dir = os.environ.get('META_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ddd-gen'))
+        return os.path.join(cache_dir, f"{self.host}_{self.port}_{self.database}.json")
+
+    """
+        Compute a fingerprint of the schema with a few aggregate queries
+
+        The server computes a checksum of the columns, the foreign keys and the
+        metadata lines of every table, only one line per table is returned.
+        Data modifications do not change the fingerprint, only the schema and the metadata.
+
+        returns fingerprint[table] = [columns, foreign keys, metadata]
+    """
+    def fingerprint(self, db):
+        fingerprint = {}
+        cursor = db.cursor()
+
+        query = "SELECT TABLE_NAME, COUNT(*), SUM(CRC32(CONCAT_WS('|', ORDINAL_POSITION, COLUMN_NAME, COLUMN_TYPE, "
+        query = query + "IFNULL(COLLATION_NAME, ''), IS_NULLABLE, COLUMN_KEY, IFNULL(COLUMN_DEFAULT, 'NULL'), EXTRA, PRIVILEGES, COLUMN_COMMENT))) "
+        query = query + "FROM information_schema.COLUMNS "
+        query = query + "WHERE TABLE_SCHEMA = '" + self.database + "' GROUP BY TABLE_NAME"
+        cursor.execute(query)
+        for line in cursor:
+            fingerprint[line[0]] = [str(line[1]) + ':' + str(line[2]), '', '']
+
+        query = "SELECT TABLE_NAME, COUNT(*), SUM(CRC32(CONCAT_WS('|', COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME))) "
+        query = query + "FROM information_schema.KEY_COLUMN_USAGE "
+        query = query + "WHERE CONSTRAINT_SCHEMA = '" + self.database + "' AND REFERENCED_TABLE_NAME IS NOT NULL GROUP BY TABLE_NAME"
+        cursor.execute(query)
+        for line in cursor:
+            if line[0] in fingerprint:
+                fingerprint[line[0]][1] = str(line[1]) + ':' + str(line[2])
+
+        if 'metadata' in fingerprint:
+            query = "SELECT `table`, COUNT(*), SUM(CRC32(CONCAT_WS('|', IFNULL(`column`, ''), `key`, IFNULL(`value`, '')))) "
+            query = query + "FROM `" + self.database + "`.`metadata` GROUP BY `table`;"
+            cursor.execute(query)
+            for line in cursor:
+                if line[0] in fingerprint:
+                    fingerprint[line[0]][2] = str(line[1]) + ':' + str(line[2])
+
+        cursor.close()
+        return fingerprint
+
+    """
+        Save the schema description in a snapshot file
+    """
+    def save_snapshot(self, filename, fingerprint):
+        snapshot = {
+            'version': snapshot_version,
+            'fingerprint': fingerprint,
+            'tables': self.tables,
+            'field_l': self.field_l,
+            'attributes': self.attributes,
+            'metadata': self.metadata,
+            'table_metadata': self.table_metadata,
+            'foreign': self.foreign,
+            'pending': self.pending_tables
+        }
+        self.snapshot_fingerprint = fingerprint
+        self.cache_file = filename
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            tmp = filename + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(snapshot, f, default=str)
+            os.replace(tmp, filename)
+        except OSError as e:
+            print ("Schema snapshot not saved: ", e)
+
+    """
+        Load the schema description from a snapshot file
+
+        returns False when the file does not exist or is not up to date
+    """
+    def load_snapshot(self, filename, fingerprint):
+        snapshot = self.read_snapshot(filename)
+        if snapshot == None or snapshot['fingerprint'] != fingerprint:
+            return False
+
+        self.restore_snapshot(snapshot)
+        self.changed_tables = []
+        return True
+
+    """
+        Read a snapshot file, returns None when it does not exist or
+        has been written by another version
+    """
+    def read_snapshot(self, filename):
+        try:
+            with open(filename, 'r') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if snapshot.get('version') != snapshot_version:
+            return None
+        return snapshot
+
+    """
+        Replace the schema description by the content of a snapshot
+    """
+    def restore_snapshot(self, snapshot):
+        self.snapshot_fingerprint = snapshot['fingerprint']
+        self.pending_tables = snapshot.get('pending')
+        self.tables[:] = snapshot['tables']
+        for name in ['field_l', 'attributes', 'metadata', 'table_metadata', 'foreign']:
+            store = getattr(self, name)
+            store.clear()
+            store.update(snapshot[name])
+
+        self.fields.clear()
+        for table in self.attributes:
+            self.fields[table] = {}
+            for field in self.attributes[table]:
+                self.fields[table][field] = Field(self.attributes[table][field])
+        self.index_foreign_keys()
+        self.invalidate()
+
+    """
+        Update a description restored from a snapshot, only the tables whose
+        fingerprint has changed are fetched again.
+
+        returns the lists of changed (or new) tables and of removed tables
+    """
+    def refresh(self, db, fingerprint):
+        previous = self.snapshot_fingerprint
+        changed = [table for table in fingerprint if previous.get(table) != fingerprint[table]]
+        removed = [table for table in previous if table not in fingerprint]
+
+        self.get_tables(db)
+        for table in removed + changed:
+            self.forget_table(table)
+
+        if changed:
+            cursor = db.cursor()
+            cursor.execute(self.columns_query(changed))
+            self.store_columns(cursor)
+            cursor.execute(self.foreign_keys_query(changed))
+            self.store_foreign_keys(cursor, changed)
+            cursor.close()
+            self.fetch_all_metadata(db, changed)
+
+        # tables which reference a changed table may depend on it, everything is recomputed
+        self.index_foreign_keys()
+        self.invalidate()
+
+        self.snapshot_fingerprint = fingerprint
+        self.changed_tables = changed
+        self.removed_tables = removed
+        if self.pending_tables != None:
+            # the changes are kept in the snapshot until a workflow run installs them
+            self.pending_tables = [table for table in self.pending_tables if table not in removed]
+            self.pending_tables += [table for table in changed if table not in self.pending_tables]
+        return changed, removed
+
+    """
+        The code of the pending tables has been installed, the next runs
+        only see the changes made after this one
+    """
+    def consume_pending_tables(self):
+        self.pending_tables = []
+        if self.cache_file:
+            self.save_snapshot(self.cache_file, self.snapshot_fingerprint)
+
+    """
+        Remove a table from the description
+    """
+    def forget_table(self, table):
+        for store in [self.field_l, self.attributes, self.metadata, self.fields, self.table_metadata, self.foreign]:
+            store.pop(table, None)
+
+    # Binary snapshot
+    """
+        Export the full description of the schema into a binary file
+
+        The file starts with a fixed size header, followed by one json block
+        per table (columns and metadata) and by an index which holds the table
+        list, the position of every block and the foreign keys. The foreign keys
+        are in the index so the reverse index is complete without reading the
+        tables. The blocks only hold data, a snapshot received from elsewhere
+        can not run code; the types are parsed again when a table is loaded.
+    """
+    def export_binary(self, filename):
+        for table in self.tables:
+            self.ensure_table(table)
+
+        index = {
+            'version': binary_version,
+            'database': self.database,
+            'fingerprint': self.snapshot_fingerprint,
+            'tables': self.tables,
+            'foreign': self.foreign,
+            'offsets': {}
+        }
+        tmp = filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(struct.pack(binary_header, binary_magic, binary_version, 0, 0))
+            for table in self.tables:
+                block = binary_block({
+                    'field_l': self.field_l[table],
+                    'attributes': self.attributes[table],
+                    'metadata': self.metadata[table],
+                    'table_metadata': self.table_metadata.get(table)
+                })
+                index['offsets'][table] = (f.tell(), len(block))
+                f.write(block)
+
+            index_offset = f.tell()
+            block = binary_block(index)
+            f.write(block)
+            f.seek(0)
+            f.write(struct.pack(binary_header, binary_magic, binary_version, index_offset, len(block)))
+        os.replace(tmp, filename)
+
+    """
+        Open a binary snapshot, only the index is read. The tables are
+        deserialized on first access by ensure_table.
+    """
+    def open_binary(self, filename):
+        with open(filename, 'rb') as f:
+            self.binary = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        size = struct.calcsize(binary_header)
+        magic, version, index_offset, index_length = struct.unpack(binary_header, self.binary[:size])
+        if magic != binary_magic or version != binary_version:
+            self.close_binary()
+            raise Exception("Not a binary schema snapshot: " + filename)
+
+        index = json.loads(self.binary[index_offset:index_offset + index_length])
+        self.database = index['database']
+        self.snapshot_fingerprint = index['fingerprint']
+        self.tables[:] = index['tables']
+        self.foreign.clear()
+        self.foreign.update(index['foreign'])
+        self.binary_index = index['offsets']
+        self.index_foreign_keys()
+        self.invalidate()
+        atexit.register(self.close_binary)
+
+    def close_binary(self):
+        if self.binary:
+            self.binary.close()
+            self.binary = None
+
+    """
+        Deserialize the description of a table from the binary snapshot
+    """
+    def load_binary_table(self, table):
+        offset, length = self.binary_index[table]
+        block = json.loads(self.binary[offset:offset + length])
+        self.field_l[table] = block['field_l']
+        self.attributes[table] = block['attributes']
+        self.metadata[table] = block['metadata']
+        if block['table_metadata'] != None:
+            self.table_metadata[table] = block['table_metadata']
+        self.fields[table] = {field: Field(self.attributes[table][field]) for field in self.field_l[table]}
+        self.invalidate(table)
+
+    # Dump files
+    """
+        Read the description of the schema from a mysqldump file instead of
+        the database. When the dump holds several databases, the one with the
+        name of the schema is used, or the first one.
+    """
+    def load_dump(self, filename):
+        with open(filename, 'r', encoding='utf8') as f:
+            descriptions = parse_dump(f.read(), self.database)
+
+        description = None
+        for elt in descriptions:
+            if elt['database'] == self.database:
+                description = elt
+        if description == None:
+            if not descriptions:
+                raise Exception("No CREATE TABLE statement in " + filename)
+            description = descriptions[0]
+
+        self.load_description(description)
+
+    """
+        Fill the schema with a description built without database, by the
+        dump parser or the synthetic schema generator:
+        {'database', 'tables', 'columns', 'foreign', 'metadata'}, see lib/ddl.py
+    """
+    def load_description(self, description):
+        if description['database']:
+            self.database = description['database']
+        self.tables[:] = description['tables']
+        for store in [self.field_l, self.attributes, self.metadata, self.table_metadata, self.fields]:
+            store.clear()
+        for table in self.tables:
+            for row in description['columns'][table]:
+                self.store_field(table, row)
+        self.store_foreign_keys(description['foreign'])
+        for line in description['metadata']:
+            # description lines start with the id of the line
+            self.store_metadata_line(line[1:])
+        self.invalidate()
+        self.changed_tables = list(self.tables)
+
+    # Cached values
+    """
+        Forget the values computed from the description of a table, or of all
+        tables when table is None
+
+        It must be called when the fields, foreign keys or metadata are reloaded.
+    """
+    def invalidate(self, table = None):
+        if table == None:
+            self.subtypes.clear()
+            for cache in self.caches.values():
+                cache.clear()
+        else:
+            self.subtypes.pop(table, None)
+            for cache in self.caches.values():
+                cache.pop(table, None)
+
+    """
+        return a named cache, cache[table] = ...
+
+        It lets the code generators keep their own per table values,
+        they are forgotten when the table is reloaded.
+    """
+    def cache(self, name):
+        if name not in self.caches:
+            # setdefault, two threads may create the cache at the same time
+            self.caches.setdefault(name, {})
+        return self.caches[name]
+
+    """
+        return a fingerprint of a table: its fields, metadata and foreign keys,
+        and the ones of the tables it references. The code generated for a table
+        only depends on them.
+
+        In lazy mode the referenced tables which have not been fetched yet are
+        not fetched for the fingerprint, only their name is used, see
+        table_fingerprint_complete.
+    """
+    def table_fingerprint(self, table):
+        digest = hashlib.sha1(self.table_content_fingerprint(table).encode())
+        for referenced in self.referenced_tables(table):
+            if referenced in self.field_l:
+                digest.update(self.table_content_fingerprint(referenced).encode())
+            elif referenced in self.tables:
+                digest.update(('not loaded ' + referenced).encode())
+        return digest.hexdigest()
+
+    """
+        check if the fingerprint of a table covers all the tables it references
+    """
+    def table_fingerprint_complete(self, table):
+        return all(referenced in self.field_l or referenced not in self.tables for referenced in self.referenced_tables(table))
+
+    def table_content_fingerprint(self, table):
+        fingerprints = self.cache('table_fingerprint')
+        if table not in fingerprints:
+            self.check_table_exists(table)
+            content = [self.field_l[table], self.attributes[table], self.metadata.get(table),
+                       self.table_metadata.get(table), self.foreign.get(table)]
+            fingerprints[table] = hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+        return fingerprints[table]
+
+    # Accessors
+    """
+        check if a table is in the schema, without fetching it
+    """
+    def has_table(self, table):
+        return table in self.field_l or table in self.tables
+
+    """
+        Check if a table exists
+    """
+    def check_table_exists(self, table):
+        self.ensure_table(table)
+        if table not in self.attributes:
+            raise Exception("Table not found: " + table)
+
+    """
+        Check if a field exists in a table
+    """
+    def check_field_exists(self, table, field):
+        self.ensure_table(table)
+        if table not in self.attributes:
+            raise Exception("Table not found: " + table)
+        if field not in self.attributes[table]:
+            raise Exception("Field not found: " + field + " in table " + table)
+
+    """
+        List the tables in the database
+    """
+    def table_list(self):
+        return self.tables
+
+    """
+        List the fields in a table
+    """
+    def field_list(self, table):
+        self.check_table_exists(table)
+        return self.field_l[table]
+
+    """
+        return the attributes of a field
+    """
+    def field_attributes(self, table, field):
+        self.check_field_exists(table, field)
+        return self.attributes[table][field]
+
+    """
+        return one attribute of a field
+        'field'|'type'|'collation'|'null'|'key'|'default'|'extra'|'privileges'|'comment'
+    """
+    def field_attribute(self, table, field, name):
+        self.check_field_exists(table, field)
+        return self.attributes[table][field][name]
+
+    """
+        return the parsed description of a field
+    """
+    def field_descriptor(self, table, field):
+        self.check_field_exists(table, field)
+        return self.fields[table][field]
+
+    """
+        return the metadata of a field
+
+        metadata has already been fetched from the database and stored in memory
+    """
+    def field_meta(self, table, field, key):
+        self.check_field_exists(table, field)
+
+        if table not in self.metadata:
+            return None
+
+        if field not in self.metadata[table]:
+            return None
+
+        if key not in self.metadata[table][field]:
+            return None
+
+        return self.metadata[table][field][key]
+
+    """
+        return the metadata of a table
+    """
+    def table_meta(self, table, key = ''):
+        self.ensure_table(table)
+        if table not in self.table_metadata:
+            return None
+
+        if not key:
+            return self.table_metadata[table]
+
+        if key not in self.table_metadata[table]:
+            return None
+
+        return self.table_metadata[table][key]
+
+    """
+        return the subtype of a field
+
+        the subtype is resolved once and kept in memory
+    """
+    def field_subtype(self, table, field):
+        if table in self.subtypes and field in self.subtypes[table]:
+            return self.subtypes[table][field]
+
+        subtype = self.resolve_field_subtype(table, field)
+        if subtype != "exception":
+            if table not in self.subtypes:
+                self.subtypes[table] = {}
+            self.subtypes[table][field] = subtype
+        return subtype
+
+    """
+        Deduce the subtype of a field from the foreign keys, the metadata,
+        the field name and the type
+    """
+    def resolve_field_subtype(self, table, field):
+        try:
+
+            fk = self.field_foreign_key(table, field)
+            if fk != None:
+                return 'foreign_key'
+
+            subtype = self.field_meta(table, field, 'subtype')
+            if subtype != None:
+                return subtype
+
+            """
+            Conventions over configuration.
+            if subtype has not been defined in the metadata it can be deduced from the field name
+            """
+
+            if 'image' in field:
+                return 'image'
+            if 'string_id' in field:
+                return 'string_id'
+            if 'file' in field:
+                return 'file'
+            if 'password' in field:
+                return 'password'
+            if 'email' in field:
+                return 'email'
+            if 'url' in field:
+                return 'url'
+            if 'phone' in field:
+                return 'phone'
+
+            base_type = self.field_descriptor(table, field).base_type
+            if base_type in ['int', 'tinyint', 'smallint', 'mediumint', 'bigint']:
+                return 'integer'
+            if base_type in ['decimal', 'float', 'double']:
+                return 'float'
+            if base_type in ['bool', 'boolean']:
+                return 'boolean'
+            if base_type == 'date':
+                return 'date'
+            if base_type == 'datetime':
+                return 'datetime'
+            if base_type in [ 'timestamp', 'time']:
+                return 'time'
+            if  base_type in ['text', 'tinytext', 'mediumtext', 'longtext']:
+                return 'text'
+            if base_type in ['char', 'varchar']:
+                return 'string'
+            if base_type in ['enum']:
+                return 'enum'
+            if base_type in ['set']:
+                return 'set'
+            if base_type in ['binary', 'varbinary', 'blob', 'tinyblob', 'mediumblob', 'longblob']:
+                return 'binary'
+
+        except Exception as e:
+            print ("Exception in field_subtype: ", e)
+            return "exception"
+
+    """
+        check if a field is mass assignable
+    """
+    def field_fillable(self, table, field):
+        self.check_field_exists(table, field)
+        if field in ["id", "created_at", "updated_at"]: return False
+        # if field_is_primary_key(table, field): return False
+
+        if (self.field_meta(table,field, 'fillable') != None):
+            return toBoolean(self.field_meta(table,field, 'fillable'))
+        return not toBoolean(self.field_meta(table,field, 'guarded'))
+
+    """
+    If a field is a foreign key returns information about it
+    else returns None
+    """
+    def field_foreign_key(self, table, field):
+        self.check_field_exists(table, field)
+        if table in self.foreign:
+            if field in self.foreign[table]:
+                return self.foreign[table][field]
+        return None
+
+    """
+        returns the primary field of a table
+    """
+    def primary_key(self, table):
+        for f in self.field_list(table):
+            if self.attributes[table][f]['key'] == 'PRI':
+                return f
+        return None
 
 # Utility functions
 def toBoolean(str):
     if str == None: return False
     return str.lower() in ['true', 'yes', '1']
 
+# Loaded schemas
+"""
+    schemas[database] = Schema, all the databases loaded in the process
+
+    current is the schema used by the module functions. A thread or a task can
+    work on another schema with schema_context, the schema is then kept in a
+    context variable and the other threads are not affected.
+"""
+schemas = {}
+current = Schema("")
+current_context = contextvars.ContextVar('current_schema', default=None)
+
+"""
+    Select the schema used by the module functions, for the whole process
+    or inside a schema_context for the current context only
+"""
+def use_schema(schema):
+    global current
+    if isinstance(schema, str):
+        schema = get_schema(schema)
+    if current_context.get() != None:
+        current_context.set(schema)
+    else:
+        current = schema
+    return schema
+
+def current_schema():
+    schema = current_context.get()
+    return schema if schema != None else current
+
+"""
+    Use a schema in the current thread or task only
+
+        with schema_context(schema):
+            print(field_list('boards'))
+"""
+@contextlib.contextmanager
+def schema_context(schema):
+    if isinstance(schema, str):
+        schema = get_schema(schema)
+    token = current_context.set(schema)
+    try:
+        yield schema
+    finally:
+        current_context.reset(token)
+
+"""
+    return a schema already loaded in the process
+"""
+def get_schema(database):
+    if database not in schemas:
+        raise Exception("Schema not loaded: " + database)
+    return schemas[database]
+
+def register_schema(schema):
+    schemas[schema.database] = schema
+    return schema
+
+"""
+    Compatibility with the time when the schema information was stored in module
+    variables: lib.schema.tables, lib.schema.attributes, ... are the ones of the current schema
+"""
+def __getattr__(name):
+    if name in ['tables', 'field_l', 'attributes', 'metadata', 'table_metadata', 'foreign', 'referenced', 'referenced_by', 'fields', 'subtypes']:
+        return getattr(current_schema(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Database functions
+"""
+    Open a connection to the database
+"""
+def connect(database, user, password):
+    return Schema(database).connect(user, password)
+
 """
     Fetch the database schema and metadata and store them in memory
+
+    The schema is registered and becomes the current one
 """
 def fetch_data(database, user, password):
-    host = os.environ['META_DB_HOST'] if 'META_DB_HOST' in os.environ else 'localhost'
-    port = os.environ['META_DB_PORT'] if 'META_DB_PORT' in os.environ else 3306
+    schema = Schema(database)
+    schema.fetch(user, password)
+    use_schema(register_schema(schema))
 
-    db = mysql.connector.connect(host=host, user=user, db=database, passwd=password, port=int(port) )
-    tables = get_tables(db, database)
     data = {}
-    for table in tables:
-        data[table] = get_fields(db, database, table)
-        fetch_foreign_key_information(db, database, table)
-        fetch_metadata(db, database, table)
+    for table in schema.tables:
+        data[table] = schema.attributes
+    return data
+
+"""
+    return a schema, it is fetched from the database only when
+    it has not already been loaded in the process
+"""
+def load_schema(database, user, password, lazy = False, no_cache = False):
+    if database in schemas:
+        return schemas[database]
+
+    schema = Schema(database)
+
+    if no_cache or not cache_enabled():
+        if lazy:
+            schema.fetch_lazy(user, password)
+        else:
+            schema.fetch(user, password)
+            schema.changed_tables = list(schema.tables)
+        return register_schema(schema)
+
+    filename = schema.cache_filename()
+    snapshot = schema.read_snapshot(filename)
+    if snapshot == None and lazy:
+        # a partial schema is not saved, without snapshot the fingerprint is useless.
+        # A full load (meta, workflow) writes the snapshot used by the next lazy runs.
+        schema.fetch_lazy(user, password)
+        return register_schema(schema)
+
+    db = schema.connect(user, password)
+    fingerprint = schema.fingerprint(db)
     db.close()
 
-    return data
- 
+    if snapshot != None:
+        schema.restore_snapshot(snapshot)
+        schema.cache_file = filename
+        if snapshot['fingerprint'] == fingerprint:
+            schema.changed_tables = []
+            return register_schema(schema)
+
+        # only the tables which have changed are fetched
+        db = schema.connect(user, password)
+        schema.refresh(db, fingerprint)
+        db.close()
+        schema.save_snapshot(filename, fingerprint)
+        return register_schema(schema)
+
+    schema.fetch(user, password)
+    schema.save_snapshot(filename, fingerprint)
+    schema.changed_tables = list(schema.tables)
+    return register_schema(schema)
+
+"""
+    return a schema read from a binary snapshot, no database connection is needed
+"""
+def load_binary_snapshot(filename):
+    schema = Schema("")
+    schema.open_binary(filename)
+    return register_schema(schema)
+
+"""
+    return a schema read from a file: a binary snapshot, a mysqldump file or a
+    snapshot of the cache. It is not registered, it can describe the same database
+    as the current schema at another time.
 """
-    Get the list of tables in the database
+def open_schema_file(filename, database = ""):
+    with open(filename, 'rb') as f:
+        magic = f.read(len(binary_magic))
+
+    schema = Schema(database)
+    if magic == binary_magic:
+        schema.open_binary(filename)
+        return schema
+
+    snapshot = schema.read_snapshot(filename)
+    if snapshot != None:
+        schema.restore_snapshot(snapshot)
+        return schema
+
+    schema.load_dump(filename)
+    return schema
+
 """
-def get_tables(db, database):
-    global tables
-    cursor = db.cursor()
-    query = " SELECT table_schema, table_name FROM information_schema.tables WHERE table_schema = '" + database + "'"
-    cursor.execute(query)
-    for (table_schema, table_name) in cursor:
-        tables.append(table_name)
-    return tables
+    return a schema read from a mysqldump file, no database connection is needed
+"""
+def load_dump(filename, database = ""):
+    schema = Schema(database)
+    schema.load_dump(filename)
+    return register_schema(schema)
+
+def export_binary_snapshot(filename):
+    current_schema().export_binary(filename)
+
+# Concurrent introspection
+"""
+    Several databases of the same server can be fetched concurrently through
+    a pool of connections. Inside a database the columns are read by batches of tables.
+
+    - META_DB_POOL_SIZE: number of connections of the pool (default 4, at most 32)
+    - META_DB_BATCH_SIZE: number of tables per columns query (default 100, 0 for all the tables)
+"""
+def pool_size():
+    import mysql.connector.pooling
+
+    # the pools of mysql.connector are limited to CNX_POOL_MAXSIZE (32) connections
+    size = int(os.environ.get('META_DB_POOL_SIZE', 4))
+    return min(max(size, 1), mysql.connector.pooling.CNX_POOL_MAXSIZE)
+
+def batch_size():
+    return int(os.environ.get('META_DB_BATCH_SIZE', 100))
+
+"""
+    Create a pool of connections to the server, the connections are not
+    attached to a database, the queries name the database explicitly
+"""
+def connection_pool(user, password, size = 0):
+    import mysql.connector.pooling
+
+    host = os.environ['META_DB_HOST'] if 'META_DB_HOST' in os.environ else 'localhost'
+    port = os.environ['META_DB_PORT'] if 'META_DB_PORT' in os.environ else 3306
+    if size <= 0:
+        size = pool_size()
+    return mysql.connector.pooling.MySQLConnectionPool(pool_name="ddd-gen", pool_size=size,
+        host=host, user=user, passwd=password, port=int(port))
+
+"""
+    Run a query with a connection of the pool and return all the lines
+"""
+def pooled_query(pool, query):
+    db = pool.get_connection()
+    try:
+        cursor = db.cursor()
+        cursor.execute(query)
+        lines = cursor.fetchall()
+        cursor.close()
+    finally:
+        db.close()          # back to the pool
+    return lines
+
+"""
+    Fetch several databases concurrently
+
+    The up to date snapshots are used when the cache is enabled.
+    The schemas are registered, the function returns them in the order of the databases.
+"""
+def fetch_databases(databases, user, password, no_cache = False):
+    pool = connection_pool(user, password)
+    use_cache = not no_cache and cache_enabled()
+    result = [schemas[database] if database in schemas else Schema(database) for database in databases]
+    todo = [schema for schema in result if schema.database not in schemas]
+
+    with ThreadPoolExecutor(max_workers=pool.pool_size) as executor:
+        fingerprints = {}
+        if use_cache:
+            def fingerprint(schema):
+                db = pool.get_connection()
+                try:
+                    return schema.fingerprint(db)
+                finally:
+                    db.close()
+            for schema, fp in zip(todo, executor.map(fingerprint, todo)):
+                fingerprints[schema.database] = fp
+
+            # up to date snapshots are used, the old ones are refreshed
+            def refresh(schema):
+                db = pool.get_connection()
+                try:
+                    schema.refresh(db, fingerprints[schema.database])
+                finally:
+                    db.close()
+                schema.save_snapshot(schema.cache_filename(), fingerprints[schema.database])
+
+            refreshed = []
+            for schema in todo:
+                snapshot = schema.read_snapshot(schema.cache_filename())
+                if snapshot != None:
+                    schema.restore_snapshot(snapshot)
+                    schema.cache_file = schema.cache_filename()
+                    if snapshot['fingerprint'] == fingerprints[schema.database]:
+                        schema.changed_tables = []
+                    else:
+                        refreshed.append(schema)
+            list(executor.map(refresh, refreshed))
+            todo = [schema for schema in todo if schema.changed_tables == None]
+
+        def get_tables(schema):
+            schema.tables[:] = [line[1] for line in pooled_query(pool, schema.tables_query())]
+        list(executor.map(get_tables, todo))
+
+        # the queries of all the databases are submitted before storing the results
+        size = batch_size()
+        pending = [schema.fetch_concurrent(pool, executor, size) for schema in todo]
+        for schema, queries in zip(todo, pending):
+            schema.store_fetched(queries)
+            schema.changed_tables = list(schema.tables)
+            if use_cache:
+                schema.save_snapshot(schema.cache_filename(), fingerprints[schema.database])
+
+    for schema in result:
+        register_schema(schema)
+    return result
 
 """
     Analyze the CLI arguments and fetch the data from the database
+
+    In lazy mode, when there is no up to date snapshot, the tables are only
+    fetched when they are accessed.
 """
-def check_args_and_fetch(args):
+def check_args_and_fetch(args, lazy = False):
     # Analyze CLI parameters and env variables
     database = os.environ['META_DB'] if 'META_DB' in os.environ else ""
     if args.database:
@@ -73,6 +1545,30 @@ def check_args_and_fetch(args):
     if args.password:
         password = args.password
 
+    snapshot = os.environ['META_SNAPSHOT'] if 'META_SNAPSHOT' in os.environ else ""
+    if getattr(args, 'snapshot', None):
+        snapshot = args.snapshot
+
+    if (snapshot):
+        # the schema is read from a binary snapshot, no database is needed
+        if (not os.path.exists(snapshot)):
+            print ("snapshot file not found: " + snapshot)
+            exit(1)
+        schema = use_schema(load_binary_snapshot(snapshot))
+        return schema.database, user, password
+
+    dump = os.environ['META_DUMP'] if 'META_DUMP' in os.environ else ""
+    if getattr(args, 'dump', None):
+        dump = args.dump
+
+    if (dump):
+        # the schema is read from a mysqldump file, no database is needed
+        if (not os.path.exists(dump)):
+            print ("dump file not found: " + dump)
+            exit(1)
+        schema = use_schema(load_dump(dump, database))
+        return schema.database, user, password
+
     if (not database):
         print ("database not defined: META_DB or -d argument")
         exit(1)
@@ -84,411 +1580,175 @@ def check_args_and_fetch(args):
     if (not password):
         print ("password not defined: META_DB_PASSWORD or -p argument")
         exit(1)
-    fetch_data(database, user, password)
+
+    no_cache = getattr(args, 'no_cache', False)
+    if ',' in database:
+        # several databases, the first one is the current one
+        databases = [name.strip() for name in database.split(',') if name.strip()]
+        use_schema(fetch_databases(databases, user, password, no_cache)[0])
+    elif 'META_DB_POOL_SIZE' in os.environ and not lazy:
+        use_schema(fetch_databases([database], user, password, no_cache)[0])
+    else:
+        use_schema(load_schema(database, user, password, lazy, no_cache))
     return database, user, password
 
+def foreign_key_timing(database, user, password):
+    return get_schema(database).foreign_key_timing(user, password)
+
+# Snapshot cache
 """
-    Fetch the list of fields for a table
+    The schema description is saved on disk after introspection, one file per
+    host, port and database. The next invocations only compute a fingerprint
+    of the schema and reload the snapshot when it has not changed.
+
+    - META_CACHE_DIR: directory of the snapshots (default ~/.cache/ddd-gen)
+    - META_CACHE: set it to off to disable the cache
 """
-def get_fields(db, database, table):
-    cursor = db.cursor()
-    query = " SHOW FULL COLUMNS FROM " + table + " FROM " + database
-    cursor.execute(query)
-    field_l[table] = []
-    attributes[table] = {}
-    metadata[table] = {}
-    for field in cursor:
-        # fields.append(id, type, collation, null, key, extra, privileges, comment)
+snapshot_version = 1
 
-        elt = {}
-        elt['field'] = field[0]
-        elt['type'] = field[1]
-        elt['collation'] = field[2]
-        elt['null'] = field[3]
-        elt['key'] = field[4]
-        elt['default'] = field[5]
-        elt['extra'] = field[6]
-        elt['privileges'] = field[7]
-        elt['comment'] = field[8]
-
-        attributes[table][elt['field']] = elt
-        field_l[table].append(elt['field'])
+# Binary snapshots: magic, version, index offset, index length
+binary_header = '<8sIQQ'
+binary_magic = b'DDDGSNAP'
+binary_version = 2
 
-        # metadata
-        metadata[table][elt['field']] = {}
-        if elt['comment']:
-            try:
-                comment_meta = json.loads(elt['comment'])
-                for key in comment_meta:
-                    metadata[table][elt['field']][key] = comment_meta[key]
-                    # print (table, elt['field'], key, metadata[table][elt['field']][key])
-            except Exception as e:
-                # print ("Exception in json: ", e)
-                None
+def binary_block(data):
+    return json.dumps(data, default=str, separators=(',', ':')).encode('utf8')
 
-    return attributes
+def cache_enabled():
+    return os.environ.get('META_CACHE', 'on').lower() not in ['off', 'no', 'false', '0']
 
 """
-    Fetch the metadata for a table
-"""
-def fetch_metadata(db, database, table):
-    
-    try:
-        cursor = db.cursor()
-        # query = " SHOW FULL COLUMNS FROM " + table + " FROM " + database
-        # get all the metadata lines for a table
-        query = "SELECT * FROM `metadata` WHERE `table`='" + table + "';"
-        cursor.execute(query)
-
-        for line in cursor:
-            # print (line)
-            field = line[2]
-            key = line[3]
-            value = line[4]
-
-            if not field:
-                # metadata for the table itself
-                if (table not in table_metadata):
-                    table_metadata[table] = {}
-                table_metadata[table][key] = value
-                continue
-
-            if table not in metadata:
-                metadata[table] = {}
-            if field not in metadata[table]:
-                metadata[table][field] = {}
-            
-            # Is it a good idea to be flexible here ?
-            # May be that I should be strict and only accept well formed json
-            if key == 'json' and value != None and value != "":
-                json_list = json.loads(value)
-                for elt in json_list:
-                    metadata[table][field][elt] = json_list[elt]
-            else:
-                metadata[table][field][key] = value
-
-    except Exception as e:
-        return None
+    return the tables which have changed since workflow --changed installed
+    their code, all the tables when it is unknown
 
+    The changes found by every run (meta, snp, tpl, workflow) are accumulated
+    in the snapshot, they are not lost when another command refreshes it first.
 """
-    Fetch the foreign key information for a table
-    and store them in memory
-"""
-def fetch_foreign_key_information(db, database, table):
-    fields = field_l[table]
-    cursor = db.cursor()
-    query = "SELECT CONSTRAINT_SCHEMA, CONSTRAINT_NAME, TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
-    query = query + "FROM information_schema.KEY_COLUMN_USAGE "
-    query = query + "WHERE CONSTRAINT_SCHEMA = '" + database + "' AND TABLE_NAME = '" + table + "'" 
-    cursor.execute(query)
-    
-    foreign[table] = {}
+def changed_tables():
+    if current_schema().pending_tables == None:
+        return current_schema().table_list()
+    return current_schema().pending_tables
 
-    for line in cursor:
-        referenced_table = line[4]
-        table = line[2]
-        field = line[3]
-        reference = {}
-        reference['table'] = line[4]
-        reference['field'] = line[5]
-        if (referenced_table):
-            foreign[table][field] = reference
-    return foreign
+def consume_changed_tables():
+    current_schema().consume_pending_tables()
 
-"""
-    Check if a table exists 
-"""
+# Accessors on the current schema
 def check_table_exists(table):
-    if table not in attributes:
-        raise Exception("Table not found: " + table)
+    current_schema().check_table_exists(table)
 
-"""
-    Check if a field exists in a table
-"""    
 def check_field_exists(table, field):
-    if table not in attributes:
-        raise Exception("Table not found: " + table)
-    if field not in attributes[table]:
-        raise Exception("Field not found: " + field + " in table " + table)
+    current_schema().check_field_exists(table, field)
 
-"""
-    List the tables in the database
-"""    
 def table_list():
-    return tables
+    return current_schema().table_list()
 
-"""
-    List the fields in a table
-"""
 def field_list(table):
-    check_table_exists(table)
-    return field_l[table]
+    return current_schema().field_list(table)
 
-""" 
-    return the attributes of a field
-"""
 def field_attributes(table, field):
-    check_field_exists(table, field)
-    return attributes[table][field]
+    return current_schema().field_attributes(table, field)
 
-"""
-    return the name of a field
-"""
 def field_name(table, field):
-    check_field_exists(table, field)
-    return attributes[table][field]['field']
+    return current_schema().field_attribute(table, field, 'field')
 
-"""
-    return the type of a field
-"""
 def field_type(table, field):
-    check_field_exists(table, field)
-    return attributes[table][field]['type']
+    return current_schema().field_attribute(table, field, 'type')
 
-"""
-    return the collation of a field
-"""
 def field_collation(table, field):
-    check_field_exists(table, field)
-    return attributes[table][field]['collation']
+    return current_schema().field_attribute(table, field, 'collation')
 
 """
-    return the nullability of a field
+    return the nullability of a field, 'YES' or 'NO'
 """
 def field_null(table, field):
-    check_field_exists(table, field)
-    return attributes[table][field]['null']
+    return current_schema().field_attribute(table, field, 'null')
 
-"""
-    return the key of a field
-"""
 def field_key(table, field):
-    check_field_exists(table, field)
-    return attributes[table][field]['key']
+    return current_schema().field_attribute(table, field, 'key')
 
-"""
-    return the default value of a field
-"""
 def field_default(table, field):
-    check_field_exists(table, field)
-    return attributes[table][field]['default']
+    return current_schema().field_attribute(table, field, 'default')
 
-"""
-    return the extra values for a field
-"""
 def field_extra(table, field):
-    check_field_exists(table, field)
-    return attributes[table][field]['extra']
+    return current_schema().field_attribute(table, field, 'extra')
 
-"""
-    return the privileges of a field
-"""
 def field_privileges(table, field):
-    check_field_exists(table, field)
-    return attributes[table][field]['privileges']
+    return current_schema().field_attribute(table, field, 'privileges')
 
-"""
-    return the comment of a field
-"""
 def field_comment(table, field):
-    check_field_exists(table, field)
-    return attributes[table][field]['comment']
-
-"""
-    return the size of a field
-"""
-def field_size(table, field):
-    check_field_exists(table, field)
-    type = attributes[table][field]['type']
+    return current_schema().field_attribute(table, field, 'comment')
 
-    reg = r'(.+)\((.*)\)'
-    match = re.match(reg, type)
+def field_descriptor(table, field):
+    return current_schema().field_descriptor(table, field)
 
-    if match:
-        insideBracket = match.group(2)
-        if insideBracket.isdigit():
-            return int(insideBracket)
-        else:
-            return 0
-    else:
-        return 0
+def field_size(table, field):
+    return current_schema().field_descriptor(table, field).size
 
 """
     Extract the base type from the type
     some types are just string like date, timestamp, etc.
     some types have a size inside parenthesis like varchar(255), int(11), etc.
     some types have a size and a number of decimal digits like decimal(10,2), float(10,2), etc.
-    some types have a range like enum('a', 'b', 'c'), set('a', 'b', 'c'), etc. 
+    some types have a range like enum('a', 'b', 'c'), set('a', 'b', 'c'), etc.
 
 """
-# re.search(r'\((.*?)\)',s).group(1)    
 def field_base_type(table, field):
-    check_field_exists(table, field)
-    type = attributes[table][field]['type']
+    return current_schema().field_descriptor(table, field).base_type
 
-    reg = r'(.+)\((.*)\)'
-    match = re.match(reg, type)
-
-    if match:
-        return match.group(1)
-    else:
-        return type
+"""
+    return the number of digits and the number of decimal digits of a field
+    (10, 2) for decimal(10,2)
+"""
+def field_precision(table, field):
+    descriptor = current_schema().field_descriptor(table, field)
+    return descriptor.precision, descriptor.scale
 
 """
     return the enum values of a field
     if the field is not an enum returns an empty list
 """
 def field_enum_values(table, field):
-    check_field_exists(table, field)
-    type = attributes[table][field]['type']
-    reg = r'enum\((.*)\)'
-    match = re.match(reg, type)
-    if match:
-        insideBracket = match.group(1)
-        insideBracket = insideBracket.replace("'", "")
-        return insideBracket.split(',')
-    else:
-        return []
+    return current_schema().field_descriptor(table, field).enum_values
 
 """
-    return the unsignedness of a field
+    return the set values of a field
+    if the field is not a set returns an empty list
 """
+def field_set_values(table, field):
+    return current_schema().field_descriptor(table, field).set_values
+
 def field_unsigned(table, field):
-    check_field_exists(table, field)
-    type = attributes[table][field]['type']
-    unsigned = 'unsigned' in type
-    return unsigned
+    return current_schema().field_descriptor(table, field).unsigned
 
-"""
-    return the nullable of a field
-"""
 def field_nullable(table, field):
-    check_field_exists(table, field)
-    null = attributes[table][field]['null']
-    return null == 'YES'
+    return current_schema().field_descriptor(table, field).nullable
 
-"""
-    return the metadata of a field
-
-    metadata has already been fetched from the database and stored in memory
-"""
 def field_meta(table, field, key):
-    check_field_exists(table, field)
+    return current_schema().field_meta(table, field, key)
 
-    if table not in metadata:
-        return None
-    
-    if field not in metadata[table]:
-        return None
-
-    if key not in metadata[table][field]:
-        return None
-    
-    return metadata[table][field][key]
-
-"""
-    return the metadata of a table
-"""
 def table_meta(table, key = ''):
-    if table not in table_metadata:
-        return None
-    
-    if not key:
-        return table_metadata[table]
-    
-    if key not in table_metadata[table]:
-        return None
-    
-    return table_metadata[table][key]
+    return current_schema().table_meta(table, key)
 
+def invalidate_subtypes(table = None):
+    current_schema().invalidate(table)
 
-"""
-    return the subtype of a field
-"""
 def field_subtype(table, field):
-    try:
+    return current_schema().field_subtype(table, field)
 
-        fk = field_foreign_key(table, field)
-        if fk != None:
-            return 'foreign_key'
-        
-        subtype = field_meta(table, field, 'subtype')
-        if subtype != None:
-            return subtype
-        
-        """
-        Conventions over configuration.
-        if subtype has not been defined in the metadata it can be deduced from the field name
-        """
-
-        if 'image' in field:
-            return 'image'
-        if 'string_id' in field:
-            return 'string_id'
-        if 'file' in field:
-            return 'file'
-        if 'password' in field:
-            return 'password'
-        if 'email' in field:
-            return 'email'
-        if 'url' in field:
-            return 'url'
-        if 'phone' in field:
-            return 'phone'
-
-        base_type = field_base_type(table, field)
-        if base_type in ['int', 'tinyint', 'smallint', 'mediumint', 'bigint']:
-            return 'integer'
-        if base_type in ['decimal', 'float', 'double']:
-            return 'float'
-        if base_type in ['bool', 'boolean']:
-            return 'boolean'
-        if base_type == 'date':
-            return 'date'
-        if base_type == 'datetime':
-            return 'datetime'           
-        if base_type in [ 'timestamp', 'time']:
-            return 'time'
-        if  base_type in ['text', 'tinytext', 'mediumtext', 'longtext']:
-            return 'text'
-        if base_type in ['char', 'varchar']:
-            return 'string'
-        if base_type in ['enum']:
-            return 'enum'
-        if base_type in ['set']:
-            return 'set'
-        if base_type in ['binary', 'varbinary', 'blob', 'tinyblob', 'mediumblob', 'longblob']:
-            return 'binary'
-        
-    except Exception as e:
-        print ("Exception in field_subtype: ", e)
-        return "exception"
-
-"""
-    check if a field is mass assignable
 """
+    return the subtypes of all the fields of a table
+"""
+def table_subtypes(table):
+    return {field: current_schema().field_subtype(table, field) for field in current_schema().field_list(table)}
+
 def field_fillable(table, field):
-    check_field_exists(table, field)
-    if field in ["id", "created_at", "updated_at"]: return False
-    # if field_is_primary_key(table, field): return False
-
-    if (field_meta(table,field, 'fillable') != None): 
-        return toBoolean(field_meta(table,field, 'fillable'))
-    return not toBoolean(field_meta(table,field, 'guarded'))
-    
+    return current_schema().field_fillable(table, field)
+
 def field_guarded(table, field):
-    return not field_fillable(table, field)
+    return not current_schema().field_fillable(table, field)
 
-"""
-If a field is a foreign key returns information about it
-else returns None
-"""
 def field_foreign_key(table, field):
-    check_field_exists(table, field)
-    if table in foreign:
-        if field in foreign[table]:
-            return foreign[table][field]
-    return None
+    return current_schema().field_foreign_key(table, field)
 
 """
     Check if a field is a primary key
@@ -499,16 +1759,28 @@ def field_is_primary_key(table, field):
 def field_is_unique(table, field):
     return field_key(table, field) == 'UNI' or field_is_primary_key(table, field)
 
-"""
-    returns the primary field of a table
-"""
 def primary_key(table):
-    for f in field_list(table):
-        if field_is_primary_key(table, f):
-            return f
-    return None
+    return current_schema().primary_key(table)
+
+def referenced_tables(table):
+    return current_schema().referenced_tables(table)
+
+def foreign_keys_to(table):
+    return current_schema().foreign_keys_to(table)
+
+def tables_referencing(table):
+    return current_schema().tables_referencing(table)
+
+def foreign_key_path(source, destination):
+    return current_schema().foreign_key_path(source, destination)
+
+def table_fingerprint(table):
+    return current_schema().table_fingerprint(table)
+
+def table_fingerprint_complete(table):
+    return current_schema().table_fingerprint_complete(table)
 
 """
     TODO: indirect attributes access
     I likely also need information about allowed ranges, allowed values, etc.
-"""
\ No newline at end of file
+"""
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+
+import os
+import inspect
+import importlib
+
+"""
+Registry of the snippets
+
+The generator functions register themselves with the snippet decorator:
+
+    @snippet("CSV list of guarded fields")
+    def guarded(table):
+
+template_engine.cg and snp.py find them by name in the registry. A module
+can also be declared without being imported, it is imported the first time
+one of its snippets is referenced:
+
+    declare_snippets('my_generators.react', ['field_list_cards'])
+
+or with the CG_SNIPPET_MODULES environment variable:
+
+    CG_SNIPPET_MODULES=my_generators.react:field_list_cards,field_list_grid;other.module:snippet
+"""
+
+"""
+    Description of a snippet
+
+    template is True when the snippet can be used in a template, {{#cg}} name {{/cg}},
+    it is then called with the table only. The other ones are only available from snp.
+"""
+class Snippet:
+    __slots__ = ('name', 'function', 'doc', 'args', 'template', 'module')
+
+    def __init__(self, name, function, doc, template):
+        self.name = name
+        self.function = function
+        self.doc = doc
+        self.template = template
+        self.module = function.__module__
+        self.args = list(inspect.signature(function).parameters.values())
+
+    """
+        return the signature as a string: name(table, ntabs=4)
+    """
+    def signature(self):
+        return self.name + '(' + ', '.join(str(arg) for arg in self.args) + ')'
+
+    def __repr__(self):
+        return f"Snippet({self.signature()})"
+
+registry = {}       # registry[name] = Snippet
+lazy_modules = {}   # lazy_modules[name] = module which registers the snippet when it is imported
+
+"""
+    Decorator which registers a function as a snippet
+"""
+def snippet(doc = "", name = None, template = True):
+    def register(function):
+        register_snippet(function, doc, name, template)
+        return function
+    return register
+
+def register_snippet(function, doc = "", name = None, template = True):
+    if name == None:
+        name = function.__name__
+    registry[name] = Snippet(name, function, doc or name, template)
+    lazy_modules.pop(name, None)
+    return registry[name]
+
+"""
+    Declare the snippets of a module which is imported on first use
+"""
+def declare_snippets(module, names):
+    for name in names:
+        if name not in registry:
+            lazy_modules[name] = module
+
+"""
+    Read the declarations of the CG_SNIPPET_MODULES environment variable
+"""
+def declare_snippet_modules(text):
+    for declaration in text.split(';'):
+        if ':' in declaration:
+            module, names = declaration.split(':', 1)
+            declare_snippets(module.strip(), [name.strip() for name in names.split(',') if name.strip()])
+
+"""
+    return a snippet, None when it is unknown
+"""
+def get_snippet(name):
+    if name in registry:
+        return registry[name]
+    if name in lazy_modules:
+        module = lazy_modules.pop(name)
+        importlib.import_module(module)
+        if name not in registry:
+            print ("module", module, "does not register the snippet", name)
+    return registry.get(name)
+
+"""
+    return the names of the known snippets, the declared ones included
+"""
+def snippet_names(template_only = False):
+    names = [name for name in registry if registry[name].template or not template_only]
+    if not template_only:
+        names += [name for name in lazy_modules if name not in names]
+    return names
+
+declare_snippet_modules(os.environ.get('CG_SNIPPET_MODULES', ''))
@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+
+import random
+import json
+from lib.schema import *
+from lib.ddl import privileges
+
+"""
+Generate synthetic database schemas
+
+The generator builds the description of a database (see lib/ddl.py) of any
+size, it is loaded directly into a Schema without MySQL. It is used to measure
+the code generation on schemas from 10 to 10,000 tables. With the same options
+and seed the schema is always the same.
+
+    tables          number of tables, the metadata table is added
+    columns         number of columns per table, the primary key included
+    fk_density      proportion of the columns which are foreign keys to previous tables
+    enum_ratio      proportion of the other columns which are enums
+    varchar_ratio   proportion of the other columns which are varchars
+    metadata_rows   number of lines in the metadata table per table
+"""
+
+default_options = {
+    'tables': 100,
+    'columns': 10,
+    'fk_density': 0.1,
+    'enum_ratio': 0.1,
+    'varchar_ratio': 0.5,
+    'metadata_rows': 2,
+    'seed': 0,
+    'database': 'synthetic'
+}
+
+# types of the columns which are neither varchars, enums nor foreign keys
+other_types = ['int', 'bigint unsigned', 'tinyint(1)', 'decimal(10,2)', 'date', 'datetime', 'text']
+
+varchar_subtypes = ['email', 'url', 'phone', 'color', 'image', 'password']
+
+collation = 'utf8mb4_unicode_ci'
+
+metadata_columns = [
+    ('id', 'bigint unsigned', None, 'NO', 'PRI', None, 'auto_increment', privileges, ''),
+    ('table', 'varchar(64)', collation, 'NO', '', None, '', privileges, ''),
+    ('column', 'varchar(64)', collation, 'YES', '', None, '', privileges, ''),
+    ('key', 'varchar(64)', collation, 'NO', '', None, '', privileges, ''),
+    ('value', 'varchar(255)', collation, 'YES', '', None, '', privileges, '')
+]
+
+def table_name(index):
+    return f"entity_{index:05d}_records"
+
+"""
+    return the options with the default values for the missing ones
+"""
+def synthetic_options(options = {}):
+    result = dict(default_options)
+    for key in options:
+        if key not in default_options:
+            raise Exception("Unknown synthetic schema option: " + key)
+        result[key] = type(default_options[key])(options[key])
+    return result
+
+"""
+    Parse options written as tables=1000,columns=20,fk_density=0.2
+"""
+def parse_synthetic_options(text):
+    options = {}
+    for item in text.split(','):
+        if item.strip():
+            key, value = item.split('=', 1)
+            options[key.strip()] = value.strip()
+    return synthetic_options(options)
+
+"""
+    Build the description of a synthetic database
+"""
+def synthetic_description(options = {}):
+    options = synthetic_options(options)
+    rand = random.Random(options['seed'])
+
+    description = {'database': options['database'], 'tables': [], 'columns': {}, 'foreign': [], 'metadata': []}
+    metadata_id = 0
+
+    for index in range(1, options['tables'] + 1):
+        table = table_name(index)
+        rows = [('id', 'bigint unsigned', None, 'NO', 'PRI', None, 'auto_increment', privileges, '')]
+
+        for column in range(1, options['columns']):
+            if index > 1 and rand.random() < options['fk_density']:
+                referenced = table_name(rand.randint(1, index - 1))
+                field = f"{referenced.rstrip('s')}_{column}_id"
+                rows.append((field, 'bigint unsigned', None, 'NO', 'MUL', None, '', privileges, ''))
+                description['foreign'].append((options['database'], f"{table}_{field}_foreign", table, field, referenced, 'id'))
+                continue
+
+            field = f"field_{column}"
+            draw = rand.random()
+            null = 'YES' if rand.random() < 0.3 else 'NO'
+            comment = ''
+            if draw < options['enum_ratio']:
+                values = ','.join(f"'value_{value}'" for value in range(rand.randint(2, 6)))
+                rows.append((field, 'enum(' + values + ')', collation, null, '', None, '', privileges, comment))
+            elif draw < options['enum_ratio'] + options['varchar_ratio']:
+                if rand.random() < 0.2:
+                    comment = json.dumps({'subtype': rand.choice(varchar_subtypes)})
+                key = 'UNI' if column == 1 else ''
+                rows.append((field, f"varchar({rand.choice([32, 64, 128, 255])})", collation, null, key, None, '', privileges, comment))
+            else:
+                type = rand.choice(other_types)
+                rows.append((field, type, collation if type == 'text' else None, null, '', None, '', privileges, comment))
+
+        description['tables'].append(table)
+        description['columns'][table] = rows
+
+        # metadata lines: labels and fillable flags on fields, image field on the table
+        for line in range(options['metadata_rows']):
+            metadata_id += 1
+            field = rows[rand.randint(1, len(rows) - 1)][0] if len(rows) > 1 else None
+            if line % 3 == 2 or field == None:
+                description['metadata'].append((metadata_id, table, None, 'imageField', rows[-1][0]))
+            elif line % 3 == 1:
+                description['metadata'].append((metadata_id, table, field, 'json', json.dumps({'fillable': 'yes', 'hidden': 'no'})))
+            else:
+                description['metadata'].append((metadata_id, table, field, 'label', field.replace('_', ' ').capitalize()))
+
+    description['tables'].append('metadata')
+    description['columns']['metadata'] = metadata_columns
+    return description
+
+"""
+    return a synthetic schema, it is registered as the other schemas
+"""
+def load_synthetic_schema(options = {}):
+    description = synthetic_description(options)
+    schema = Schema(description['database'])
+    schema.load_description(description)
+    return register_schema(schema)
+
+"""
+    return the description as a mysqldump file, to exercise the tools
+    which read a dump (-dd or META_DUMP)
+"""
+def synthetic_dump(description):
+    lines = ["-- Synthetic schema    Database: " + description['database'], ""]
+    foreign = {}
+    for line in description['foreign']:
+        foreign.setdefault(line[2], []).append(line)
+
+    for table in description['tables']:
+        definitions = []
+        keys = []
+        for (field, type, field_collation, null, key, default, extra, field_privileges, comment) in description['columns'][table]:
+            definition = "  `" + field + "` " + type
+            if field_collation:
+                definition += " COLLATE " + field_collation
+            definition += " NOT NULL" if null == 'NO' else " DEFAULT NULL"
+            if extra:
+                definition += " " + extra.upper()
+            if comment:
+                definition += " COMMENT '" + comment.replace("\\", "\\\\").replace("'", "\\'") + "'"
+            definitions.append(definition)
+            if key == 'PRI':
+                keys.append("  PRIMARY KEY (`" + field + "`)")
+            elif key == 'UNI':
+                keys.append("  UNIQUE KEY `" + table + "_" + field + "_unique` (`" + field + "`)")
+
+        for (database, constraint, fk_table, field, referenced, referenced_field) in foreign.get(table, []):
+            keys.append("  KEY `" + constraint + "` (`" + field + "`)")
+            keys.append("  CONSTRAINT `" + constraint + "` FOREIGN KEY (`" + field + "`) REFERENCES `" + referenced + "` (`" + referenced_field + "`)")
+
+        lines.append("CREATE TABLE `" + table + "` (")
+        lines.append(",\n".join(definitions + keys))
+        lines.append(") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=" + collation + ";")
+        lines.append("")
+
+    if description['metadata']:
+        values = []
+        for line in description['metadata']:
+            values.append("(" + ",".join(sql_literal(value) for value in line) + ")")
+        lines.append("INSERT INTO `metadata` VALUES " + ",".join(values) + ";")
+    return "\n".join(lines) + "\n"
+
+def sql_literal(value):
+    if value == None:
+        return "NULL"
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
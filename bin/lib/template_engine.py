@@ -4,8 +4,13 @@ import chevron
 import shutil
 import filecmp
 import os
+import hashlib
+import json
+import types
 
 from lib.code_generator import *
+from lib.generators import *
+from lib.memo import *
 
 """
     template_engine.py
@@ -23,78 +28,280 @@ from lib.code_generator import *
     and replace them with the content of the snippet.
 """
 
-table = ""
+"""
+    Everything a render depends on: the table, the schema, the modules of the
+    generators whose snippets can be used and the options of the run.
+
+    The render does not use any global state, several tables and templates can
+    be rendered at the same time by threads or tasks, every one with its context.
+"""
+class RenderContext:
+
+    def __init__(self, table, schema = None, generators = None, options = {}):
+        self.table = table
+        self.schema = schema if schema != None else current_schema()
+        self.generators = list(generators) if generators != None else list(selection)
+        self.options = dict(options)
+
+    """
+        return the snippet of a {{#cg}} section, None when it is not available
+    """
+    def snippet(self, text):
+        args = text.split()
+        entry = find_snippet(args[0], self.generators) if args else None
+        return entry if self.allowed(entry) else None
+
+    """
+        check if a snippet can be used in a template for the generators of the context
+    """
+    def allowed(self, entry):
+        return entry != None and entry.template and generator_allowed(entry, self.generators)
 
-def cg(text, render):
+    def __repr__(self):
+        return f"RenderContext({self.table}, {self.schema.database})"
+
+def cg(text, render, context):
     # print("cg:", text)
-    args = text.split()
-    snippet = args[0]
-
-    match snippet:
-        case "csv_fields":
-            code = csv_fields(table)
-        case "guarded":
-            code = guarded(table)
-        case "create_validation_rules":
-            code = create_validation_rules(table)
-        case "update_validation_rules":
-            code = update_validation_rules(table)
-        case "create_set_attributes":
-            code = create_set_attributes(table)        
-        case "update_set_attributes":
-            code = update_set_attributes(table)
-        case "primary_key_declaration":
-            code = primary_key_declaration(table)
-        case "factory_referenced_models":
-            code = factory_referenced_models(table)
-        case "factory_field_list":
-            code = factory_field_list(table)
-        case "csv_high_variability_fields":
-            code = csv_high_variability_fields(table)
-        case "field_list_translation":
-            code = field_list_translation(table)
-        case "field_list_cells":
-            code = field_list_cells(table)
-        case "field_list_titles":
-            code = field_list_titles(table)
-        case "field_list_input_form":
-            code = field_list_input_form(table)
-        case "set_form_data":
-            code = set_form_data(table)
-        case "join_for_images":
-            code = join_for_images(table)
-                    
-        case _:
-            code = "unknown snippet " + snippet
-            print(code)
-            # to be able to run several code generators recognizing different snippets
-            # we must return the original text
-            return '{{#cg}}' + text + '{{/cg}}'
 
+    # the snippets register themselves in lib/snippets.py
+    entry = context.snippet(text)
+    if entry == None:
+        # the unknown snippets are reported by compile_template
+        # to be able to run several code generators recognizing different snippets
+        # we must return the original text
+        return '{{#cg}}' + text + '{{/cg}}'
+
+    # the result is memoized by table fingerprint, see lib/memo.py
+    code = call_snippet(entry, context.table)
     result = render(code)
     return result
 
-def process(current_table, template, output_file, install_file, action, verbose):
+"""
+    Compiled templates
+
+    A template is tokenized once per run and rendered for every table from its
+    tokens. The tokens are also kept on disk, in the templates directory of the
+    schema cache (META_CACHE_DIR), keyed by the hash of the template, so an
+    unchanged template is not tokenized again by the next runs. The tokens are
+    stored in json, the cache only holds data.
+"""
+template_cache = {}     # template_cache[filename] = ((mtime, size), tokens, hash of the template)
+
+def template_cache_filename(digest):
+    cache_dir = os.environ.get('META_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ddd-gen'))
+    return os.path.join(cache_dir, 'templates', digest + '.json')
+
+"""
+    return the tokens of a template, the unknown snippets are reported once
+"""
+def compile_template(filename):
+    stat = os.stat(filename)
+    version = (stat.st_mtime_ns, stat.st_size)
+    if filename in template_cache and template_cache[filename][0] == version:
+        return template_cache[filename][1]
+
+    with open(filename, 'r') as f:
+        text = f.read()
+    digest = hashlib.sha1(text.encode('utf8')).hexdigest()
+    cache_file = template_cache_filename(digest) if cache_enabled() else ""
+
+    tokens = None
+    if cache_file and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                tokens = [(tag, key) for tag, key in json.load(f)]
+        except (OSError, ValueError, TypeError):
+            tokens = None
+
+    if tokens == None:
+        tokens = list(chevron.tokenizer.tokenize(text))
+        if cache_file:
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                tmp = cache_file + '.tmp'
+                with open(tmp, 'w') as f:
+                    json.dump(tokens, f)
+                os.replace(tmp, cache_file)
+            except OSError as e:
+                print ("Compiled template not saved: ", e)
+
+    for snippet in unknown_snippets(tokens):
+        print("unknown snippet", snippet, "in", filename)
+    template_cache[filename] = (version, tokens, digest)
+    return tokens
+
+"""
+    return the snippets of the {{#cg}} sections which are not available
+"""
+def unknown_snippets(tokens):
+    result = []
+    section = None
+    for tag, key in tokens:
+        if tag == 'section' and key == 'cg':
+            section = ""
+        elif tag == 'end' and key == 'cg' and section != None:
+            args = section.split()
+            snippet = args[0] if args else ""
+            entry = find_snippet(snippet)
+            if (entry == None or not entry.template) and snippet not in result:
+                result.append(snippet)
+            section = None
+        elif tag == 'literal' and section != None:
+            section += key
+    return result
+
+"""
+    Ahead of time compilation of the templates
+
+    With -ct or CG_COMPILE_TEMPLATES=on, a template is translated into a Python
+    module whose render function concatenates the literal chunks, the values
+    and the results of the snippets, chevron does not interpret the template
+    anymore. The escaped braces of the literals are replaced at compile time.
+    The modules are built once per run from the tokens of the template. Their
+    source is written next to the tokens to be inspected, it is never executed
+    from the disk.
+
+    Only the literals, the variables and the {{#cg}} sections are compiled,
+    the templates with other sections or partials are rendered by chevron.
+"""
+template_settings = {
+    'compile': os.environ.get('CG_COMPILE_TEMPLATES', 'off').lower() in ['on', 'true', 'yes', '1']
+}
+compiled_version = 1
+compiled_modules = {}   # compiled_modules[hash of the template] = module, None when it can not be compiled
+
+def check_template_args(args):
+    if getattr(args, 'compile_templates', False):
+        template_settings['compile'] = True
+
+def unescape_braces(text):
+    return text.replace("\\}\\}", "}}").replace("\\{\\{", "{{")
+
+"""
+    return the source of the module of a template, None when it can not be compiled
+"""
+def template_module_source(filename, tokens):
+    parts = []
+    sections = []
+    section = None
+    for tag, key in tokens:
+        if section != None:
+            if tag == 'literal':
+                section += key
+            elif tag == 'end' and key == 'cg':
+                sections.append(section)
+                parts.append("section(" + str(len(sections) - 1) + ")")
+                section = None
+            else:
+                return None
+        elif tag == 'literal':
+            parts.append(repr(unescape_braces(key)))
+        elif tag in ['variable', 'no escape'] and '.' not in key:
+            parts.append("value(data, " + repr(key) + ", " + str(tag == 'variable') + ")")
+        elif tag == 'section' and key == 'cg':
+            section = ""
+        elif tag not in ['comment', 'set delimiter']:
+            return None
+
+    lines = ["# generated from " + os.path.basename(filename) + " by lib/template_engine.py, do not edit",
+             "# it is generated again when the template changes", "",
+             "sections = " + repr(sections), "",
+             "def render(data, value, section):",
+             "    return ''.join(["]
+    lines += ["        " + part + "," for part in parts]
+    lines += ["    ])", ""]
+    return "\n".join(lines)
+
+"""
+    return the module of a template, None when it can not be compiled
+"""
+def compiled_template(filename):
+    tokens = compile_template(filename)
+    digest = template_cache[filename][2]
+    if digest in compiled_modules:
+        return compiled_modules[digest]
+
+    name = 'compiled_template_' + digest
+    module_file = template_cache_filename(digest + '_v' + str(compiled_version))[:-len('.json')] + '.py'
+    # the module is always built from the tokens, the file is only written to be read
+    source = template_module_source(filename, tokens)
+    if source == None:
+        compiled_modules[digest] = None
+        return None
+    module = types.ModuleType(name)
+    exec(compile(source, module_file, 'exec'), module.__dict__)
+    if cache_enabled() and not os.path.exists(module_file):
+        try:
+            os.makedirs(os.path.dirname(module_file), exist_ok=True)
+            tmp = module_file + '.tmp'
+            with open(tmp, 'w') as f:
+                f.write(source)
+            os.replace(tmp, module_file)
+        except OSError as e:
+            print ("Compiled template not saved: ", e)
+
+    # the snippets are resolved once per run, they depend on the selected generators
+    module.entries = [find_snippet(text.split()[0]) if text.split() else None for text in module.sections]
+    compiled_modules[digest] = module
+    return module
+
+"""
+    value of a variable, as chevron renders it
+"""
+def template_value(data, key, escape):
+    value = data.get(key, '')
+    if value not in (0, False):
+        value = value or ''
+    value = str(value)
+    if escape:
+        value = value.replace('&', '&amp;').replace('"', '&quot;').replace('<', '&lt;').replace('>', '&gt;')
+    return unescape_braces(value)
+
+def render_compiled(module, context, data):
+    def section(index):
+        # a context can use generators which are not selected
+        entry = module.entries[index] or context.snippet(module.sections[index])
+        if not context.allowed(entry):
+            return unescape_braces('{{#cg}}' + module.sections[index] + '{{/cg}}')
+        code = call_snippet(entry, context.table)
+        # the result of a snippet is a template too
+        if '{{' in code:
+            code = chevron.render(code, data)
+        return unescape_braces(code)
+    return module.render(data, template_value, section)
+
+"""
+    return a template rendered for the table of a context
+"""
+def render_template(context, template):
+    with schema_context(context.schema):
+        table = context.table
+        # the snippets share the values of the table computed once per file
+        reset_table_context(table)
+
+        dict = {
+           'class': cg_class(table),
+            'element': cg_element(table),
+            'table': table,
+            'url': cg_url(table),
+            'words': cg_to_words(table),
+            'primary_key': cg_primary_key(table),
+            'cg': lambda text, render: cg(text, render, context)
+        }
+
+        compiled = context.options.get('compile', template_settings['compile'])
+        module = compiled_template(template) if compiled else None
+        if (module):
+            return render_compiled(module, context, dict)
+        return chevron.render(compile_template(template), dict).replace("\}\}", "}}").replace("\{\{", "{{")
 
-    global table 
-    table = current_table
+def process(table, template, output_file, install_file, action, verbose):
 
     if (verbose):
         print('processing', table, template, output_file, install_file, action)
 
-    dict = {
-       'class': cg_class(table),
-        'element': cg_element(table),
-        'table': table,
-        'url': cg_url(table),
-        'words': cg_to_words(table),
-        'primary_key': cg_primary_key(table),
-        'cg': cg
-    }
-
-    res = ""
-    with open(template, 'r') as f: 
-        res = chevron.render(f, dict).replace("\}\}", "}}").replace("\{\{", "{{")
+    context = RenderContext(table, options={'action': action, 'verbose': verbose})
+    res = render_template(context, template)
 
     if (output_file):
         with open(output_file, 'w') as f:
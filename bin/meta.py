@@ -2,7 +2,10 @@
 # -*- coding:utf8 -*
 import argparse
 import sys
+import os
+import json
 from lib.schema import *
+from lib.diff import *
 
 """
     Meta.py
@@ -15,10 +18,32 @@ from lib.schema import *
     - META_DB_USER: the user name to connect to the MySql server
     - META_DB_PASSWORD: the password to connect to the MySql server
     - META_DB_NAME: the name of the database to analyze
+    - META_CACHE_DIR: the directory of the schema snapshots (default ~/.cache/ddd-gen)
+    - META_CACHE: set it to off to always read the schema from the database
+    - META_DB_POOL_SIZE: number of connections used to fetch the databases concurrently
+    - META_DB_BATCH_SIZE: number of tables read by each columns query in concurrent mode
+    - META_SNAPSHOT: binary snapshot to read the schema from, no database is needed
+    - META_DUMP: mysqldump file to read the schema from, no database is needed
+
+	meta -d db1,db2,db3					# fetches several databases concurrently
 
 	meta database						# returns the database name
 	
 	meta -d boards tables				# returns all the table names
+
+	meta -d boards foreign				# returns the foreign keys
+
+	meta -d boards fk_timing			# compares per table and single query foreign key fetching
+
+	meta -d boards changed				# tables changed since the last workflow --changed install
+
+	meta -d boards -o boards.snp export	# exports the schema into a binary snapshot
+
+	meta -sn boards.snp list			# works on a binary snapshot without database
+
+	meta -dd boards.sql list			# works on a mysqldump file without database
+
+	meta -d boards --since boards.snp diff	# json list of the changes since a snapshot or a dump
 	
 	meta -d boards -t users fields		# returns the field names for a table
 	
@@ -74,8 +99,6 @@ def print_field(table, field, full=False):
         print ("\t\t", field, ' ', field_type(table, field),  subtype)
 
 def print_foreign_key(tables):
-    referenced_by = {}
-
     for table in tables:
         cnt = 0
         fields = field_list(table)
@@ -87,16 +110,15 @@ def print_foreign_key(tables):
                 print ("\t\t", field)
                 print ("\t\t\t foreign_key:", fk)
                 cnt += 1
-                if (referenced_by.get(fk['table']) == None):
-                    referenced_by[fk['table']] = []
-                referenced_by[fk['table']].append(table)
 
     print ("")
     print ("Referenced by:")
-    for table in referenced_by:
-        print("\t", table)
-        for ref in referenced_by[table]:
-            print("\t\t", ref)
+    for table in tables:
+        refs = foreign_keys_to(table)
+        if refs:
+            print("\t", table)
+            for (ref, field, referenced_field) in refs:
+                print("\t\t", ref)
             
 
 parser = argparse.ArgumentParser(
@@ -117,6 +139,16 @@ parser.add_argument('-u', '--user', type=str, action="store", dest="user",
                     help='database user')
 parser.add_argument('-p', '--password', type=str, action="store", dest="password",
                     help='database user')
+parser.add_argument('-nc', '--no-cache', action="store_true", dest="no_cache",
+                    help='ignore the schema snapshot cache and read the database')
+parser.add_argument('-sn', '--snapshot', type=str, action="store", dest="snapshot",
+                    help='read the schema from a binary snapshot instead of the database')
+parser.add_argument('-dd', '--dump', type=str, action="store", dest="dump",
+                    help='read the schema from a mysqldump file instead of the database')
+parser.add_argument('-o', '--output', type=str, action="store", dest="output",
+                    help='output file of the export action')
+parser.add_argument('--since', type=str, action="store", dest="since",
+                    help='snapshot or dump file the diff action compares the schema with')
 args = parser.parse_args()
 
 if (args.verbose):
@@ -152,8 +184,11 @@ if (args.table):
 
 # only database is specified
 tables = table_list()
+current_schema_at_start = current_schema()
 
-print(database)
+if (args.action != "diff"):
+    # the diff output is pure json
+    print(current_schema().database)
 
 if (args.action == "list"):
     print("tables", tables)
@@ -163,16 +198,60 @@ elif (args.action == "foreign"):
     print_foreign_key(tables)
     exit(0)
 
+elif (args.action == "changed"):
+    schema = current_schema()
+    print("changed tables:", changed_tables())
+    print("removed tables:", schema.removed_tables)
+    exit(0)
+
+elif (args.action == "export"):
+    if (not args.output):
+        print ("output file not defined: -o argument")
+        exit(1)
+    export_binary_snapshot(args.output)
+    print("schema exported into", args.output)
+    exit(0)
+
+elif (args.action == "diff"):
+    if (not args.since):
+        print ("reference schema not defined: --since argument")
+        exit(1)
+    if (not os.path.exists(args.since)):
+        print ("file not found: " + args.since)
+        exit(1)
+    schema = current_schema()
+    changes = schema_diff(open_schema_file(args.since, schema.database), schema)
+    print(json.dumps({
+        'database': schema.database,
+        'since': args.since,
+        'changes': changes,
+        'affected_tables': affected_tables(changes, schema)
+    }, indent=2, default=str))
+    exit(0)
+
+elif (args.action == "fk_timing"):
+    per_table, bulk = foreign_key_timing(current_schema().database, user, password)
+    print("foreign keys for", len(tables), "tables")
+    print(f"\t per table queries: {per_table:.3f} s")
+    print(f"\t single query:      {bulk:.3f} s")
+    exit(0)
+
 else:    
-    for table in tables:
-        print("\t", table)
+    # several databases can be specified separated by commas
+    databases = [name.strip() for name in database.split(',') if name.strip()]
+    for name in databases:
+        schema = use_schema(name)
+        if (schema != current_schema_at_start):
+            print(schema.database)
+        for table in table_list():
+            print("\t", table)
 
-        fields = field_list(table)
-        for field in fields:
-            print_field(table, field, args.verbose)
+            fields = field_list(table)
+            for field in fields:
+                print_field(table, field, args.verbose)
 
-        tm = table_meta(table)
-        print("\t",  "    metadata:", tm)
-        print("\n")
+            tm = table_meta(table)
+            print("\t",  "    metadata:", tm)
+            print("\n")
 
 print ("bye ...")
\ No newline at end of file
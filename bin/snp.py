@@ -3,6 +3,9 @@
 import argparse
 from lib.schema import *
 from lib.code_generator import *
+from lib.generators import *
+from lib.memo import *
+from lib.batch import *
 
 """
     snp.py
@@ -16,42 +19,18 @@ from lib.code_generator import *
 The simpliest user interface is likely tp pass a set of positional arguments with the name of the snippet as first arguments and arguments to apply to the snippet as the following arguments.
 """
 
-snippets = ["cg_class", "cg_element", "cg_table", "cg_primary_key", "cg_url",
-             "cg_subtype", "csv_fields", "guarded", "create_validation_rules",
-             "update_validation_rules", "create_set_attributes", "update_set_attributes",
-             "primary_key_declaration", "factory_referenced_models", "factory_field_list",
-             "csv_high_variability_fields",
-             "field_list_translation", "field_list_cells", "field_list_titles", "field_list_input_form",
-             "join_for_images"]
-
-snippets_doc = {
-             "cg_class": "Capitalized name of the class",
-             "cg_element": "Name of the table elements",
-             "cg_table": "Table name",
-             "cg_primary_key": "Primary key field name",
-             "cg_url": "Suburl to access the resource",
-             "cg_subtype": "Subtype of a field, require a filed name parameter",
-             "csv_fields": "List of fields with double quotes, separated by commas",
-             "guarded": "CSV list of guarded fields",
-             "create_validation_rules": "Create validation rules",
-             "update_validation_rules": "Update validation rules",
-             "create_set_attributes": "create_set_attributes",
-             "update_set_attributes": "update_set_attributes",
-             "primary_key_declaration": "primary_key_declaration",
-             "factory_referenced_models": "factory_referenced_models",
-             "factory_field_list": "factory_field_list",
-             "csv_high_variability_fields": "CSV high variability fields (can be randomly drawn)",
-             "field_list_translation": "Initialize translations strings",
-             "field_list_cells": "field_list_cells",
-             "field_list_titles": "field_list_titles",
-             "field_list_input_form": "field_list_input_form",
-             "join_for_images": "join_for_images"
-}
-
 epilog = """
 Database, user and password can also be define into the META_DB, META_DB_USER, META_DB_PASSWORD environment variables.
+The results of the snippets are memoized, CG_MEMO=off disables it and CG_MEMO_DIR keeps them on disk (see lib/memo.py).
+
+The code generators can also be selected with the CG_GENERATOR environment variable (see lib/generators),
+their snippets are registered in lib/snippets.py, snp --list prints the ones of the selected generators.
+Modules of other generators are declared in CG_SNIPPET_MODULES and imported when one of their snippets is used:
+  CG_SNIPPET_MODULES=my_generators.react:field_list_cards,field_list_grid
 
-Snippet descriptions:
+With -j the snippets, separated by commas, are evaluated for all the tables matching the arguments
+(glob patterns, all the tables by default) in one run, one json line per table:
+  snp -j cg_class,cg_url,field_list_translation "board*"
 """
 
 # Custom formatter to preserve line breaks
@@ -68,15 +47,27 @@ parser.add_argument('-v', '--verbose', action="store_true", dest="verbose",
 parser.add_argument('-d', '--database', type=str, action="store", dest="database",
                     help='database name')
 parser.add_argument('-g', '--generator', type=str, action="store", dest="generator",
-                    help='name of the code generator to use')
+                    help='code generators to use, separated by commas: laravel, react or a module path, all by default')
 
 parser.add_argument('-l', '--list', action="store_true", dest="list",
                     help='list of the supported snippets')
+parser.add_argument('-j', '--json', action="store_true", dest="json",
+                    help='evaluate the snippets, separated by commas, for the tables matching the arguments, one json line per table')
 
 parser.add_argument('-u', '--user', type=str, action="store", dest="user",
                     help='database user')
 parser.add_argument('-p', '--password', type=str, action="store", dest="password",
                     help='database user')
+parser.add_argument('-nc', '--no-cache', action="store_true", dest="no_cache",
+                    help='ignore the schema snapshot cache and read the database')
+parser.add_argument('-nm', '--no-memo', action="store_true", dest="no_memo",
+                    help='compute the snippets every time, without the memoized results')
+parser.add_argument('-md', '--memo_dir', type=str, action="store", dest="memo_dir",
+                    help='directory where the results of the snippets are kept between runs')
+parser.add_argument('-sn', '--snapshot', type=str, action="store", dest="snapshot",
+                    help='read the schema from a binary snapshot instead of the database')
+parser.add_argument('-dd', '--dump', type=str, action="store", dest="dump",
+                    help='read the schema from a mysqldump file instead of the database')
 
 parser.add_argument('snippet', type=str, action="store",
                     help='snippet to generate')
@@ -88,7 +79,10 @@ args = parser.parse_args()
 if (args.verbose):
     print('args', args)
 
-database, user, password = check_args_and_fetch(args)
+# in batch mode, even with patterns, the tables are fetched at once by the bulk queries
+database, user, password = check_args_and_fetch(args, lazy=not args.json)
+check_generator_args(args)
+check_memo_args(args)
 
 table = args.table if 'table' in args else ""
 field = args.field if 'field' in args else ""
@@ -99,20 +93,25 @@ cg_arg = args.cg_args
 
 if (args.list):
     print("supported snippets:")
-    for snippet in snippets_doc:
-        print("\t" + snippet + " => " + snippets_doc[snippet])
+    for name in generator_snippet_names():
+        entry = find_snippet(name)
+        if entry:
+            print("\t" + entry.signature() + " => " + entry.doc)
     exit(0)
-"""
-The following code is likely to be considered as evil because it uses eval to call the code generator functions. This is a security risk. 
-The code generator function should be called by name 
-and the name should be checked against a list of authorized code generators. 
 
-However the operator of this script has already access to the database and the operating system and can do anything he wants, so this is not a real security risk.
-"""
-if (not snippet in globals()):
+if (args.json):
+    names = [name.strip() for name in snippet.split(',') if name.strip()]
+    for name in names:
+        if (find_snippet(name) == None):
+            print("unknown snippet", name)
+            exit(1)
+    for line in json_lines(batch_snippets(names, select_tables(cg_arg))):
+        print(line)
+    exit(0)
+
+entry = find_snippet(snippet)
+if (entry == None):
     print("unknown snippet", snippet)
     exit(1)
 
-func=globals()[snippet]
-if callable(func):
-    print(func(*cg_arg))
+print(call_snippet(entry, *cg_arg))
@@ -3,6 +3,8 @@
 import argparse
 from lib.schema import *
 from lib.code_generator import *
+from lib.generators import *
+from lib.memo import *
 from lib.template_engine import *
 
 """
@@ -33,17 +35,32 @@ parser.add_argument('-o', '--output', type=str, action="store", dest="output",
 parser.add_argument('-c', '--compare', type=str, action="store", dest="compare",
                     help='compare the output with a reference file (e.g. a previous version)')
 parser.add_argument('-g', '--generator', type=str, action="store", dest="generator",
-                    help='name of the code generator to use')
+                    help='code generators to use, separated by commas: laravel, react or a module path, all by default')
 parser.add_argument('-u', '--user', type=str, action="store", dest="user",
                     help='database user')
 parser.add_argument('-p', '--password', type=str, action="store", dest="password",
                     help='database user')
+parser.add_argument('-nc', '--no-cache', action="store_true", dest="no_cache",
+                    help='ignore the schema snapshot cache and read the database')
+parser.add_argument('-nm', '--no-memo', action="store_true", dest="no_memo",
+                    help='compute the snippets every time, without the memoized results')
+parser.add_argument('-md', '--memo_dir', type=str, action="store", dest="memo_dir",
+                    help='directory where the results of the snippets are kept between runs')
+parser.add_argument('-ct', '--compile_templates', action="store_true", dest="compile_templates",
+                    help='compile the templates into python modules instead of interpreting them')
+parser.add_argument('-sn', '--snapshot', type=str, action="store", dest="snapshot",
+                    help='read the schema from a binary snapshot instead of the database')
+parser.add_argument('-dd', '--dump', type=str, action="store", dest="dump",
+                    help='read the schema from a mysqldump file instead of the database')
 
 args = parser.parse_args()
 
 if (args.verbose):
     print('args', args)
 
-database, user, password = check_args_and_fetch(args)
+database, user, password = check_args_and_fetch(args, lazy=True)
+check_generator_args(args)
+check_memo_args(args)
+check_template_args(args)
 
 process(args.table, args.template, args.output, args.compare, "compare", args.verbose)
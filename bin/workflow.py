@@ -4,7 +4,10 @@ import argparse
 import os
 from lib.schema import *
 from lib.code_generator import *
+from lib.generators import *
+from lib.memo import *
 from lib.template_engine import *
+from lib.diff import *
 
 
 """
@@ -20,6 +23,14 @@ from lib.template_engine import *
     - META_DB_USER: the user name to connect to the MySql server
     - META_DB_PASSWORD: the password to connect to the MySql server
     - META_DB_NAME: the name of the database to analyze
+    - META_CACHE_DIR: the directory of the schema snapshots (default ~/.cache/ddd-gen)
+    - META_CACHE: set it to off to always read the schema from the database
+    - META_SNAPSHOT: binary snapshot to read the schema from, no database is needed
+    - META_DUMP: mysqldump file to read the schema from, no database is needed
+    - CG_GENERATOR: code generators to use, separated by commas, all by default
+    - CG_MEMO: set it to off to compute the snippets every time
+    - CG_MEMO_DIR: directory where the results of the snippets are kept between runs
+    - CG_COMPILE_TEMPLATES: set it to on to compile the templates into python modules
 
     - WF_TEMPLATES_DIR: the directory where the templates are stored
     - WF_BUILD_DIR: the directory where the generated files are stored
@@ -170,6 +181,20 @@ parser.add_argument('-u', '--user', type=str, action="store", dest="user",
                     help='database user')
 parser.add_argument('-p', '--password', type=str, action="store", dest="password",
                     help='database user')
+parser.add_argument('-nc', '--no-cache', action="store_true", dest="no_cache",
+                    help='ignore the schema snapshot cache and read the database')
+parser.add_argument('-g', '--generator', type=str, action="store", dest="generator",
+                    help='code generators to use, separated by commas: laravel, react or a module path, all by default')
+parser.add_argument('-nm', '--no-memo', action="store_true", dest="no_memo",
+                    help='compute the snippets every time, without the memoized results')
+parser.add_argument('-md', '--memo_dir', type=str, action="store", dest="memo_dir",
+                    help='directory where the results of the snippets are kept between runs')
+parser.add_argument('-ct', '--compile_templates', action="store_true", dest="compile_templates",
+                    help='compile the templates into python modules instead of interpreting them')
+parser.add_argument('-sn', '--snapshot', type=str, action="store", dest="snapshot",
+                    help='read the schema from a binary snapshot instead of the database')
+parser.add_argument('-dd', '--dump', type=str, action="store", dest="dump",
+                    help='read the schema from a mysqldump file instead of the database')
 parser.add_argument('-b', '--build_dir', type=str, action="store", dest="build_dir",
                     help='directory where the generated files are stored')
 parser.add_argument('-td', '--template_dir', type=str, action="store", dest="template_dir",
@@ -178,6 +203,10 @@ parser.add_argument('-i', '--install_dir', type=str, action="store", dest="insta
                     help='directory where the APPLICATION is installed')
 parser.add_argument('-v', '--verbose', action="store_true", dest="verbose",
                     help='verbose mode')
+parser.add_argument('--changed', action="store_true", dest="changed",
+                    help='when no table is specified, only process the tables which have changed since the last install with --changed')
+parser.add_argument('--since', type=str, action="store", dest="since",
+                    help='only process the tables affected by the schema changes since a snapshot or a dump file, all their codes')
 
 parser.add_argument('tables', type=str, action="store", nargs='*',
                     help='List of tables to process')
@@ -200,6 +229,9 @@ def default_tables ():
     return result
 
 database, user, password = check_args_and_fetch(args)
+check_generator_args(args)
+check_memo_args(args)
+check_template_args(args)
 
 # Set the parameters from the environment variables and CLI parameters
 templates_dir = os.getenv('WF_TEMPLATES_DIR') if 'WF_TEMPLATES_DIR' in os.environ else ""
@@ -244,6 +276,20 @@ if (param_error):
 tables = args.tables
 if (len(tables) == 0):
     tables = default_tables()
+    if (args.changed):
+        changed = changed_tables()
+        tables = [t for t in tables if t in changed]
+
+if (args.since):
+    if (not os.path.exists(args.since)):
+        print("file not found: " + args.since)
+        exit(1)
+    schema = current_schema()
+    changes = schema_diff(open_schema_file(args.since, schema.database), schema)
+    affected = affected_tables(changes, schema)
+    tables = [t for t in tables if t in affected]
+    if (args.verbose):
+        print(len(changes), "changes since", args.since)
 
 if (args.verbose):
     print("build dir = ", build_dir)
@@ -251,11 +297,21 @@ if (args.verbose):
     print("templates dir = ", templates_dir)
     print("action = ", args.action)
 
+# (table, code) pairs to process
+pairs = [(table, code) for table in tables for code in codes]
+if (args.verbose):
+    print("pairs = ", pairs)
+
 # Generate the code
-for table in tables:
-    for code in codes:
-        process(table, templateFilename(code, templates_dir),
-            outputFilename(code, table, build_dir), 
-            filenameToGenerate(code, table, install_dir), args.action, args.verbose)
+for (table, code) in pairs:
+    process(table, templateFilename(code, templates_dir),
+        outputFilename(code, table, build_dir), 
+        filenameToGenerate(code, table, install_dir), args.action, args.verbose)
 
+# the changes are kept in the snapshot until the code of all the changed tables is installed
+if (args.changed and args.action == 'install' and not args.tables and not args.code and not args.since):
+    consume_changed_tables()
+
+if (args.verbose):
+    print("snippets = ", memo_stats)
 print ("bye ...")
\ No newline at end of file
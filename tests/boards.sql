@@ -0,0 +1,73 @@
+-- MySQL dump 10.13  Distrib 8.0.36, for Linux (x86_64)
+--
+-- Host: localhost    Database: boards
+-- ------------------------------------------------------
+/*!40101 SET NAMES utf8mb4 */;
+
+--
+-- Table structure for table `owners`
+--
+
+DROP TABLE IF EXISTS `owners`;
+CREATE TABLE `owners` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `name` varchar(64) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `email` varchar(255) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `phone` varchar(32) COLLATE utf8mb4_unicode_ci DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `owners_email_unique` (`email`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+--
+-- Table structure for table `boards`
+--
+
+DROP TABLE IF EXISTS `boards`;
+CREATE TABLE `boards` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `name` varchar(128) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT 'the name; unique',
+  `description` text COLLATE utf8mb4_unicode_ci,
+  `owner_id` bigint unsigned NOT NULL,
+  `kind` enum('public','private') COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'public',
+  `price` decimal(10,2) unsigned NOT NULL,
+  `active` tinyint(1) NOT NULL DEFAULT '1',
+  `picture` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '{\"subtype\":\"image\"}',
+  `created_at` timestamp NULL DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `boards_name_unique` (`name`),
+  KEY `boards_owner_id_foreign` (`owner_id`),
+  CONSTRAINT `boards_owner_id_foreign` FOREIGN KEY (`owner_id`) REFERENCES `owners` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+--
+-- Table structure for table `columns`
+--
+
+DROP TABLE IF EXISTS `columns`;
+CREATE TABLE `columns` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `board_id` bigint unsigned NOT NULL,
+  `title` varchar(64) COLLATE utf8mb4_unicode_ci NOT NULL,
+  `done` tinyint(1) NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `columns_board_id_foreign` (`board_id`),
+  CONSTRAINT `columns_board_id_foreign` FOREIGN KEY (`board_id`) REFERENCES `boards` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+--
+-- Table structure for table `metadata`
+--
+
+DROP TABLE IF EXISTS `metadata`;
+CREATE TABLE `metadata` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `table` varchar(64) NOT NULL,
+  `column` varchar(64) DEFAULT NULL,
+  `key` varchar(64) NOT NULL,
+  `value` varchar(255) DEFAULT NULL,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+LOCK TABLES `metadata` WRITE;
+INSERT INTO `metadata` VALUES (1,'boards',NULL,'imageField','picture'),(2,'owners','phone','subtype','phone'),(3,'columns','title','json','{\"fillable\":\"yes\",\"label\":\"Title\"}');
+UNLOCK TABLES;
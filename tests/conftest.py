@@ -0,0 +1,37 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import os
+import sys
+import pytest
+
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(tests_dir), 'bin'))
+
+import mysql.connector
+import lib.schema
+from fake_database import FakeDatabase
+
+"""
+    Shared fixtures: the dump of the boards database, an empty schema cache
+    and a fake MySQL server built from the dump
+"""
+
+@pytest.fixture
+def boards_dump():
+    return os.path.join(tests_dir, 'boards.sql')
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    # every test starts without schema snapshot and without loaded schema
+    monkeypatch.setenv('META_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.delenv('META_CACHE', raising=False)
+    monkeypatch.setattr(lib.schema, 'schemas', {})
+    monkeypatch.setattr(lib.schema, 'current', lib.schema.Schema(""))
+    return tmp_path / 'cache'
+
+@pytest.fixture
+def server(boards_dump, monkeypatch):
+    with open(boards_dump, encoding='utf8') as f:
+        server = FakeDatabase(f.read())
+    monkeypatch.setattr(mysql.connector, 'connect', server.connect)
+    return server
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import re
+import zlib
+from lib.ddl import parse_dump
+
+"""
+    A MySQL server in memory for the tests
+
+    The server holds one database described by a mysqldump file and answers the
+    introspection queries of lib/schema.py from it. The tests modify the
+    description to simulate schema changes and count the queries.
+
+        server = FakeDatabase(open('tests/boards.sql').read())
+        monkeypatch.setattr(mysql.connector, 'connect', server.connect)
+
+    server.pool stands in for mysql.connector.pooling.MySQLConnectionPool.
+"""
+
+in_reg = re.compile(r"(?:TABLE_NAME|`table`) IN \(([^)]*)\)", re.I)
+equal_reg = re.compile(r"TABLE_NAME = '(\w+)'", re.I)
+show_reg = re.compile(r"SHOW FULL COLUMNS FROM (\w+)", re.I)
+
+class FakeDatabase:
+
+    def __init__(self, dump):
+        self.description = parse_dump(dump)[0]
+        self.database = self.description['database']
+        self.queries = []
+
+    def connect(self, **kwargs):
+        return FakeConnection(self)
+
+    def pool(self, pool_name, pool_size, **kwargs):
+        return FakePool(self, pool_size)
+
+    def tables(self, query):
+        match = in_reg.search(query)
+        if match:
+            return [name.strip(" '") for name in match.group(1).split(',')]
+        match = equal_reg.search(query)
+        if match:
+            return [match.group(1)]
+        return self.description['tables']
+
+    def checksum(self, lines):
+        result = {}
+        for table, line in lines:
+            count, crc = result.get(table, (0, 0))
+            result[table] = (count + 1, crc + zlib.crc32(repr(line).encode()))
+        return [(table,) + result[table] for table in result]
+
+    """
+        return the lines of a query
+    """
+    def execute(self, query):
+        self.queries.append(query)
+        columns = self.description['columns']
+        foreign = [line for line in self.description['foreign'] if line[4]]
+        metadata = self.description['metadata']
+
+        if 'information_schema.tables' in query:
+            return [(self.database, table) for table in self.description['tables']]
+
+        match = show_reg.match(query.strip())
+        if match:
+            return list(columns[match.group(1)])
+
+        if 'information_schema.COLUMNS' in query:
+            if 'GROUP BY' in query:
+                return self.checksum([(table, line) for table in self.description['tables'] for line in columns[table]])
+            tables = self.tables(query)
+            return [(table,) + tuple(line) for table in self.description['tables'] if table in tables for line in columns[table]]
+
+        if 'KEY_COLUMN_USAGE' in query:
+            if 'GROUP BY' in query:
+                return self.checksum([(line[2], line) for line in foreign])
+            tables = self.tables(query)
+            return [line for line in foreign if line[2] in tables]
+
+        if '`metadata`' in query:
+            if 'GROUP BY' in query:
+                return self.checksum([(line[1], line) for line in metadata])
+            tables = self.tables(query)
+            return [line[1:] for line in metadata if line[1] in tables]
+
+        raise Exception("Unexpected query: " + query)
+
+class FakePool:
+
+    def __init__(self, server, pool_size):
+        # the same limit as mysql.connector
+        if pool_size <= 0 or pool_size > 32:
+            raise AttributeError("Pool size should be higher than 0 and lower or equal to 32")
+        self.server = server
+        self.pool_size = pool_size
+
+    def get_connection(self):
+        return self.server.connect()
+
+class FakeConnection:
+
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self):
+        return FakeCursor(self.server)
+
+    def close(self):
+        None
+
+class FakeCursor:
+
+    def __init__(self, server):
+        self.server = server
+        self.lines = []
+
+    def execute(self, query):
+        self.lines = self.server.execute(query)
+
+    def fetchall(self):
+        return list(self.lines)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def close(self):
+        None
@@ -0,0 +1,71 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import os
+import sys
+import json
+import datetime
+import runpy
+import pytest
+import lib.snippets
+import lib.generators
+from lib.schema import *
+from lib.snippets import *
+from lib.batch import *
+
+"""
+    Batch evaluation of the snippets
+"""
+
+bin_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bin')
+
+@pytest.fixture(autouse=True)
+def isolated_registry():
+    saved = [(mapping, dict(mapping)) for mapping in (lib.snippets.registry, lib.snippets.lazy_modules)]
+    selection = list(lib.generators.selection)
+    yield
+    for mapping, content in saved:
+        mapping.clear()
+        mapping.update(content)
+    lib.generators.selection[:] = selection
+
+@pytest.fixture
+def boards(boards_dump):
+    return use_schema(load_dump(boards_dump))
+
+def test_select_tables(boards):
+    assert select_tables() == ['owners', 'boards', 'columns', 'metadata']
+    assert select_tables(['b*']) == ['boards']
+    assert select_tables(['*s', 'own*']) == ['owners', 'boards', 'columns']
+    assert select_tables(['none*']) == []
+
+def test_batch_snippets(boards):
+    @snippet("Fails for the owners")
+    def picky(table):
+        print("noise on stdout")
+        if table == 'owners':
+            raise Exception("no owners")
+        return table.upper()
+
+    lines = list(batch_snippets(['cg_class', 'picky'], ['owners', 'boards']))
+    assert lines == [
+        {'table': 'owners', 'cg_class': 'Owner', 'errors': {'picky': 'no owners'}},
+        {'table': 'boards', 'cg_class': 'Board', 'picky': 'BOARDS'}]
+
+    with pytest.raises(Exception):
+        list(batch_snippets(['unknown'], ['boards']))
+
+def test_json_lines():
+    # the values which are not json are written as strings
+    lines = list(json_lines([{'table': 'boards', 'count': 2}, {'table': 'owners', 'created': datetime.date(2024, 1, 31)}]))
+    assert lines == ['{"table": "boards", "count": 2}', '{"table": "owners", "created": "2024-01-31"}']
+
+def test_patterns_use_the_bulk_queries(server, monkeypatch, capsys):
+    monkeypatch.setattr(sys, 'argv', ['snp.py', '-d', 'boards', '-u', 'user', '-p', 'password', '-j', 'cg_class,guarded', 'b*', 'c*'])
+    with pytest.raises(SystemExit) as exit:
+        runpy.run_path(os.path.join(bin_dir, 'snp.py'), run_name='__main__')
+    assert exit.value.code == 0
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(line['table'], line['cg_class']) for line in lines] == [('boards', 'Board'), ('columns', 'Column')]
+    # no query per table
+    assert not any(query.strip().startswith('SHOW FULL COLUMNS') for query in server.queries)
+    assert not any("TABLE_NAME = '" in query for query in server.queries)
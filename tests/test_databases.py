@@ -0,0 +1,60 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import pytest
+import mysql.connector.pooling
+import lib.schema
+from lib.schema import *
+
+"""
+    Concurrent introspection through a pool of connections
+"""
+
+@pytest.fixture
+def pool(server, monkeypatch):
+    monkeypatch.setattr(mysql.connector.pooling, 'MySQLConnectionPool', server.pool)
+    return server
+
+def fetch():
+    lib.schema.schemas.clear()
+    return fetch_databases(['boards'], 'user', 'password')[0]
+
+def same_schema(schema, expected):
+    assert schema.table_list() == expected.table_list()
+    for table in expected.table_list():
+        assert schema.field_list(table) == expected.field_list(table)
+        for field in expected.field_list(table):
+            assert schema.field_attribute(table, field, 'type') == expected.field_attribute(table, field, 'type')
+        assert schema.metadata.get(table) == expected.metadata.get(table)
+        assert schema.foreign.get(table) == expected.foreign.get(table)
+        assert schema.table_meta(table) == expected.table_meta(table)
+
+def test_pool_size(monkeypatch):
+    monkeypatch.setenv('META_DB_POOL_SIZE', '40')
+    assert pool_size() == 32
+    monkeypatch.setenv('META_DB_POOL_SIZE', '0')
+    assert pool_size() == 1
+
+def test_fetch_by_batches(pool, boards_dump, monkeypatch):
+    monkeypatch.setenv('META_DB_BATCH_SIZE', '1')
+    monkeypatch.setenv('META_DB_POOL_SIZE', '40')
+    schema = fetch()
+    assert get_schema('boards') is schema
+    same_schema(schema, load_dump(boards_dump))
+    # one columns query per table
+    columns = [query for query in pool.queries if 'information_schema.COLUMNS' in query and 'GROUP BY' not in query]
+    assert len(columns) == len(schema.table_list())
+
+def test_up_to_date_and_refreshed_snapshots(pool, boards_dump):
+    fetch()
+    count = len(pool.queries)
+    schema = fetch()
+    # only the checksum queries
+    assert all('GROUP BY' in query for query in pool.queries[count:])
+    assert schema.changed_tables == []
+    same_schema(schema, load_dump(boards_dump))
+
+    pool.description['columns']['owners'].append(('address', 'varchar(255)', None, 'YES', '', None, '', 'select', ''))
+    schema = fetch()
+    assert schema.changed_tables == ['owners']
+    assert schema.field_list('owners')[-1] == 'address'
+    assert fetch().changed_tables == []
@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import lib.generators.laravel
+import lib.generators.react
+from lib.ddl import *
+from lib.schema import Schema, use_schema
+
+"""
+    mysqldump parser
+"""
+
+def parse(text, database = 'test'):
+    return parse_dump(text, database)[0]
+
+def load(text):
+    schema = Schema('test')
+    schema.load_description(parse(text))
+    return schema
+
+def columns(description, table):
+    return {line[0]: line for line in description['columns'][table]}
+
+def test_comments_and_escaped_quotes():
+    description = parse("""
+-- MySQL dump; a comment with a quote ' and a semicolon
+/*!40101 SET NAMES utf8mb4 */;
+# another comment ; with 'quotes'
+CREATE TABLE `notes` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  /* a block comment; with `backquotes` */
+  `title` varchar(64) NOT NULL DEFAULT 'it''s; here' COMMENT 'the title, \\'quoted\\'',
+  `body` text COMMENT '{\\"subtype\\":\\"html\\"}',
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB;
+""")
+    assert description['tables'] == ['notes']
+    fields = columns(description, 'notes')
+    assert list(fields) == ['id', 'title', 'body']
+    assert fields['id'][4] == 'PRI'
+    assert fields['id'][6] == 'auto_increment'
+    assert fields['title'][5] == "it's; here"
+    assert fields['title'][8] == "the title, 'quoted'"
+    assert fields['body'][8] == '{"subtype":"html"}'
+
+def test_foreign_keys(boards_dump):
+    with open(boards_dump, encoding='utf8') as f:
+        description = parse_dump(f.read())[0]
+    assert description['database'] == 'boards'
+    assert [line[2:] for line in description['foreign']] == [
+        ('boards', 'owner_id', 'owners', 'id'),
+        ('columns', 'board_id', 'boards', 'id')]
+
+    schema = Schema('')
+    schema.load_description(description)
+    assert schema.referenced_tables('columns') == ['boards']
+    assert schema.tables_referencing('owners') == ['boards']
+    assert schema.field_attribute('boards', 'owner_id', 'key') == 'MUL'
+
+def test_metadata_with_extra_columns():
+    create = """
+CREATE TABLE `metadata` (
+  `uuid` char(36) NOT NULL,
+  `id` int NOT NULL,
+  `table` varchar(64) NOT NULL,
+  `column` varchar(64) DEFAULT NULL,
+  `key` varchar(64) NOT NULL,
+  `value` varchar(255) DEFAULT NULL,
+  `created_at` timestamp NULL DEFAULT NULL
+);
+"""
+    # the values follow the columns of the CREATE TABLE
+    description = parse(create + "INSERT INTO `metadata` VALUES ('u1',1,'boards','name','label','Name','2024-01-01 00:00:00');")
+    assert description['metadata'] == [(1, 'boards', 'name', 'label', 'Name')]
+
+    # or the column list of the INSERT
+    description = parse(create + "INSERT INTO `metadata` (`created_at`, `key`, `value`, `table`, `column`) VALUES (NULL,'imageField','picture','boards',NULL);")
+    assert description['metadata'] == [(None, 'boards', None, 'imageField', 'picture')]
+
+def test_enum_and_set_values_with_commas_and_quotes():
+    schema = load("""
+CREATE TABLE `choices` (
+  `size` enum('small, medium','large','it''s','5\\' 2"') NOT NULL DEFAULT 'small, medium',
+  `tags` set('a,b','c') DEFAULT NULL
+);
+""")
+    assert schema.field_descriptor('choices', 'size').enum_values == ['small, medium', 'large', "it's", "5' 2\""]
+    assert schema.field_descriptor('choices', 'tags').set_values == ['a,b', 'c']
+    assert schema.field_attribute('choices', 'size', 'default') == 'small, medium'
+
+def test_table_created_twice():
+    description = parse("""
+CREATE TABLE `owners` (`id` int NOT NULL, PRIMARY KEY (`id`));
+CREATE TABLE `boards` (
+  `id` int NOT NULL,
+  `owner_id` int NOT NULL,
+  CONSTRAINT `fk_owner` FOREIGN KEY (`owner_id`) REFERENCES `owners` (`id`)
+);
+DROP TABLE IF EXISTS `boards`;
+CREATE TABLE `boards` (
+  `id` int NOT NULL,
+  `name` varchar(32) NOT NULL
+);
+""")
+    assert description['tables'] == ['owners', 'boards']
+    assert list(columns(description, 'boards')) == ['id', 'name']
+    assert description['foreign'] == []
+
+def test_unsigned_types_without_size():
+    schema = load("""
+CREATE TABLE `counters` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `hits` int unsigned NOT NULL,
+  `rank` int(10) unsigned zerofill NOT NULL,
+  `delta` int NOT NULL,
+  PRIMARY KEY (`id`)
+);
+""")
+    for field, base_type, size, unsigned in [('id', 'bigint', 0, True), ('hits', 'int', 0, True),
+                                             ('rank', 'int', 10, True), ('delta', 'int', 0, False)]:
+        descriptor = schema.field_descriptor('counters', field)
+        assert (descriptor.base_type, descriptor.size, descriptor.unsigned) == (base_type, size, unsigned)
+
+    use_schema(schema)
+    assert schema.field_subtype('counters', 'hits') == schema.field_subtype('counters', 'delta')
+    assert 'hits' in lib.generators.react.field_list_cells('counters')
+    assert 'hits' in lib.generators.react.field_list_input_form('counters')
+    assert lib.generators.laravel.factory_field('counters', 'hits') == lib.generators.laravel.factory_field('counters', 'delta').replace('delta', 'hits')
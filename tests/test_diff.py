@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+from lib.schema import Schema
+from lib.ddl import parse_dump
+from lib.diff import *
+
+"""
+    Schema diff and affected tables
+"""
+
+def dump_schema(filename, replacements = []):
+    with open(filename, encoding='utf8') as f:
+        text = f.read()
+    for old, new in replacements:
+        assert old in text
+        text = text.replace(old, new)
+    schema = Schema('')
+    schema.load_description(parse_dump(text)[0])
+    return schema
+
+def kinds(changes):
+    return sorted((change['change'], change['table'], change.get('field', change.get('key'))) for change in changes)
+
+def test_same_schema_has_no_change(boards_dump):
+    assert schema_diff(dump_schema(boards_dump), dump_schema(boards_dump)) == []
+
+def test_field_and_metadata_changes(boards_dump):
+    old = dump_schema(boards_dump)
+    new = dump_schema(boards_dump, [
+        ("`title` varchar(64)", "`title` varchar(128)"),
+        ("  `done` tinyint(1) NOT NULL,\n", "  `done` tinyint(1) NOT NULL,\n  `position` int NOT NULL,\n"),
+        ("  `phone` varchar(32) COLLATE utf8mb4_unicode_ci DEFAULT NULL,\n", ""),
+        ("(1,'boards',NULL,'imageField','picture')", "(1,'boards',NULL,'imageField','logo')"),
+        ("\\\"label\\\":\\\"Title\\\"", "\\\"label\\\":\\\"Name\\\""),
+    ])
+
+    changes = schema_diff(old, new)
+    assert kinds(changes) == [
+        ('field_added', 'columns', 'position'),
+        ('field_changed', 'columns', 'title'),
+        ('field_removed', 'owners', 'phone'),
+        ('metadata_changed', 'columns', 'title'),
+        ('table_metadata_changed', 'boards', 'imageField'),
+    ]
+    changed = [change for change in changes if change['change'] == 'field_changed'][0]
+    assert (changed['attribute'], changed['old'], changed['new']) == ('type', 'varchar(64)', 'varchar(128)')
+
+def test_tables_and_foreign_keys(boards_dump):
+    old = dump_schema(boards_dump)
+    new = dump_schema(boards_dump, [
+        ("REFERENCES `boards` (`id`)", "REFERENCES `boards` (`name`)"),
+        ("CREATE TABLE `metadata`", "CREATE TABLE `labels` (`id` int NOT NULL);\nCREATE TABLE `metadata`"),
+    ])
+    assert kinds(schema_diff(old, new)) == [
+        ('foreign_key_changed', 'columns', 'board_id'),
+        ('table_added', 'labels', None),
+    ]
+    assert kinds(schema_diff(new, old)) == [
+        ('foreign_key_changed', 'columns', 'board_id'),
+        ('table_removed', 'labels', None),
+    ]
+
+def test_tables_referencing_a_changed_table_are_affected(boards_dump):
+    old = dump_schema(boards_dump)
+    new = dump_schema(boards_dump, [("`phone` varchar(32)", "`phone` varchar(64)")])
+    # boards references owners, columns references boards only
+    assert affected_tables(schema_diff(old, new), new) == ['owners', 'boards']
+
+    new = dump_schema(boards_dump, [("`done` tinyint(1)", "`done` tinyint(4)")])
+    assert affected_tables(schema_diff(old, new), new) == ['columns']
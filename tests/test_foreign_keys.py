@@ -0,0 +1,25 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+from lib.schema import *
+
+"""
+    Foreign key index and paths between tables
+"""
+
+def test_path_along_the_foreign_keys(boards_dump):
+    schema = load_dump(boards_dump)
+    assert schema.foreign_key_path('columns', 'owners') == [
+        ('columns', 'board_id', 'boards', 'id'),
+        ('boards', 'owner_id', 'owners', 'id')]
+
+def test_path_against_the_foreign_keys(boards_dump):
+    schema = load_dump(boards_dump)
+    # the steps go from the source to the destination, the to field references the from field
+    assert schema.foreign_key_path('owners', 'columns') == [
+        ('owners', 'id', 'boards', 'owner_id'),
+        ('boards', 'id', 'columns', 'board_id')]
+
+def test_same_and_unlinked_tables(boards_dump):
+    schema = load_dump(boards_dump)
+    assert schema.foreign_key_path('boards', 'boards') == []
+    assert schema.foreign_key_path('boards', 'metadata') == None
@@ -0,0 +1,92 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import pytest
+import lib.memo
+import lib.code_generator
+import lib.generators.laravel
+from lib.schema import *
+from lib.snippets import *
+from lib.memo import *
+from lib.code_generator import *
+
+"""
+    Memoization of the snippets
+"""
+
+@pytest.fixture(autouse=True)
+def fresh_memo(monkeypatch):
+    monkeypatch.setattr(lib.memo, 'memo_settings', {'enabled': True, 'size': 4096, 'directory': ''})
+    clear_memo()
+    yield
+    clear_memo()
+
+@pytest.fixture
+def boards(boards_dump):
+    return use_schema(load_dump(boards_dump))
+
+def test_names_which_are_not_tables(boards):
+    assert call_snippet(get_snippet('cg_class'), 'some_other_things') == 'SomeOtherThing'
+    assert call_snippet(get_snippet('cg_element'), 'some_other_things') == 'some_other_thing'
+    assert memo_stats['misses'] == 0
+
+def test_results_are_reused_until_the_table_changes(boards):
+    entry = get_snippet('csv_fields')
+    assert call_snippet(entry, 'columns') == '"id", "board_id", "title", "done"'
+    assert call_snippet(entry, 'columns') == '"id", "board_id", "title", "done"'
+    assert (memo_stats['hits'], memo_stats['misses']) == (1, 1)
+
+    boards.store_field('columns', ('position', 'int', None, 'NO', '', None, '', 'select', ''))
+    boards.invalidate('columns')
+    assert call_snippet(entry, 'columns') == '"id", "board_id", "title", "done", "position"'
+    assert memo_stats['misses'] == 2
+
+def test_lazy_mode_does_not_fetch_the_referenced_tables(server):
+    schema = use_schema(load_schema('boards', 'user', 'password', lazy=True))
+    assert call_snippet(get_snippet('guarded'), 'boards') == get_snippet('guarded').function('boards')
+    assert list(schema.field_l) == ['boards']
+
+def test_disk_tier(boards, tmp_path):
+    lib.memo.memo_settings['directory'] = str(tmp_path / 'memo')
+    entry = get_snippet('csv_fields')
+    result = call_snippet(entry, 'boards')
+    clear_memo()
+    assert call_snippet(entry, 'boards') == result
+    assert memo_stats['disk_hits'] == 1
+
+def test_disk_tier_needs_the_referenced_tables(server, tmp_path):
+    lib.memo.memo_settings['directory'] = str(tmp_path / 'memo')
+    use_schema(load_schema('boards', 'user', 'password', lazy=True))
+    call_snippet(get_snippet('csv_fields'), 'boards')
+    # owners is not loaded, the key does not describe it
+    assert not (tmp_path / 'memo').exists()
+    call_snippet(get_snippet('csv_fields'), 'owners')
+    assert (tmp_path / 'memo').exists()
+
+def test_type_rules_override(boards, tmp_path):
+    lib.memo.memo_settings['directory'] = str(tmp_path / 'memo')
+    entry = get_snippet('factory_field_list')
+    before = call_snippet(entry, 'owners')
+    assert '$this->faker->phoneNumber' not in before
+
+    saved = dict(lib.code_generator.type_rules['factory'])
+    try:
+        override_type_rules('factory', [(None, 'phone', "$this->faker->phoneNumber")])
+        after = call_snippet(entry, 'owners')
+        assert '$this->faker->phoneNumber' in after
+        assert after == entry.function('owners')
+    finally:
+        declare_type_rules('factory', saved['rules'], saved['mode'])
+
+    # the original rules give the original results again, from memory or from disk
+    assert call_snippet(entry, 'owners') == before
+    clear_memo()
+    assert call_snippet(entry, 'owners') == before
+    assert memo_stats['disk_hits'] == 1
+
+def test_override_with_php_braces(boards):
+    saved = dict(lib.code_generator.type_rules['factory'])
+    try:
+        override_type_rules('factory', [(None, 'phone', "fn() => ['{$prefix}' . $this->faker->{unique}phoneNumber]")])
+        assert get_snippet('factory_field').function('owners', 'phone') == "'phone' => fn() => ['{$prefix}' . $this->faker->phoneNumber],"
+    finally:
+        declare_type_rules('factory', saved['rules'], saved['mode'])
@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import os
+import lib.schema
+from lib.schema import *
+
+"""
+    Snapshot cache: refresh of the changed tables and durable changed set
+"""
+
+def reload(lazy = False):
+    lib.schema.schemas.clear()
+    return use_schema(load_schema('boards', 'user', 'password', lazy))
+
+def add_column(server, table, field):
+    server.description['columns'][table].append((field, 'tinyint(1)', None, 'NO', '', '0', '', 'select', ''))
+
+def drop_table(server, table):
+    server.description['tables'].remove(table)
+    del server.description['columns'][table]
+    server.description['foreign'] = [line for line in server.description['foreign'] if table not in line[2:5]]
+
+def test_snapshot_is_used_when_nothing_changed(server):
+    reload()
+    count = len(server.queries)
+    schema = reload()
+    # only the three checksum queries
+    assert len(server.queries) - count == 3
+    assert schema.changed_tables == []
+    assert schema.field_list('boards')[:2] == ['id', 'name']
+
+def test_refresh_detects_changed_and_removed_tables(server):
+    reload()
+    add_column(server, 'boards', 'archived')
+    drop_table(server, 'columns')
+
+    schema = reload()
+    assert schema.changed_tables == ['boards']
+    assert schema.removed_tables == ['columns']
+    assert schema.field_list('boards')[-1] == 'archived'
+    assert 'columns' not in schema.table_list()
+    assert schema.foreign_keys_to('boards') == []
+
+    # the refreshed snapshot is up to date
+    schema = reload()
+    assert schema.changed_tables == []
+    assert schema.field_list('boards')[-1] == 'archived'
+
+def test_refresh_of_the_metadata(server):
+    reload()
+    server.description['metadata'].append((4, 'boards', 'name', 'label', 'Board name'))
+    schema = reload()
+    assert schema.changed_tables == ['boards']
+    assert schema.field_meta('boards', 'name', 'label') == 'Board name'
+    assert schema.table_meta('boards', 'imageField') == 'picture'
+
+def test_changed_tables_are_kept_until_consumed(server):
+    reload()
+    # unknown before the first install
+    assert changed_tables() == table_list()
+    consume_changed_tables()
+    assert changed_tables() == []
+
+    add_column(server, 'owners', 'address')
+    # another command refreshes the snapshot first
+    reload()
+    reload(lazy=True)
+    assert reload().changed_tables == []
+    assert changed_tables() == ['owners']
+
+    consume_changed_tables()
+    reload()
+    assert changed_tables() == []
+
+def test_lazy_run_without_snapshot_skips_the_checksums(server):
+    schema = reload(lazy=True)
+    assert not any('GROUP BY' in query for query in server.queries)
+    assert schema.field_list('columns')[1] == 'board_id'
+    # the partial schema is not saved
+    assert not os.path.exists(schema.cache_filename())
@@ -0,0 +1,81 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import struct
+import pytest
+import lib.schema
+from lib.schema import *
+
+"""
+    The same schema read from the database, the snapshot cache, a dump and a
+    binary snapshot
+"""
+
+def describe(schema):
+    result = {}
+    for table in schema.table_list():
+        result[table] = {
+            'fields': {field: schema.field_attributes(table, field) for field in schema.field_list(table)},
+            'types': {field: repr(schema.field_descriptor(table, field)) for field in schema.field_list(table)},
+            'subtypes': {field: schema.field_subtype(table, field) for field in schema.field_list(table)},
+            'metadata': schema.metadata.get(table),
+            'table_metadata': schema.table_meta(table),
+            'foreign': schema.foreign.get(table, {}),
+            'referenced_by': schema.foreign_keys_to(table)
+        }
+    return result
+
+def dump_schema(filename):
+    schema = Schema('')
+    schema.load_dump(filename)
+    return schema
+
+def test_dump_and_database_give_the_same_description(server, boards_dump):
+    fetched = load_schema('boards', 'user', 'password', no_cache=True)
+    assert describe(fetched) == describe(dump_schema(boards_dump))
+
+def test_cache_snapshot_round_trip(server, boards_dump):
+    load_schema('boards', 'user', 'password')
+    lib.schema.schemas.clear()
+    count = len(server.queries)
+    restored = load_schema('boards', 'user', 'password')
+    # only the checksums are read from the database
+    assert all('GROUP BY' in query for query in server.queries[count:])
+    assert describe(restored) == describe(dump_schema(boards_dump))
+
+def test_binary_snapshot_round_trip(tmp_path, boards_dump):
+    schema = dump_schema(boards_dump)
+    filename = str(tmp_path / 'boards.snp')
+    schema.export_binary(filename)
+
+    loaded = Schema('')
+    loaded.open_binary(filename)
+    assert loaded.database == 'boards'
+    # only the index is read, the tables are loaded on first access
+    assert loaded.field_l == {}
+    assert loaded.tables_referencing('owners') == ['boards']
+    assert describe(loaded) == describe(schema)
+    loaded.close_binary()
+
+def test_binary_snapshot_only_holds_data(tmp_path):
+    # a pickle which would run code if it was unpickled
+    payload = b"cos\nsystem\n(S'touch " + str(tmp_path / 'owned').encode() + b"'\ntR."
+    filename = str(tmp_path / 'crafted.snp')
+    with open(filename, 'wb') as f:
+        f.write(struct.pack(lib.schema.binary_header, lib.schema.binary_magic, lib.schema.binary_version,
+                            struct.calcsize(lib.schema.binary_header), len(payload)))
+        f.write(payload)
+
+    with pytest.raises(ValueError):
+        Schema('').open_binary(filename)
+    assert not (tmp_path / 'owned').exists()
+
+def test_open_schema_file_recognizes_the_formats(tmp_path, boards_dump):
+    schema = dump_schema(boards_dump)
+    binary = str(tmp_path / 'boards.snp')
+    schema.export_binary(binary)
+    snapshot = str(tmp_path / 'boards.json')
+    schema.save_snapshot(snapshot, {})
+
+    expected = describe(schema)
+    for filename in [boards_dump, binary, snapshot]:
+        assert describe(open_schema_file(filename)) == expected
@@ -0,0 +1,100 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import sys
+import pytest
+import lib.snippets
+import lib.generators
+from lib.snippets import *
+from lib.schema import *
+from lib.code_generator import *
+from lib.generators import *
+
+"""
+    Snippet registry
+"""
+
+@pytest.fixture(autouse=True)
+def isolated_registry():
+    # the dictionaries are restored in place, the generators share them
+    saved = [(mapping, dict(mapping)) for mapping in (lib.snippets.registry, lib.snippets.lazy_modules)]
+    yield
+    for mapping, content in saved:
+        mapping.clear()
+        mapping.update(content)
+
+def test_decorator_registers_the_snippet():
+    @snippet("Greetings for a table")
+    def hello(table, name = 'world'):
+        return 'hello ' + name + ' from ' + table
+
+    @snippet("Not for templates", name='helper', template=False)
+    def helper_function(table):
+        return table
+
+    entry = get_snippet('hello')
+    assert entry.function('boards') == 'hello world from boards'
+    assert entry.doc == "Greetings for a table"
+    assert entry.signature() == "hello(table, name='world')"
+    assert entry.template
+
+    assert get_snippet('helper').function is helper_function
+    assert 'helper' in snippet_names()
+    assert 'helper' not in snippet_names(template_only=True)
+    assert get_snippet('unknown') == None
+
+def test_declared_module_is_imported_on_first_use(tmp_path, monkeypatch):
+    (tmp_path / 'declared_snippets.py').write_text(
+        "from lib.snippets import snippet\n"
+        "@snippet('Shout the table name')\n"
+        "def shout(table):\n"
+        "    return table.upper()\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    declare_snippet_modules('declared_snippets:shout')
+    assert 'shout' in snippet_names()
+    assert 'declared_snippets' not in sys.modules
+    assert get_snippet('shout').function('boards') == 'BOARDS'
+    assert 'declared_snippets' in sys.modules
+
+@pytest.fixture
+def saved_selection():
+    saved = list(lib.generators.selection)
+    yield
+    lib.generators.selection[:] = saved
+
+def test_generators_can_be_selected_again(saved_selection):
+    select_generators(['react'])
+    assert find_snippet('guarded') == None
+    assert find_snippet('field_list_cells').module == 'lib.generators.react'
+    assert 'guarded' not in generator_snippet_names()
+
+    select_generators(['laravel'])
+    assert find_snippet('guarded').module == 'lib.generators.laravel'
+    assert find_snippet('field_list_cells') == None
+    # the shared snippets are always available
+    assert find_snippet('cg_class') != None
+    # a context can use a generator which is not selected
+    assert find_snippet('field_list_cells', ['lib.generators.react']) != None
+
+def test_generator_is_imported_when_a_snippet_is_not_found(saved_selection, monkeypatch):
+    for name in list(lib.snippets.registry):
+        if lib.snippets.registry[name].module == 'lib.generators.react':
+            del lib.snippets.registry[name]
+    monkeypatch.delitem(sys.modules, 'lib.generators.react')
+    monkeypatch.delattr(lib.generators, 'react')
+
+    select_generators(['laravel'])
+    assert find_snippet('guarded') != None
+    assert find_snippet('field_list_cells') == None
+    assert 'lib.generators.react' not in sys.modules
+
+    select_generators(list(generators))
+    assert find_snippet('field_list_cells').module == 'lib.generators.react'
+    assert 'lib.generators.react' in sys.modules
+
+def test_shared_snippets(boards_dump):
+    use_schema(load_dump(boards_dump))
+    assert get_snippet('cg_class').function('boards') == 'Board'
+    assert get_snippet('csv_fields').function('columns') == '"id", "board_id", "title", "done"'
+    assert get_snippet('image_field').function('boards') == 'picture'
+    assert get_snippet('image_field').function('owners') == 'image'
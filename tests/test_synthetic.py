@@ -0,0 +1,48 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import pytest
+from lib.schema import Schema
+from lib.ddl import parse_dump
+from lib.synthetic import *
+
+"""
+    Synthetic schemas
+"""
+
+def test_same_seed_same_schema():
+    options = {'tables': 20, 'columns': 8, 'fk_density': 0.3, 'seed': 7}
+    assert synthetic_description(options) == synthetic_description(options)
+    assert synthetic_description(options) != synthetic_description(dict(options, seed=8))
+
+def test_size_and_foreign_keys():
+    description = synthetic_description({'tables': 30, 'columns': 12, 'fk_density': 0.25})
+    tables = description['tables']
+    assert len(tables) == 31 and tables[-1] == 'metadata'
+    for table in tables[:-1]:
+        assert len(description['columns'][table]) == 12
+    assert description['foreign']
+    for (database, constraint, table, field, referenced, referenced_field) in description['foreign']:
+        # foreign keys only point to previous tables
+        assert tables.index(referenced) < tables.index(table)
+
+def test_options():
+    assert parse_synthetic_options('tables=5, fk_density=0.5') == synthetic_options({'tables': 5, 'fk_density': 0.5})
+    with pytest.raises(Exception):
+        synthetic_options({'rows': 10})
+
+def test_dump_gives_the_same_schema():
+    description = synthetic_description({'tables': 15, 'columns': 10, 'fk_density': 0.3, 'metadata_rows': 3})
+    synthetic = Schema('')
+    synthetic.load_description(description)
+    dumped = Schema('')
+    dumped.load_description(parse_dump(synthetic_dump(description))[0])
+
+    assert dumped.database == 'synthetic'
+    assert dumped.table_list() == synthetic.table_list()
+    for table in synthetic.table_list():
+        assert dumped.field_list(table) == synthetic.field_list(table)
+        for field in synthetic.field_list(table):
+            assert dumped.field_attribute(table, field, 'type') == synthetic.field_attribute(table, field, 'type')
+            assert dumped.field_subtype(table, field) == synthetic.field_subtype(table, field)
+        assert dumped.foreign.get(table) == synthetic.foreign.get(table)
+        assert dumped.table_meta(table) == synthetic.table_meta(table)
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# -*- coding:utf8 -*
+import os
+import json
+import pytest
+import lib.template_engine
+from lib.schema import *
+from lib.template_engine import *
+
+"""
+    Templates: cache of the tokens and compiled templates
+"""
+
+templates_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+@pytest.fixture(autouse=True)
+def fresh_templates(monkeypatch):
+    monkeypatch.setattr(lib.template_engine, 'template_cache', {})
+    monkeypatch.setattr(lib.template_engine, 'compiled_modules', {})
+
+def test_tokens_are_cached_in_json(cache_dir, monkeypatch):
+    template = os.path.join(templates_dir, 'Model.php')
+    tokens = compile_template(template)
+    digest = lib.template_engine.template_cache[template][2]
+    cache_file = template_cache_filename(digest)
+    assert cache_file.endswith('.json')
+    with open(cache_file) as f:
+        assert [tuple(token) for token in json.load(f)] == tokens
+
+    # the next run reads the tokens from the cache
+    monkeypatch.setattr(lib.template_engine, 'template_cache', {})
+    assert compile_template(template) == tokens
+
+    # a damaged cache file is ignored
+    with open(cache_file, 'w') as f:
+        f.write('[["literal"]]')
+    monkeypatch.setattr(lib.template_engine, 'template_cache', {})
+    assert compile_template(template) == tokens
+
+@pytest.mark.parametrize('template', ['ApiController.php', 'Model.php'])
+def test_compiled_and_interpreted_templates_give_the_same_code(boards_dump, template):
+    schema = use_schema(load_dump(boards_dump))
+    template = os.path.join(templates_dir, template)
+    assert compiled_template(template) != None
+    for table in schema.table_list():
+        interpreted = render_template(RenderContext(table, schema, options={'compile': False}), template)
+        compiled = render_template(RenderContext(table, schema, options={'compile': True}), template)
+        assert compiled == interpreted
+
+def test_templates_with_other_sections_are_not_compiled(tmp_path, boards_dump):
+    schema = use_schema(load_dump(boards_dump))
+    template = tmp_path / 'List.txt'
+    template.write_text("{{#items}}{{name}}{{/items}} {{class}}")
+    assert compiled_template(str(template)) == None
+    assert render_template(RenderContext('boards', schema, options={'compile': True}), str(template)) == ' Board'
+
+def test_compiled_modules_are_not_executed_from_the_cache(boards_dump):
+    schema = use_schema(load_dump(boards_dump))
+    template = os.path.join(templates_dir, 'Model.php')
+    expected = render_template(RenderContext('boards', schema, options={'compile': True}), template)
+    digest = lib.template_engine.template_cache[template][2]
+    module_file = template_cache_filename(digest + '_v' + str(compiled_version))[:-len('.json')] + '.py'
+    assert os.path.exists(module_file)
+
+    # the next run builds the module from the tokens again
+    with open(module_file, 'w') as f:
+        f.write("raise Exception('executed from the cache')\n")
+    lib.template_engine.compiled_modules.clear()
+    lib.template_engine.template_cache.clear()
+    assert render_template(RenderContext('boards', schema, options={'compile': True}), template) == expected